@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+# Extrações por página (texto, dicionário de texto, links, imagens, fontes,
+# anotações, widgets) memorizadas por documento, com o SHA-256 do conteúdo
+# como chave: as abas de uma sessão e o mesmo PDF enviado de novo, em
+# qualquer sessão, reaproveitam o que já foi extraído. O cache descarta os
+# documentos menos usados pelo tamanho aproximado do que guardam.
+LIMITE_ANALISES_MB = int(os.environ.get("SUITE_PDF_ANALISES_MB", "256"))
+# Um documento sozinho não passa disso: o resto é calculado sem guardar (um
+# livro de 2000 páginas não pode ocupar o cache inteiro nem toda a memória)
+LIMITE_DOCUMENTO_MB = int(os.environ.get("SUITE_PDF_ANALISE_DOCUMENTO_MB", "64"))
+_FALTA = object()
+
+
+def tamanho_aproximado(valor):
+    """Bytes aproximados ocupados pelo valor (strings, números, listas, tuplas e dicionários)."""
+    if isinstance(valor, (str, bytes)):
+        return 50 + len(valor)
+    if isinstance(valor, dict):
+        return 64 + sum(tamanho_aproximado(chave) + tamanho_aproximado(item) for chave, item in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return 56 + 8 * len(valor) + sum(tamanho_aproximado(item) for item in valor)
+    return 32
+
+
+class AnaliseDocumento:
+    """Valores extraídos de um documento, calculados uma vez (thread-safe)."""
+
+    def __init__(self, chave=None, cache=None, limite_bytes=LIMITE_DOCUMENTO_MB * 1024 * 1024):
+        self.chave = chave
+        self.limite_bytes = limite_bytes
+        self.tamanho = 0
+        self._cache = cache
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def consultar(self, item, padrao=None):
+        """Valor já memorizado de `item` (sem calcular), ou `padrao`."""
+        with self._lock:
+            return self._valores.get(item, padrao)
+
+    def memorizar(self, item, calcular):
+        """Valor de `item`, chamando calcular() só na primeira vez (ou se não couber)."""
+        with self._lock:
+            if item in self._valores:
+                return self._valores[item]
+        valor = calcular()
+        tamanho = tamanho_aproximado(valor)
+        with self._lock:
+            if item in self._valores:  # outra thread calculou junto
+                return self._valores[item]
+            if self.tamanho + tamanho > self.limite_bytes:
+                return valor
+            self._valores[item] = valor
+            self.tamanho += tamanho
+        if self._cache is not None:
+            self._cache._cresceu(self, tamanho)
+        return valor
+
+
+class LeituraDocumento:
+    """Extrações de `doc` (já aberto) passando pela análise memorizada do conteúdo.
+
+    Sem análise, memoriza só enquanto a leitura existir (o mesmo que extrair direto).
+    Com `guardar=False`, só aproveita o que já está na análise: o que for
+    extraído agora não fica nela (para quem promete memória que não cresce
+    com o número de páginas, como o ePub).
+    """
+
+    def __init__(self, doc, analise=None, guardar=True):
+        self.doc = doc
+        self.analise = analise if analise is not None else AnaliseDocumento()
+        self.guardar = guardar
+
+    def _extrair(self, item, calcular):
+        if self.guardar:
+            return self.analise.memorizar(item, calcular)
+        valor = self.analise.consultar(item, _FALTA)
+        return calcular() if valor is _FALTA else valor
+
+    def texto(self, numero):
+        return self._extrair(("texto", numero), lambda: self.doc[numero].get_text())
+
+    def texto_dict(self, numero, flags=None):
+        return self._extrair(("dict", numero, flags), lambda: self.doc[numero].get_text("dict", flags=flags))
+
+    def links(self, numero):
+        return self._extrair(("links", numero), lambda: self.doc[numero].get_links())
+
+    def imagens(self, numero):
+        """page.get_images(full=True)."""
+        return self._extrair(("imagens", numero), lambda: self.doc[numero].get_images(full=True))
+
+    def fontes(self, numero):
+        """page.get_fonts(full=True)."""
+        return self._extrair(("fontes", numero), lambda: self.doc[numero].get_fonts(full=True))
+
+    def anotacoes(self, numero):
+        """Lista de (tipo, retângulo) das anotações da página."""
+        return self._extrair(
+            ("anotacoes", numero),
+            lambda: [(annot.type[1], tuple(annot.rect)) for annot in self.doc[numero].annots()],
+        )
+
+    def widgets(self, numero):
+        """Lista de (nome do campo, tipo) dos campos de formulário da página."""
+        return self._extrair(
+            ("widgets", numero),
+            lambda: [(widget.field_name, widget.field_type_string) for widget in self.doc[numero].widgets()],
+        )
+
+
+class CacheAnalises:
+    """Análises por chave (hash do conteúdo), descartando as menos usadas acima do limite de memória."""
+
+    def __init__(self, limite_bytes=LIMITE_ANALISES_MB * 1024 * 1024):
+        self.limite_bytes = limite_bytes
+        self.total = 0
+        self._lock = threading.Lock()
+        self._analises = OrderedDict()  # chave -> AnaliseDocumento, da menos para a mais recente
+
+    def obter(self, chave):
+        with self._lock:
+            analise = self._analises.get(chave)
+            if analise is None:
+                analise = AnaliseDocumento(chave, cache=self)
+                self._analises[chave] = analise
+            else:
+                self._analises.move_to_end(chave)
+            return analise
+
+    def _cresceu(self, analise, tamanho):
+        with self._lock:
+            if self._analises.get(analise.chave) is not analise:
+                return  # já descartada: o dono atual continua usando, mas não conta aqui
+            self.total += tamanho
+            while self.total > self.limite_bytes and len(self._analises) > 1:
+                chave, antiga = next(iter(self._analises.items()))
+                if antiga is analise:
+                    self._analises.move_to_end(chave)
+                    continue
+                del self._analises[chave]
+                self.total -= antiga.tamanho
+
+    def __len__(self):
+        return len(self._analises)
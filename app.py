@@ -1,61 +1,30 @@
 import streamlit as st
-import os
-import zipfile
-import fitz  # PyMuPDF
-from PIL import Image
-from pdf2docx import Converter
+import csv
 import io
-import pandas as pd
-import re
-import requests
-from streamlit_lottie import st_lottie
-import time
-# Gráfico
-import matplotlib.pyplot as plt
-
-
-
-
+import os
+import json
+# Dependências pesadas (pdf2docx, pandas, streamlit_lottie) são
+# importadas só quando a aba que as usa processa um arquivo: o início a frio
+# e cada rerun não pagam por elas (medir com benchmarks/bench_inicializacao.py)
+from analise_documento import CacheAnalises
+from arquivo_zip import criar_zip
+from cache_resultados import CacheResultados, chave_valida, gerar_chave, hash_conteudo
+from compressor import MODO_PADRAO, NOMES_MODOS, PRESETS_DPI, comprimir_pdf
+from detector_marca_dagua import remover_marca_dagua
+from escritor_epub import NOMES_PERFIS, PERFIL_PADRAO, gerar_epub
+from espaco_trabalho import (
+    EspacoTrabalho, buffer_saida, conteudo_buffer, entrada_pdf, ler_upload, limpar_espacos_antigos,
+)
+from extrator_metadados import MetadadosPDF, extrair_metadados
+from fila_tarefas import ERRO, FilaCheia, FilaTarefas
+from motor_regras import carregar_motor
+from recursos_remotos import ANIMACAO_METADADOS, URL_LOTTIE_METADADOS, RecursosRemotos
+from registro_acessos import DIAS_GRAFICO, RegistroAcessos
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from verificador_ameacas import verificar_malware_em_pdf
 
- # Lista de verificações virus PDF
-# Função para verificar conteúdo do PDF (scripts, anexos, objetos)
-def verificar_malware_em_pdf(caminho_pdf):
-    resultado = {
-        "scripts_encontrados": [],
-        "anexos_suspeitos": [],
-        "obj_suspeitos": [],
-        "acoes_automaticas": [],
-        "urls_detectadas": [],
-    }
 
-    doc = fitz.open(caminho_pdf)
-
-    for page in doc:
-        # Verificar URLs
-        links = page.get_links()
-        for link in links:
-            if "uri" in link:
-                resultado["urls_detectadas"].append(link["uri"])
-
-    for i in range(len(doc)):
-        page = doc[i]
-        text = page.get_text("text")
-        if "/JS" in text or "/JavaScript" in text:
-            resultado["scripts_encontrados"].append(f"Script JavaScript encontrado na página {i+1}")
-
-    # Verificar ações automáticas
-    if "OpenAction" in doc.metadata or "/AA" in doc.metadata:
-        resultado["acoes_automaticas"].append("Ação automática detectada ao abrir o PDF")
-
-    # Verificar objetos suspeitos
-    for obj in doc:
-        if isinstance(obj, fitz.Page):
-            continue
-        obj_str = str(obj)
-        if any(palavra in obj_str for palavra in ["Launch", "EmbeddedFiles", "/AA", "/JS", "JavaScript"]):
-            resultado["obj_suspeitos"].append(f"Objeto suspeito: {obj_str[:100]}...")
 
-    return resultado
 
 
 # Função para descrever o que foi encontrado
@@ -70,28 +39,6 @@ def descrever_item(item, tipo):
 
 
 
-#animação de metadados
-def load_lottie_url(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-
-def incrementar_contador(nome_arquivo):
-    if not os.path.exists(nome_arquivo):
-        with open(nome_arquivo, "w") as f:
-            f.write("0")
-    with open(nome_arquivo, "r+") as f:
-        valor = int(f.read())
-        valor += 1
-        f.seek(0)
-        f.write(str(valor))
-        f.truncate()
-    return valor
-
-
-
 # Aplica tema escuro e estilo
 st.set_page_config(page_title="Suite PDF", layout="wide")
 
@@ -114,74 +61,229 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Cache de resultados compartilhado entre sessões (evita reprocessar a cada rerun)
+@st.cache_resource
+def obter_cache_resultados():
+    return CacheResultados()
+
+
+cache = obter_cache_resultados()
+
+
+# Extrações por página (texto, imagens, fontes...) compartilhadas pelas abas e sessões
+@st.cache_resource
+def obter_cache_analises():
+    return CacheAnalises()
+
+
+analises = obter_cache_analises()
+
+
+# Fila de tarefas compartilhada por todas as abas e sessões
+@st.cache_resource
+def obter_fila_tarefas():
+    return FilaTarefas()
+
+
+fila = obter_fila_tarefas()
+
+
+# Remove diretórios temporários esquecidos (uma vez por processo)
+@st.cache_resource
+def preparar_espacos_trabalho():
+    return limpar_espacos_antigos()
+
+
+preparar_espacos_trabalho()
+
+
+# Estatísticas de uso (acessos e conversões) compartilhadas pelas sessões e pelos dynos
+@st.cache_resource
+def obter_registro_acessos():
+    return RegistroAcessos()
+
+
+registro_acessos = obter_registro_acessos()
+
+
+# Animações e outros recursos externos, sem esperar a rede na requisição
+@st.cache_resource
+def obter_recursos_remotos():
+    return RecursosRemotos()
+
+
+recursos = obter_recursos_remotos()
+
+
+def id_sessao():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
 st.title("🧰 Suite PDF - Comprimir, Converter em Word e Remover Marca d'Água, segurança e muito mais")
 
 # --- Funções auxiliares ---
-def converter_pdf_para_word(pdf_path, output_path):
-    
-
-    cv = Converter(pdf_path)
-    cv.convert(output_path, start=0, end=None)
-    cv.close()
-
-def remover_marca_dagua(pdf_path, output_path, texto="Exemplo de Marca D'água"):
-    doc = fitz.open(pdf_path)
-    for page in doc:
-        for img in page.get_images(full=True):
-            xref = img[0]
-            page.delete_image(xref)
-        for inst in page.search_for(texto):
-            page.delete_text(inst)
-    doc.save(output_path)
-
-def comprimir_pdf(pdf_path):
-    output_path = os.path.splitext(pdf_path)[0] + "_comprimido.pdf"
-    doc = fitz.open(pdf_path)
-
-    # Otimização das imagens
-    for page in doc:
-        images = page.get_images(full=True)
-        for img in images:
-            xref = img[0]
+# As funções recebem o PDF como caminho ou bytes em memória e gravam a saída
+# num caminho ou num arquivo aberto (ver espaco_trabalho.buffer_saida).
+# O parâmetro opcional `progresso` é o callback da fila de tarefas.
+def exibir_relatorio_marcas(relatorio):
+    tipos = {"texto": "Texto", "imagem": "Imagem", "desenho": "Desenho"}
+    st.markdown(
+        f"**Elementos removidos:** {relatorio['remocoes']} em {relatorio['paginas_alteradas']} páginas"
+    )
+    st.table([
+        {"Tipo": tipos[marca["tipo"]], "Elemento": marca["descricao"], "Páginas": marca["paginas"]}
+        for marca in relatorio["marcas"]
+    ])
+
+def exibir_relatorio_compressao(relatorio):
+    st.markdown(
+        f"**Imagens únicas analisadas:** {relatorio['imagens_unicas']} "
+        f"(usadas {relatorio['ocorrencias']} vezes nas páginas), "
+        f"{relatorio.get('imagens_substituidas', relatorio['imagens_unicas'])} substituídas"
+    )
+    if relatorio.get("dpi_alvo"):
+        st.markdown(f"**Reduzidas para {relatorio['dpi_alvo']} dpi:** {relatorio['imagens_reduzidas']} imagens")
+    st.markdown(
+        f"**Imagens:** {relatorio['bytes_imagens_antes'] / 1024:.0f} KB → "
+        f"{relatorio['bytes_imagens_depois'] / 1024:.0f} KB"
+    )
+    if "modo" in relatorio:
+        etapas = []
+        if relatorio["miniaturas_removidas"]:
+            etapas.append(f"{relatorio['miniaturas_removidas']} miniaturas removidas")
+        if relatorio["fontes_subconjunto"]:
+            etapas.append("fontes reduzidas aos caracteres usados")
+        if relatorio["metadados_removidos"]:
+            etapas.append("metadados removidos")
+        etapas.append("linearizado" if relatorio["linearizado"] else "não linearizado")
+        st.markdown(f"**Modo {relatorio['modo']}:** {', '.join(etapas)}")
+    st.markdown(
+        f"**Tempo:** {relatorio['tempo_total']:.2f}s no total, "
+        f"{relatorio['tempo_recompressao']:.2f}s recomprimindo imagens, "
+        f"{relatorio.get('tempo_gravacao', 0.0):.2f}s gravando"
+    )
+    st.markdown(
+        f"**Economia estimada:** {relatorio['economia_deduplicacao']:.2f}s por não repetir imagens "
+        f"compartilhadas, {relatorio['economia_paralelismo']:.2f}s pelo processamento em paralelo"
+    )
+    if relatorio.get("imagens"):
+        # Imagens que ficariam maiores aparecem com codec "original"
+        tabela = [
+            {**{campo: valor for campo, valor in imagem.items() if campo not in ("bytes_antes", "bytes_depois")},
+             "KB antes": round(imagem["bytes_antes"] / 1024, 1), "KB depois": round(imagem["bytes_depois"] / 1024, 1)}
+            for imagem in relatorio["imagens"]
+        ]
+        st.dataframe(tabela, hide_index=True)
+
+def criar_zip_com_pdf(pdf, nome_arquivo):
+    # O PDF (bytes ou o buffer de saída aberto) vai direto para o ZIP, sem
+    # deflate de novo quando já está comprimido (ver arquivo_zip)
+    return criar_zip([(nome_arquivo, pdf)])
+
+
+# O que a verificação de PDF malicioso procura (título, explicação), exibido na aba
+ETAPAS_ANALISE = [
+    ("🔍 Verificando scripts embutidos (JavaScript)...",
+     "O PDF pode conter scripts JavaScript embutidos que podem ser usados para executar código malicioso no computador do usuário."),
+    ("🔍 Verificando ações automáticas (OpenAction, /AA)...",
+     "Alguns PDFs podem ter ações automáticas configuradas, como scripts que são executados quando o PDF é aberto."),
+    ("🔍 Verificando links externos (URLs)...",
+     "PDFs podem conter links externos que redirecionam o usuário para sites maliciosos."),
+    ("🔍 Verificando anexos suspeitos...",
+     "PDFs podem ter arquivos anexados, que podem ser executáveis ou disfarçados como outros tipos de arquivos maliciosos."),
+    ("🔍 Verificando objetos suspeitos (Launch, EmbeddedFiles)...",
+     "Objetos maliciosos podem estar embutidos no PDF, como arquivos executáveis ou links que podem ser usados para explorar vulnerabilidades."),
+    ("🔍 Verificando formulários (AcroForm, XFA)...",
+     "Formulários podem enviar dados para servidores externos e, no caso do XFA, carregar scripts próprios."),
+]
+
+
+# --- Tarefas em segundo plano ---
+def enviar_tarefa(chave, gerar):
+    """Roda gerar(ws, progresso) na fila, num espaço de trabalho próprio, e guarda o resultado no cache.
+
+    A tarefa concluída não segura os bytes (eles são servidos pelo cache em
+    disco), a não ser que o artefato seja maior que o cache inteiro.
+    """
+    sessao = id_sessao()
+
+    def executar(progresso):
+        with EspacoTrabalho(sessao) as ws:
+            resultado = gerar(ws, progresso)
+        return None if cache.guardar(chave, resultado) else resultado
+
+    return fila.enviar(chave, executar)
+
+
+def tarefa_arquivo(funcao, dados_pdf, nome_saida, **parametros):
+    """Adapta funcao(pdf, saida, progresso=...) ao formato gerar(ws, progresso)."""
+    def gerar(ws, progresso):
+        with buffer_saida(ws, len(dados_pdf), nome_saida) as saida:
+            funcao(entrada_pdf(dados_pdf, ws), saida, progresso=progresso, **parametros)
+            return conteudo_buffer(saida)
+    return gerar
+
+
+def resultado_tarefa(nome_aba, chave, gerar, rotulo):
+    """Devolve o resultado pronto ou mostra o progresso da tarefa e devolve None.
+
+    O id da tarefa fica na URL (?nome_aba=chave), então recarregar a página
+    acompanha a tarefa (ou mostra o resultado) mesmo numa sessão nova e sem o
+    upload. A chave é um SHA-256 que só quem enviou o arquivo conhece; da URL
+    só se aceita esse formato, e chaves desconhecidas saem da URL.
+    """
+    if gerar is None and not chave_valida(chave):
+        st.query_params.pop(nome_aba, None)
+        return None
+    resultado = cache.obter(chave)
+    tarefa = fila.obter(chave)
+    if resultado is None:
+        if tarefa is None:
+            if gerar is None:
+                # Tarefa desta sessão já expirada (ex.: reinício do servidor)
+                st.query_params.pop(nome_aba, None)
+                return None
             try:
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                image_pil = Image.open(io.BytesIO(image_bytes))
-                image_pil = image_pil.convert("RGB")
-                
-                # Salva a imagem com compressão para reduzir o tamanho
-                buffer = io.BytesIO()
-                image_pil.save(buffer, format="JPEG", quality=50)  # Aumente a compressão ajustando o valor de qualidade
-                new_image_bytes = buffer.getvalue()
-                
-                # Atualiza a imagem no PDF
-                doc.update_image(xref, new_image_bytes)
-            except Exception as e:
-                continue
-
-    # Salva o documento comprimido
-    doc.save(output_path, garbage=4, deflate=True)
-    doc.close()
-    return output_path
-
-def criar_zip_com_pdf(pdf_path):
-    zip_path = os.path.splitext(pdf_path)[0] + "_comprimido.zip"
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(pdf_path, arcname=os.path.basename(pdf_path))
-    return zip_path
-
-
-# Função para carregar animação Lottie
-def load_lottieurl(url: str):
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()
-        else:
+                tarefa = enviar_tarefa(chave, gerar)
+            except FilaCheia as e:
+                st.warning(str(e))
+                return None
+        st.query_params[nome_aba] = chave
+        if tarefa.estado == ERRO:
+            st.error(f"Falha ao processar o arquivo: {tarefa.erro}")
+            if st.button("🔁 Tentar novamente", key=f"repetir_{nome_aba}"):
+                fila.descartar(chave)
+                st.rerun()
             return None
-    except Exception as e:
-        return None
+        if not tarefa.concluida:
+            acompanhar_tarefa(tarefa, rotulo)
+            return None
+        resultado = tarefa.resultado or cache.obter(chave)
+        if resultado is None:
+            # O artefato saiu do cache (despejo LRU) depois de pronto: gera de novo
+            fila.descartar(chave)
+            if gerar is None:
+                st.query_params.pop(nome_aba, None)
+                st.warning("O resultado expirou; envie o arquivo de novo.")
+                return None
+            st.rerun()
+
+    st.query_params[nome_aba] = chave
+    if tarefa is not None:
+        for aviso in tarefa.avisos:
+            st.warning(aviso)
+    return resultado
+
+
+def acompanhar_tarefa(tarefa, rotulo):
+    # Só este fragmento é reexecutado a cada segundo; ao terminar, roda o app todo
+    @st.fragment(run_every=1.0)
+    def painel():
+        if tarefa.concluida:
+            st.rerun()
+        st.progress(tarefa.progresso, text=f"{rotulo} {tarefa.mensagem}")
+
+    painel()
 
 
 
@@ -191,457 +293,333 @@ def load_lottieurl(url: str):
 # --- Abas ---
 
 
-aba = st.tabs([
-    "📄 PDF para Word",
-    "💧 Remover Marca d'Água",
-    "🗜️ Comprimir Arquivo",
-    "🔍 Ler Metadados do PDF",
-    "🛡️ Verificar PDF Malicioso",
-    "📚 PDF para eBook"
-])
+# (rótulo, parâmetro da URL usado pelas tarefas da aba)
+ABAS = [
+    ("📄 PDF para Word", "word"),
+    ("💧 Remover Marca d'Água", "marca"),
+    ("🗜️ Comprimir Arquivo", "comprimir"),
+    ("🔍 Ler Metadados do PDF", "metadados"),
+    ("🛡️ Verificar PDF Malicioso", "malware"),
+    ("📚 PDF para eBook", "ebook"),
+]
+
+# Só a aba selecionada é executada (as outras nem importam o que usam); ao
+# recarregar a página com uma tarefa na URL, a aba dela já abre selecionada
+aba = st.tabs(
+    [rotulo for rotulo, _ in ABAS],
+    key="aba",
+    default=next((rotulo for rotulo, parametro in ABAS if parametro in st.query_params), None),
+    on_change="rerun",
+)
 
 
 
 
 
 # --- Aba 1: PDF para Word ---
-with aba[0]:
+if aba[0].open:
+    with aba[0]:
    
-    st.header("📄 Converter PDF para Word")
+        st.header("📄 Converter PDF para Word")
     
-    uploaded_pdf = st.file_uploader("Faça upload de um arquivo PDF", type="pdf")
-    if uploaded_pdf:
-        with st.spinner("Convertendo PDF para DOCX..."):
-            with open("temp.pdf", "wb") as f:
-                f.write(uploaded_pdf.read())
-            converter_pdf_para_word("temp.pdf", "output.docx")
+        uploaded_pdf = st.file_uploader("Faça upload de um arquivo PDF", type="pdf")
+        docx_bytes = None
+        if uploaded_pdf:
+            from conversor_word import converter_pdf_para_word  # pdf2docx só carrega quando usado
+
+            dados_pdf = ler_upload(uploaded_pdf)
+            chave = gerar_chave(dados_pdf, "pdf_para_word")
+            gerar = tarefa_arquivo(converter_pdf_para_word, dados_pdf, "saida.docx")
+            docx_bytes = resultado_tarefa("word", chave, gerar, "Convertendo PDF para DOCX...")
+        elif "word" in st.query_params:
+            docx_bytes = resultado_tarefa("word", st.query_params["word"], None, "Convertendo PDF para DOCX...")
+
+        if docx_bytes is not None:
             st.success("Conversão concluída!")
-            with open("output.docx", "rb") as f:
-                st.download_button("📥 Baixar Word", f, file_name="convertido.docx")
-            os.remove("temp.pdf")
-            os.remove("output.docx")
+            st.download_button("📥 Baixar Word", docx_bytes, file_name="convertido.docx")
 
-             # Mostra contador
-        total = incrementar_contador("contador.txt")
-        st.info(f"📊 Total de conversões já realizadas: {total}")
+                 # Mostra contador
+            total = registro_acessos.contar_conversao()
+            st.info(f"📊 Total de conversões já realizadas: {total}")
 
 # --- Aba 2: Remover Marca d'Água ---
-with aba[1]:
-    st.header("💧 Remover Marca d'Água")
-    uploaded_watermark_pdf = st.file_uploader("Upload do PDF com marca d'água", type="pdf", key="watermark")
-    watermark_text = st.text_input("Texto da marca d'água para remover", "Exemplo de Marca D'água")
-
-    if uploaded_watermark_pdf and watermark_text:
-        with st.spinner("Removendo marca d'água..."):
-            with open("marca.pdf", "wb") as f:
-                f.write(uploaded_watermark_pdf.read())
-            remover_marca_dagua("marca.pdf", "sem_marca.pdf", watermark_text)
-            st.success("Marca d'água removida com sucesso!")
-            with open("sem_marca.pdf", "rb") as f:
-                st.download_button("📥 Baixar PDF sem marca", f, file_name="sem_marca.pdf")
-            os.remove("marca.pdf")
-            os.remove("sem_marca.pdf")
-
-             # Mostra contador
-        total = incrementar_contador("contador.txt")
-        st.info(f"📊 Total de conversões já realizadas: {total}")
+if aba[1].open:
+    with aba[1]:
+        st.header("💧 Remover Marca d'Água")
+        uploaded_watermark_pdf = st.file_uploader("Upload do PDF com marca d'água", type="pdf", key="watermark")
+        watermark_text = st.text_input(
+            "Texto da marca d'água (opcional)",
+            help="A marca é detectada sozinha pelo que se repete na mesma posição em quase todas as páginas. "
+                 "Informe o texto para remover também ocorrências que ficaram de fora (ex.: rodapés).",
+        )
+
+        pdf_sem_marca = None
+        if uploaded_watermark_pdf:
+            dados_pdf = ler_upload(uploaded_watermark_pdf)
+            hash_pdf = hash_conteudo(dados_pdf)
+            chave = gerar_chave(hash_pdf, "remover_marca_dagua", texto=watermark_text)
+            chave_relatorio = gerar_chave(hash_pdf, "remover_marca_dagua_relatorio", texto=watermark_text)
+
+            def gerar_sem_marca(ws, progresso, dados_pdf=dados_pdf, hash_pdf=hash_pdf, chave_relatorio=chave_relatorio,
+                                texto=watermark_text):
+                with buffer_saida(ws, len(dados_pdf), "sem_marca.pdf") as saida:
+                    relatorio = remover_marca_dagua(entrada_pdf(dados_pdf, ws), saida, texto=texto or None,
+                                                    progresso=progresso, analise=analises.obter(hash_pdf))
+                    pdf_sem_marca = conteudo_buffer(saida)
+                cache.guardar(chave_relatorio, json.dumps(relatorio).encode("utf-8"))
+                return pdf_sem_marca
+
+            pdf_sem_marca = resultado_tarefa("marca", chave, gerar_sem_marca, "Removendo marca d'água...")
+        elif "marca" in st.query_params:
+            pdf_sem_marca = resultado_tarefa("marca", st.query_params["marca"], None, "Removendo marca d'água...")
+
+        if pdf_sem_marca is not None:
+            relatorio_json = cache.obter(chave_relatorio) if uploaded_watermark_pdf else None
+            relatorio = json.loads(relatorio_json) if relatorio_json is not None else None
+            if relatorio is not None and not relatorio["marcas"]:
+                st.warning("Nenhuma marca d'água detectada: nada foi removido.")
+            else:
+                st.success("Marca d'água removida com sucesso!")
+            st.download_button("📥 Baixar PDF sem marca", pdf_sem_marca, file_name="sem_marca.pdf")
+
+            if relatorio is not None and relatorio["marcas"]:
+                with st.expander("🔎 Marcas d'água encontradas"):
+                    exibir_relatorio_marcas(relatorio)
+
+                 # Mostra contador
+            total = registro_acessos.contar_conversao()
+            st.info(f"📊 Total de conversões já realizadas: {total}")
 
 # --- Aba 3: Comprimir Arquivo ---
-with aba[2]:
-    st.header("🗜️ Comprimir Arquivo (ZIP)")
-    file_to_compress = st.file_uploader("Upload de um PDF", type=["pdf"], key="zipper")
-
-    if file_to_compress:
-        with st.spinner("Comprimindo PDF com otimização de imagens..."):
-            with open("temp_input.pdf", "wb") as f:
-                f.write(file_to_compress.read())
-            # Comprimir o PDF
-            pdf_comprimido = comprimir_pdf("temp_input.pdf")
-            # Criar arquivo ZIP contendo o PDF comprimido
-            zip_file = criar_zip_com_pdf(pdf_comprimido)
+if aba[2].open:
+    with aba[2]:
+        st.header("🗜️ Comprimir Arquivo (ZIP)")
+        file_to_compress = st.file_uploader("Upload de um PDF", type=["pdf"], key="zipper")
+        resolucao = st.selectbox(
+            "Resolução máxima das imagens",
+            list(PRESETS_DPI),
+            index=2,
+            help="Imagens exibidas na página acima desta resolução são reduzidas. Scans grandes encolhem muito.",
+        )
+        dpi_alvo = PRESETS_DPI[resolucao]
+        rotulo_modo = st.radio(
+            "Modo de compressão",
+            list(NOMES_MODOS),
+            index=list(NOMES_MODOS.values()).index(MODO_PADRAO),
+            horizontal=True,
+            help="Rápido só limpa objetos soltos; Equilibrado também remove recursos não usados e miniaturas; "
+                 "Máximo ainda reduz as fontes aos caracteres usados e apaga os metadados.",
+        )
+        modo = NOMES_MODOS[rotulo_modo]
+        linearizar = st.checkbox(
+            "Otimizar para visualização na web (linearizar)",
+            help="A primeira página abre antes do download terminar quando o PDF é servido por HTTP.",
+        )
+
+        zip_bytes = None
+        nome_comprimido = "arquivo_comprimido"
+        if file_to_compress:
+            dados_pdf = ler_upload(file_to_compress)
+            nome_comprimido = os.path.splitext(file_to_compress.name)[0] + "_comprimido"
+            chave = gerar_chave(dados_pdf, "comprimir_pdf", nome=nome_comprimido, dpi=dpi_alvo,
+                                modo=modo, linearizar=linearizar)
+            chave_relatorio = gerar_chave(dados_pdf, "comprimir_pdf_relatorio", dpi=dpi_alvo,
+                                          modo=modo, linearizar=linearizar)
+
+            def gerar_zip(ws, progresso, dados_pdf=dados_pdf, nome_comprimido=nome_comprimido,
+                          chave_relatorio=chave_relatorio, dpi_alvo=dpi_alvo, modo=modo, linearizar=linearizar):
+                with buffer_saida(ws, len(dados_pdf), "comprimido.pdf") as pdf_comprimido:
+                    # Comprimir o PDF
+                    relatorio = comprimir_pdf(entrada_pdf(dados_pdf, ws), pdf_comprimido, progresso=progresso,
+                                              dpi_alvo=dpi_alvo, modo=modo, linearizar=linearizar)
+                    # Criar arquivo ZIP contendo o PDF comprimido
+                    zip_bytes = criar_zip_com_pdf(pdf_comprimido, nome_comprimido + ".pdf")
+                cache.guardar(chave_relatorio, json.dumps(relatorio).encode("utf-8"))
+                return zip_bytes
+
+            zip_bytes = resultado_tarefa("comprimir", chave, gerar_zip, "Comprimindo PDF com otimização de imagens...")
+        elif "comprimir" in st.query_params:
+            zip_bytes = resultado_tarefa("comprimir", st.query_params["comprimir"], None, "Comprimindo PDF com otimização de imagens...")
+
+        if zip_bytes is not None:
             st.success("PDF comprimido e arquivo ZIP gerado com sucesso!")
-            with open(zip_file, "rb") as f:
-                st.download_button("📥 Baixar ZIP", f, file_name=os.path.basename(zip_file))
-            os.remove("temp_input.pdf")
-            os.remove(pdf_comprimido)
-            os.remove(zip_file)
+            st.download_button("📥 Baixar ZIP", zip_bytes, file_name=nome_comprimido + ".zip")
+
+            relatorio_json = cache.obter(chave_relatorio) if file_to_compress else None
+            if relatorio_json is not None:
+                with st.expander("📈 Relatório da compressão"):
+                    exibir_relatorio_compressao(json.loads(relatorio_json))
 
-             # Mostra contador
-        total = incrementar_contador("contador.txt")
-        st.info(f"📊 Total de conversões já realizadas: {total}")
+                 # Mostra contador
+            total = registro_acessos.contar_conversao()
+            st.info(f"📊 Total de conversões já realizadas: {total}")
 
 
 # --- Aba 4: Metadados do PDF ---
 # --- Aba 4: Metadados do PDF ---
-with aba[3]:
+if aba[3].open:
+    with aba[3]:
 
-    st.header("📋 Ler Metadados do PDF")
+        st.header("📋 Ler Metadados do PDF")
     
-    uploaded_meta_pdf = st.file_uploader("Envie um PDF para extrair metadados", type="pdf", key="metadata")
+        uploaded_meta_pdf = st.file_uploader("Envie um PDF para extrair metadados", type="pdf", key="metadata")
 
-    if uploaded_meta_pdf:
+        metadados_json = None
+        if uploaded_meta_pdf:
 
-         # 🔄 Exibe animação enquanto processa
-        lottie_url = "https://assets1.lottiefiles.com/packages/lf20_3ntisyac.json"
-        lottie_animation = load_lottie_url(lottie_url)
-        with st.spinner("Lendo metadados do PDF..."):
-            if lottie_animation:
-                st_lottie(lottie_animation, height=200)
+             # 🔄 Exibe animação enquanto processa
+            lottie_animation = recursos.obter_json(URL_LOTTIE_METADADOS, reserva=ANIMACAO_METADADOS)
+            with st.spinner("Lendo metadados do PDF..."):
+                if lottie_animation:
+                    from streamlit_lottie import st_lottie
+                    st_lottie(lottie_animation, height=200)
     
-    # Aqui entra sua lógica de leitura de metadados
-        with st.spinner("Lendo metadados..."):
-            with open("meta_temp.pdf", "wb") as f:
-                f.write(uploaded_meta_pdf.read())
-
-            doc = fitz.open("meta_temp.pdf")
-            info = doc.metadata
-
-            # Tentativa robusta de identificação do autor
-            autor = info.get("author") or info.get("Author") or "Não encontrado"
-
-            # Busca por possíveis coordenadas (latitude/longitude) no conteúdo
-            lat_lon = None
-            for page in doc:
-                text = page.get_text()
-                matches = re.findall(r"([-+]?\d{1,2}\.\d+)[, ]+([-+]?\d{1,3}\.\d+)", text)
-                for lat, lon in matches:
-                    try:
-                        lat_f, lon_f = float(lat), float(lon)
-                        if -90 <= lat_f <= 90 and -180 <= lon_f <= 180:
-                            lat_lon = (lat_f, lon_f)
-                            break
-                    except:
-                        continue
-                if lat_lon:
-                    break
-
-            info_extra = {
-                "Autor (detectado)": autor,
-                "Número de páginas": doc.page_count,
-                "Permissões": doc.permissions,
-                "Protegido com senha": doc.is_encrypted,
-                "Tamanho do arquivo (bytes)": os.path.getsize("meta_temp.pdf"),
-                "Tem anotações": any(p.annots() for p in doc),
-                "Tem formulários": any(p.widgets() for p in doc),
-                "Fontes usadas": list(set(font[3] for page in doc for font in page.get_fonts(full=True))),
-            }
-
-            if lat_lon:
-                coord_str = f"{lat_lon[0]}, {lat_lon[1]}"
-                maps_url = f"https://www.google.com/maps?q={coord_str}"
-                info_extra["Coordenadas detectadas (Lat, Lon)"] = f"[{coord_str}]({maps_url})"
-            else:
-                info_extra["Coordenadas detectadas (Lat, Lon)"] = "Não encontrado"
+        # Aqui entra sua lógica de leitura de metadados
+            dados_pdf = ler_upload(uploaded_meta_pdf)
+            hash_pdf = hash_conteudo(dados_pdf)
+            chave = gerar_chave(hash_pdf, "extrair_metadados")
 
-            # Combinar metadados principais e extras
-            all_metadata = {**info, **info_extra}
+            def gerar_metadados(ws, progresso, dados_pdf=dados_pdf, hash_pdf=hash_pdf):
+                metadados = extrair_metadados(entrada_pdf(dados_pdf, ws), len(dados_pdf), progresso=progresso,
+                                              analise=analises.obter(hash_pdf))
+                return json.dumps(metadados.para_dicionario(), default=str).encode("utf-8")
+
+            metadados_json = resultado_tarefa("metadados", chave, gerar_metadados, "Lendo metadados...")
+        elif "metadados" in st.query_params:
+            metadados_json = resultado_tarefa("metadados", st.query_params["metadados"], None, "Lendo metadados...")
+
+        if metadados_json is not None:
+            all_metadata = MetadadosPDF.de_dicionario(json.loads(metadados_json)).como_dicionario()
 
             # Mostrar no app
             st.subheader("Metadados Detalhados")
-            for chave, valor in all_metadata.items():
-                st.markdown(f"**{chave}:** {valor}")
+            for chave_meta, valor in all_metadata.items():
+                st.markdown(f"**{chave_meta}:** {valor}")
 
             # Exportar CSV
-            df_meta = pd.DataFrame(list(all_metadata.items()), columns=["Campo", "Valor"])
-            csv_bytes = df_meta.to_csv(index=False).encode("utf-8")
+            buffer_csv = io.StringIO()
+            escritor_csv = csv.writer(buffer_csv, lineterminator="\n")
+            escritor_csv.writerow(["Campo", "Valor"])
+            escritor_csv.writerows(all_metadata.items())
+            csv_bytes = buffer_csv.getvalue().encode("utf-8")
             st.download_button("📥 Baixar Metadados (.csv)", data=csv_bytes, file_name="metadados.csv", mime="text/csv")
 
-            doc.close()
-            os.remove("meta_temp.pdf")
-
 
 
 # --- Aba: Verificar PDF Malicioso ---
-with aba[4]:  # Verificar PDF Malicioso
-    st.header("🛡️ Verificar PDF Malicioso")
-    pdf_suspeito = st.file_uploader("Faça upload de um PDF para análise", type="pdf", key="malware_pdf")
-
-    if pdf_suspeito:
-        with st.spinner("Analisando o documento..."):
-            with open("pdf_check.pdf", "wb") as f:
-                f.write(pdf_suspeito.read())
-
-            total_testes = 5
-            progresso_geral = st.progress(0)
-            progresso_por_teste = 1 / total_testes
-
-            resultado = {
-                "scripts_encontrados": [],
-                "anexos_suspeitos": [],
-                "obj_suspeitos": [],
-                "acoes_automaticas": [],
-                "urls_detectadas": [],
-            }
-
-            doc = fitz.open("pdf_check.pdf")
-
-            # 1. Verificar JavaScript embutido
-            st.markdown("🔍 Verificando scripts embutidos (JavaScript)...")
-            st.markdown("**Explicação:** O PDF pode conter scripts JavaScript embutidos que podem ser usados para executar código malicioso no computador do usuário.")
-            barra1 = st.progress(0)
-            for i in range(len(doc)):
-                page = doc[i]
-                text = page.get_text("text")  # Alterado de "raw" para "text"
-                if "/JS" in text or "/JavaScript" in text:
-                    resultado["scripts_encontrados"].append(f"Script JavaScript encontrado na página {i+1}")
-            barra1.progress(100)
-            progresso_geral.progress(progresso_por_teste)
-
-            # 2. Verificar objetos com ações automáticas
-            st.markdown("🔍 Verificando ações automáticas (OpenAction, /AA)...")
-            st.markdown("**Explicação:** Alguns PDFs podem ter ações automáticas configuradas, como scripts que são executados quando o PDF é aberto.")
-            barra2 = st.progress(0)
-            if "OpenAction" in doc.metadata or "/AA" in str(doc.metadata):
-                resultado["acoes_automaticas"].append("Ação automática detectada ao abrir o PDF")
-            barra2.progress(100)
-            progresso_geral.progress(progresso_por_teste * 2)
-
-            # 3. Verificar URLs embutidas
-            st.markdown("🔍 Verificando links externos (URLs)...")
-            st.markdown("**Explicação:** PDFs podem conter links externos que redirecionam o usuário para sites maliciosos.")
-            barra3 = st.progress(0)
-            for page in doc:
-                links = page.get_links()
-                for link in links:
-                    if "uri" in link:
-                        resultado["urls_detectadas"].append(link["uri"])
-            barra3.progress(100)
-            progresso_geral.progress(progresso_por_teste * 3)
-
-            # 4. Verificar anexos suspeitos
-            st.markdown("🔍 Verificando anexos suspeitos...")
-            st.markdown("**Explicação:** PDFs podem ter arquivos anexados, que podem ser executáveis ou disfarçados como outros tipos de arquivos maliciosos.")
-            barra4 = st.progress(0)
-            for i in range(len(doc)):
-                anexos = doc[i].get_text("text")  # Alterado de "raw" para "text"
-                if "EmbeddedFile" in anexos:
-                    resultado["anexos_suspeitos"].append(f"Anexo suspeito na página {i+1}")
-            barra4.progress(100)
-            progresso_geral.progress(progresso_por_teste * 4)
-
-            # 5. Verificar objetos suspeitos
-            st.markdown("🔍 Verificando objetos suspeitos (Launch, EmbeddedFiles)...")
-            st.markdown("**Explicação:** Objetos maliciosos podem estar embutidos no PDF, como arquivos executáveis ou links que podem ser usados para explorar vulnerabilidades.")
-            barra5 = st.progress(0)
-            for page in doc:
-                texto = page.get_text("text")  # Alterado de "raw" para "text"
-                if any(palavra in texto for palavra in ["Launch", "EmbeddedFiles", "/AA", "/JS", "JavaScript"]):
-                    resultado["obj_suspeitos"].append(f"Objeto suspeito detectado na página {page.number + 1}")
-            barra5.progress(100)
-            progresso_geral.progress(1.0)
-
-            doc.close()
-            os.remove("pdf_check.pdf")
-
-        # Exibição dos resultados
-        st.subheader("🔍 Resultado da Análise:")
-
-        def exibir_lista_com_icone(lista, titulo, risco="baixo"):
-            if risco == "alto":
-                cor = "🔴"
-            elif risco == "médio":
-                cor = "🟡"
-            else:
-                cor = "🟢"
-
-            if lista:
-                st.markdown(f"{cor} **{titulo}**")
-                for item in lista:
-                    st.write(f"• {item}")
-            else:
-                st.markdown(f"🟢 Nenhum {titulo.lower()} encontrado.")
-
-        # Exibir resultados com ícones
-        exibir_lista_com_icone(resultado["scripts_encontrados"], "Scripts encontrados", "alto")
-        exibir_lista_com_icone(resultado["acoes_automaticas"], "Ações automáticas", "médio")
-        exibir_lista_com_icone(resultado["urls_detectadas"], "Links externos detectados", "médio")
-        exibir_lista_com_icone(resultado["anexos_suspeitos"], "Anexos suspeitos", "alto")
-        exibir_lista_com_icone(resultado["obj_suspeitos"], "Objetos suspeitos", "médio")
+if aba[4].open:
+    with aba[4]:  # Verificar PDF Malicioso
+        st.header("🛡️ Verificar PDF Malicioso")
+        pdf_suspeito = st.file_uploader("Faça upload de um PDF para análise", type="pdf", key="malware_pdf")
+
+        resultado_json = None
+        if pdf_suspeito:
+            dados_pdf = ler_upload(pdf_suspeito)
+            hash_pdf = hash_conteudo(dados_pdf)
+            # A versão das regras entra na chave: regras novas invalidam resultados antigos
+            chave = gerar_chave(hash_pdf, "verificar_ameacas", regras=carregar_motor().versao)
+
+            def gerar_analise(ws, progresso, dados_pdf=dados_pdf, hash_pdf=hash_pdf):
+                resultado = verificar_malware_em_pdf(entrada_pdf(dados_pdf, ws), progresso=progresso,
+                                                     analise=analises.obter(hash_pdf))
+                return json.dumps(resultado).encode("utf-8")
+
+            resultado_json = resultado_tarefa("malware", chave, gerar_analise, "Analisando o documento...")
+        elif "malware" in st.query_params:
+            resultado_json = resultado_tarefa("malware", st.query_params["malware"], None, "Analisando o documento...")
+
+        if resultado_json is not None:
+            resultado = json.loads(resultado_json)
+
+            # Verificações realizadas
+            for titulo_etapa, explicacao in ETAPAS_ANALISE:
+                st.markdown(titulo_etapa)
+                st.markdown(f"**Explicação:** {explicacao}")
+
+            # Exibição dos resultados
+            st.subheader("🔍 Resultado da Análise:")
+
+            def exibir_lista_com_icone(lista, titulo, risco="baixo"):
+                if risco == "alto":
+                    cor = "🔴"
+                elif risco == "médio":
+                    cor = "🟡"
+                else:
+                    cor = "🟢"
+
+                if lista:
+                    st.markdown(f"{cor} **{titulo}**")
+                    for item in lista:
+                        st.write(f"• {item}")
+                else:
+                    st.markdown(f"🟢 Nenhum {titulo.lower()} encontrado.")
+
+            # Exibir resultados com ícones
+            exibir_lista_com_icone(resultado["scripts_encontrados"], "Scripts encontrados", "alto")
+            exibir_lista_com_icone(resultado["acoes_automaticas"], "Ações automáticas", "médio")
+            exibir_lista_com_icone(resultado["urls_detectadas"], "Links externos detectados", "médio")
+            exibir_lista_com_icone(resultado["anexos_suspeitos"], "Anexos suspeitos", "alto")
+            exibir_lista_com_icone(resultado["obj_suspeitos"], "Objetos suspeitos", "médio")
+            exibir_lista_com_icone(resultado.get("formularios", []), "Formulários", "baixo")
+            for aviso in resultado.get("analise_parcial", []):
+                st.info(f"ℹ️ Análise parcial: {aviso}")
 
 # --- Aba 6: PDF para eBook (ePub) ---
-with aba[5]:
-    st.header("📚 Converter PDF para eBook (ePub)")
-
-    uploaded_pdf_ebook = st.file_uploader("Envie um arquivo PDF para converter em ePub", type="pdf", key="ebook")
-
-    if uploaded_pdf_ebook:
-        with st.spinner("Convertendo PDF em eBook com capa, capítulos, imagens e índice..."):
-            import shutil
-            from ebooklib import epub
-            from PIL import Image, ImageDraw, ImageFont
-
-            with open("ebook_temp.pdf", "wb") as f:
-                f.write(uploaded_pdf_ebook.read())
-
-            doc = fitz.open("ebook_temp.pdf")
-            book = epub.EpubBook()
-            book.set_identifier("id123456")
-            book.set_title("eBook Convertido")
-            book.set_language("pt-BR")
-            book.add_author("Autor Desconhecido")
-
-            os.makedirs("temp_images", exist_ok=True)
-            chapters = []
-            capa_definida = False
-
-            for i, page in enumerate(doc):
-                text = page.get_text()
-                html_content = ""
-
-                # Detecta título da seção
-                title_match = re.search(r"(Prólogo|Cap(ítulo)?\.?\s*\d+|Epílogo|Introdução|Conclusão)", text, re.IGNORECASE)
-                title = title_match.group(0).strip().title() if title_match else f"Página {i+1}"
-
-                html_content += f"<h2>{title}</h2>"
-                html_content += f"<p>{text.replace(chr(10), '<br>')}</p>"
-
-                # Extrai imagens da página
-                images = page.get_images(full=True)
-                for img_index, img in enumerate(images):
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image_ext = base_image["ext"]
-
-                    image_name = f"image_{i+1}_{img_index+1}.{image_ext}"
-                    image_path = os.path.join("temp_images", image_name)
-
-                    with open(image_path, "wb") as img_file:
-                        img_file.write(image_bytes)
-
-                    # ✅ CAPA personalizada na primeira imagem da página 1
-                    if i == 0 and not capa_definida:
-                        try:
-                            img_pil = Image.open(image_path).convert("RGB")
-                            draw = ImageDraw.Draw(img_pil)
-
-                            try:
-                                font_title = ImageFont.truetype("arial.ttf", size=48)
-                                font_author = ImageFont.truetype("arial.ttf", size=32)
-                            except:
-                                font_title = ImageFont.load_default()
-                                font_author = ImageFont.load_default()
-
-                            titulo = "eBook Convertido"
-                            autor = "Autor Desconhecido"
-
-                            W, H = img_pil.size
-                            draw.text((W / 2, H / 1.5), titulo, fill="white", font=font_title, anchor="mm")
-                            draw.text((W / 2, H / 1.4 + 50), f"por {autor}", fill="white", font=font_author, anchor="mm")
-
-                            img_pil.save("capa_final.jpg", "JPEG")
-                            with open("capa_final.jpg", "rb") as capa_file:
-                                book.set_cover("capa_final.jpg", capa_file.read())
-
-                            capa_definida = True
-                            continue  # Não adicionar essa imagem no conteúdo
-                        except Exception as e:
-                            st.warning(f"Erro ao gerar capa personalizada: {e}")
-                            continue
-
-                    # Adiciona imagem ao conteúdo normalmente
-                    with open(image_path, "rb") as img_file:
-                        img_item = epub.EpubItem(
-                            uid=image_name,
-                            file_name=f"images/{image_name}",
-                            media_type=f"image/{image_ext}",
-                            content=img_file.read()
-                        )
-                        book.add_item(img_item)
-                        html_content += f'<div><img src="images/{image_name}" style="max-width: 100%;"/></div>'
-
-                chapter = epub.EpubHtml(title=title, file_name=f"page_{i+1}.xhtml", lang="pt-BR")
-                chapter.content = html_content
-                book.add_item(chapter)
-                chapters.append(chapter)
-
-            # Criar TOC (índice) estruturado em seções
-            book.spine = ['nav']
-            toc_secoes = {}
-            for chapter in chapters:
-                titulo = chapter.title.strip()
-                match = re.search(r"(Prólogo|Cap(ítulo)?\s*\d+|Epílogo|Introdução|Conclusão)", titulo, re.IGNORECASE)
-                secao = match.group(0).title() if match else "Outros"
-
-                if secao not in toc_secoes:
-                    toc_secoes[secao] = []
-                toc_secoes[secao].append(chapter)
-                book.spine.append(chapter)
-
-            # Estrutura final de índice clicável
-            toc_final = []
-            for secao, capitulos in toc_secoes.items():
-                toc_final.append(epub.Section(secao, capitulos))
-            book.toc = tuple(toc_final)
-
-            # Adiciona navegação e estilo
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-            style = 'BODY { font-family: Arial; padding: 10px; }'
-            nav_css = epub.EpubItem(uid="style_nav", file_name="style/nav.css", media_type="text/css", content=style)
-            book.add_item(nav_css)
-
-            epub_path = "saida.epub"
-            epub.write_epub(epub_path, book)
-
+if aba[5].open:
+    with aba[5]:
+        st.header("📚 Converter PDF para eBook (ePub)")
+
+        uploaded_pdf_ebook = st.file_uploader("Envie um arquivo PDF para converter em ePub", type="pdf", key="ebook")
+        rotulo_perfil = st.radio(
+            "Leitor de destino",
+            list(NOMES_PERFIS),
+            index=list(NOMES_PERFIS.values()).index(PERFIL_PADRAO),
+            horizontal=True,
+            help="As imagens são reduzidas à tela do aparelho (em tons de cinza no Kindle e no Kobo). "
+                 "Original mantém as imagens como estão no PDF.",
+        )
+        perfil = NOMES_PERFIS[rotulo_perfil]
+
+        epub_bytes = None
+        if uploaded_pdf_ebook:
+            dados_pdf = ler_upload(uploaded_pdf_ebook)
+            hash_pdf = hash_conteudo(dados_pdf)
+            chave = gerar_chave(hash_pdf, "pdf_para_epub", perfil=perfil)
+            gerar = tarefa_arquivo(gerar_epub, dados_pdf, "saida.epub", perfil=perfil, analise=analises.obter(hash_pdf))
+            epub_bytes = resultado_tarefa("ebook", chave, gerar, "Convertendo PDF em eBook com capa, capítulos, imagens e índice...")
+        elif "ebook" in st.query_params:
+            epub_bytes = resultado_tarefa("ebook", st.query_params["ebook"], None, "Convertendo PDF em eBook com capa, capítulos, imagens e índice...")
+
+        if epub_bytes is not None:
             st.success("📘 eBook gerado com capa personalizada, índice clicável e capítulos automáticos!")
-
-            with open(epub_path, "rb") as f:
-                st.download_button("📥 Baixar eBook (.epub)", f, file_name="ebook_convertido.epub")
-
-            # Limpeza
-            doc.close()
-            os.remove("ebook_temp.pdf")
-            os.remove("saida.epub")
-            if os.path.exists("capa_final.jpg"):
-                os.remove("capa_final.jpg")
-            shutil.rmtree("temp_images", ignore_errors=True)
+            st.download_button("📥 Baixar eBook (.epub)", epub_bytes, file_name="ebook_convertido.epub")
 
             # Contador
-            total = incrementar_contador("contador.txt")
+            total = registro_acessos.contar_conversao()
             st.info(f"📊 Total de conversões já realizadas: {total}")
 
 
 
 
 
-def registrar_acesso_com_log(arquivo_csv="log_acessos.csv"):
-    from datetime import datetime
-    agora = datetime.now()
-    data = agora.strftime("%Y-%m-%d")
-    hora = agora.strftime("%H:%M:%S")
-
-    # Cria o CSV se não existir
-    if not os.path.exists(arquivo_csv):
-        with open(arquivo_csv, "w") as f:
-            f.write("data,hora\n")
-
-    # Registra o acesso
-    with open(arquivo_csv, "a") as f:
-        f.write(f"{data},{hora}\n")
-
-    # Lê total de acessos
-    df = pd.read_csv(arquivo_csv)
-    return len(df), df
-
-
-total_acessos, df_acessos = registrar_acesso_com_log()
+# Conta o acesso uma vez por sessão (não a cada rerun causado por um widget)
+if not st.session_state.get("acesso_registrado"):
+    total_acessos = registro_acessos.registrar()
+    st.session_state["acesso_registrado"] = True
+else:
+    total_acessos = registro_acessos.total()
 
 st.markdown(f"<p style='text-align:right; color:#888;'>👁️ Este site já foi acessado <strong>{total_acessos}</strong> vezes.</p>", unsafe_allow_html=True)
 
 
-# st.subheader("📊 Acessos por Dia")
-
-# # Agrupa acessos por data
-# df_por_dia = df_acessos['data'].value_counts().sort_index()
-# df_por_dia = df_por_dia.rename_axis("Data").reset_index(name="Acessos")
-
-
-
-# fig, ax = plt.subplots()
-# ax.plot(df_por_dia["Data"], df_por_dia["Acessos"], marker='o')
-# ax.set_xlabel("Data")
-# ax.set_ylabel("Nº de acessos")
-# ax.set_title("Acessos ao Site por Dia")
-# plt.xticks(rotation=45)
-# st.pyplot(fig)
+# O gráfico (que carrega pandas) só roda com o painel aberto
+painel_acessos = st.expander("📊 Acessos por Dia", key="painel_acessos", on_change="rerun")
+if painel_acessos.open:
+    with painel_acessos:
+        # Totais diários já agregados no estado compartilhado
+        acessos_por_dia = registro_acessos.por_dia(DIAS_GRAFICO)
+        if acessos_por_dia:
+            st.line_chart(
+                {"Data": [data for data, _ in acessos_por_dia], "Acessos": [total for _, total in acessos_por_dia]},
+                x="Data", y="Acessos", y_label="Nº de acessos",
+            )
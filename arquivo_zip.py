@@ -0,0 +1,85 @@
+import io
+import os
+import shutil
+import zipfile
+import zlib
+
+
+# Empacotamento ZIP das saídas: cada entrada é gravada direto no buffer de
+# resposta, e o nível de compressão é escolhido pelo ganho medido numa
+# amostra. PDF, DOCX, ePub e JPEG já vêm comprimidos; deflate de novo só
+# gasta CPU para economizar poucos bytes, então esses vão armazenados.
+TAMANHO_AMOSTRA = 64 * 1024
+PEDACOS_AMOSTRA = 4
+GANHO_MINIMO = 0.05   # abaixo disto a entrada é armazenada sem compressão
+GANHO_ALTO = 0.5      # acima disto (texto, CSV, JSON) vale o nível padrão
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def _amostra(conteudo, tamanho):
+    """Pedaços espalhados pelo conteúdo: o início de um PDF é texto, o meio são streams já comprimidos."""
+    if tamanho <= TAMANHO_AMOSTRA:
+        return _ler(conteudo, 0, tamanho)
+    pedaco = TAMANHO_AMOSTRA // PEDACOS_AMOSTRA
+    passo = (tamanho - pedaco) // (PEDACOS_AMOSTRA - 1)
+    return b"".join(_ler(conteudo, i * passo, pedaco) for i in range(PEDACOS_AMOSTRA))
+
+
+def _ler(conteudo, inicio, tamanho):
+    if hasattr(conteudo, "read"):
+        conteudo.seek(inicio)
+        return conteudo.read(tamanho)
+    return bytes(conteudo[inicio:inicio + tamanho])
+
+
+def _tamanho(conteudo):
+    if hasattr(conteudo, "read"):
+        return conteudo.seek(0, os.SEEK_END)
+    return len(conteudo)
+
+
+def estimar_ganho(amostra):
+    """Fração economizada ao comprimir a amostra com o nível mais rápido."""
+    if not amostra:
+        return 0.0
+    return 1 - len(zlib.compress(amostra, 1)) / len(amostra)
+
+
+def escolher_compressao(ganho):
+    """Devolve (método, nível) para o ganho estimado."""
+    if ganho < GANHO_MINIMO:
+        return zipfile.ZIP_STORED, None
+    if ganho < GANHO_ALTO:
+        # Comprime um pouco (ex.: PDF com muito texto solto): nível rápido basta
+        return zipfile.ZIP_DEFLATED, 1
+    return zipfile.ZIP_DEFLATED, 6
+
+
+def adicionar_entrada(zipf, nome, conteudo):
+    """Grava uma entrada (bytes, memoryview ou arquivo aberto) sem copiá-la inteira para a memória."""
+    tamanho = _tamanho(conteudo)
+    zipf.compression, zipf.compresslevel = escolher_compressao(estimar_ganho(_amostra(conteudo, tamanho)))
+    with zipf.open(nome, "w", force_zip64=tamanho >= zipfile.ZIP64_LIMIT) as destino:
+        if hasattr(conteudo, "read"):
+            conteudo.seek(0)
+            shutil.copyfileobj(conteudo, destino, TAMANHO_BLOCO)
+        else:
+            destino.write(conteudo)
+    return zipf.getinfo(nome)
+
+
+def escrever_zip(destino, entradas):
+    """Grava as entradas [(nome, conteúdo), ...] como um ZIP em `destino` (arquivo aberto).
+
+    `entradas` pode ser um gerador: cada saída só é produzida quando chega a
+    vez dela, então um lote grande não precisa existir inteiro em disco.
+    """
+    with zipfile.ZipFile(destino, "w", allowZip64=True) as zipf:
+        return [adicionar_entrada(zipf, nome, conteudo) for nome, conteudo in entradas]
+
+
+def criar_zip(entradas):
+    """Como escrever_zip, mas devolve os bytes do ZIP (para o st.download_button)."""
+    buffer = io.BytesIO()
+    escrever_zip(buffer, entradas)
+    return buffer.getvalue()
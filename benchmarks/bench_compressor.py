@@ -0,0 +1,79 @@
+"""Compara os modos de compressão (tempo x bytes economizados).
+
+Uso:
+    python benchmarks/bench_compressor.py [arquivo.pdf] [--paginas 40] [--dpi 96] [--linearizar]
+
+Sem arquivo, gera um PDF sintético com fonte embutida, fotos, um logotipo
+repetido, miniaturas de página e metadados.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from compressor import MODOS, comprimir_pdf
+
+
+def _imagem(tamanho, formato, ruido):
+    buffer = io.BytesIO()
+    Image.effect_noise(tamanho, ruido).convert("RGB").save(buffer, format=formato)
+    return buffer.getvalue()
+
+
+def gerar_pdf_sintetico(paginas):
+    doc = fitz.open()
+    fonte = fitz.Font("cjk")  # fonte grande embutida: mostra o ganho do subconjunto
+    logo = _imagem((400, 200), "PNG", 10)
+    texto = "Relatório trimestral com texto corrido e números 0123456789. " * 8
+    for i in range(paginas):
+        page = doc.new_page()
+        page.insert_font(fontname="F0", fontbuffer=fonte.buffer)
+        page.insert_image(fitz.Rect(40, 30, 160, 90), stream=logo)
+        page.insert_textbox(fitz.Rect(72, 110, 520, 400), texto, fontname="F0", fontsize=10)
+        if i % 2 == 0:
+            page.insert_image(fitz.Rect(72, 420, 520, 760), stream=_imagem((1600, 1200), "JPEG", 40))
+        # Miniatura embutida, como as geradas por alguns scanners
+        miniatura = doc.get_new_xref()
+        doc.update_object(miniatura, "<<>>")
+        doc.update_stream(miniatura, bytes(64 * 80 * 3))
+        doc.xref_set_key(page.xref, "Thumb", f"{miniatura} 0 R")
+    doc.set_metadata({"title": "Relatório sintético", "author": "benchmark", "subject": "x" * 2000})
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--paginas", type=int, default=40)
+    parser.add_argument("--dpi", type=int, default=None)
+    parser.add_argument("--linearizar", action="store_true")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            dados = f.read()
+    else:
+        dados = gerar_pdf_sintetico(args.paginas)
+
+    print(f"PDF: {args.pdf or 'sintético'} ({len(dados) / 1024:.0f} KB), dpi alvo = {args.dpi}")
+    print(f"{'modo':<14}{'tempo (s)':>11}{'gravação (s)':>14}{'saída (KB)':>12}{'economia':>10}{'linear':>8}")
+    for modo in MODOS:
+        saida = io.BytesIO()
+        inicio = time.perf_counter()
+        relatorio = comprimir_pdf(dados, saida, dpi_alvo=args.dpi, modo=modo, linearizar=args.linearizar)
+        tempo = time.perf_counter() - inicio
+        tamanho = len(saida.getvalue())
+        print(f"{modo:<14}{tempo:>11.2f}{relatorio['tempo_gravacao']:>14.2f}{tamanho / 1024:>12.0f}"
+              f"{1 - tamanho / len(dados):>10.1%}{'sim' if relatorio['linearizado'] else 'não':>8}")
+
+
+if __name__ == "__main__":
+    main()
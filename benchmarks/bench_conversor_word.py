@@ -0,0 +1,80 @@
+"""Compara a conversão PDF -> DOCX serial com a paralela por blocos de páginas.
+
+Uso:
+    python benchmarks/bench_conversor_word.py [arquivo.pdf] [--paginas 120] [--workers 2 4] [--bloco 16]
+
+Sem arquivo, gera um PDF sintético com texto, tabelas simples e imagens.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from conversor_word import converter_paralelo, converter_serial
+from espaco_trabalho import EspacoTrabalho
+
+
+def gerar_pdf_sintetico(caminho, paginas):
+    doc = fitz.open()
+    paragrafo = ("Cláusula de teste com texto corrido suficiente para ocupar várias linhas "
+                 "e exercitar a análise de parágrafos do pdf2docx. ") * 6
+    for i in range(paginas):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Capítulo {i + 1}", fontsize=18)
+        page.insert_textbox(fitz.Rect(72, 80, 520, 400), paragrafo, fontsize=10)
+        for linha in range(6):
+            y = 420 + linha * 18
+            page.draw_line((72, y), (520, y))
+            page.insert_text((80, y + 13), f"Item {linha}    R$ {linha * 10:.2f}", fontsize=9)
+        page.insert_textbox(fitz.Rect(72, 560, 520, 780), paragrafo, fontsize=10)
+    doc.save(caminho)
+    doc.close()
+
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--paginas", type=int, default=120)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--bloco", type=int, default=16)
+    args = parser.parse_args()
+
+    with EspacoTrabalho("bench") as ws:
+        caminho_pdf = args.pdf
+        if not caminho_pdf:
+            caminho_pdf = ws.caminho("sintetico.pdf")
+            gerar_pdf_sintetico(caminho_pdf, args.paginas)
+
+        doc = fitz.open(caminho_pdf)
+        total_paginas = doc.page_count
+        doc.close()
+
+        print(f"PDF: {caminho_pdf} ({total_paginas} páginas), bloco = {args.bloco} páginas")
+        saida = io.BytesIO()
+        serial = medir(converter_serial, caminho_pdf, saida)
+        print(f"{'modo':<14}{'tempo (s)':>12}{'speedup':>10}{'docx (KB)':>12}")
+        print(f"{'serial':<14}{serial:>12.2f}{1.0:>10.2f}{len(saida.getvalue()) / 1024:>12.0f}")
+
+        for workers in sorted(set(args.workers)):
+            saida = io.BytesIO()
+            # A primeira chamada inclui a subida dos processos (spawn); mede as duas
+            frio = medir(converter_paralelo, caminho_pdf, saida, workers, args.bloco)
+            saida = io.BytesIO()
+            quente = medir(converter_paralelo, caminho_pdf, saida, workers, args.bloco)
+            print(f"{f'{workers} workers':<14}{quente:>12.2f}{serial / quente:>10.2f}"
+                  f"{len(saida.getvalue()) / 1024:>12.0f}   (pool frio: {frio:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Mede e confere os backends de estado compartilhado sob concorrência.
+
+Uso:
+    python benchmarks/bench_estado.py [--dynos 3] [--sessoes 8] [--incrementos 500] [--redis redis://...]
+
+Cada "dyno" é um ContadorEmLote com a própria conexão ao backend, e cada
+sessão é uma thread incrementando o mesmo contador. No fim, o valor no
+backend precisa ser exatamente dynos x sessões x incrementos. Sem --redis,
+o backend Redis é testado contra um servidor substituto local (em memória,
+só com os comandos que o aplicativo usa).
+"""
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estado_compartilhado import ContadorEmLote, criar_backend
+
+
+class ServidorRESP(socketserver.ThreadingTCPServer):
+    """Servidor mínimo do protocolo do Redis: HINCRBY, HGET, HGETALL, PING, AUTH e SELECT."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco=("127.0.0.1", 0)):
+        super().__init__(endereco, AtendimentoRESP)
+        self.hashes = {}
+        self.trava = threading.Lock()
+
+
+class AtendimentoRESP(socketserver.StreamRequestHandler):
+    def _comando(self):
+        linha = self.rfile.readline()
+        if not linha:
+            return None
+        argumentos = []
+        for _ in range(int(linha[1:])):
+            tamanho = int(self.rfile.readline()[1:])
+            argumentos.append(self.rfile.read(tamanho + 2)[:-2].decode("utf-8"))
+        return argumentos
+
+    @staticmethod
+    def _bulk(texto):
+        if texto is None:
+            return b"$-1\r\n"
+        dados = texto.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(dados), dados)
+
+    def handle(self):
+        hashes, trava = self.server.hashes, self.server.trava
+        while True:
+            comando = self._comando()
+            if comando is None:
+                return
+            nome = comando[0].upper()
+            with trava:
+                if nome == "HINCRBY":
+                    campos = hashes.setdefault(comando[1], {})
+                    campos[comando[2]] = campos.get(comando[2], 0) + int(comando[3])
+                    resposta = b":%d\r\n" % campos[comando[2]]
+                elif nome == "HGET":
+                    valor = hashes.get(comando[1], {}).get(comando[2])
+                    resposta = self._bulk(None if valor is None else str(valor))
+                elif nome == "HGETALL":
+                    itens = [texto for campo, valor in hashes.get(comando[1], {}).items() for texto in (campo, str(valor))]
+                    resposta = b"*%d\r\n" % len(itens) + b"".join(self._bulk(texto) for texto in itens)
+                elif nome in ("PING", "AUTH", "SELECT"):
+                    resposta = b"+OK\r\n"
+                else:
+                    resposta = f"-ERR comando desconhecido '{nome}'\r\n".encode("utf-8")
+            self.wfile.write(resposta)
+
+
+def medir(url, dynos, sessoes, incrementos):
+    contadores = [ContadorEmLote(criar_backend(url), intervalo_ms=100) for _ in range(dynos)]
+    latencias = []
+    trava = threading.Lock()
+
+    def sessao(contador):
+        inicio = time.perf_counter()
+        for _ in range(incrementos):
+            contador.incrementar("bench", "cliques")
+        with trava:
+            latencias.append((time.perf_counter() - inicio) / incrementos)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=sessao, args=(contador,)) for contador in contadores for _ in range(sessoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for contador in contadores:
+        contador.fechar()
+    segundos = time.perf_counter() - inicio
+    final = criar_backend(url)
+    valor = final.ler("bench", "cliques")
+    final.fechar()
+    return valor, segundos, max(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dynos", type=int, default=3)
+    parser.add_argument("--sessoes", type=int, default=8)
+    parser.add_argument("--incrementos", type=int, default=500)
+    parser.add_argument("--redis", help="URL de um Redis de verdade (padrão: servidor substituto local)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        servidor = None
+        url_redis = args.redis
+        if not url_redis:
+            servidor = ServidorRESP()
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            url_redis = f"redis://127.0.0.1:{servidor.server_address[1]}/0"
+        urls = {
+            "arquivo": "arquivo:" + os.path.join(pasta, "estado.json"),
+            "sqlite": "sqlite:" + os.path.join(pasta, "estado.sqlite3"),
+            "redis": url_redis,
+        }
+        esperado = args.dynos * args.sessoes * args.incrementos
+        print(f"{'backend':<10}{'valor':>10}{'esperado':>10}{'tempo':>9}{'µs/incremento':>16}")
+        for nome, url in urls.items():
+            valor, segundos, latencia = medir(url, args.dynos, args.sessoes, args.incrementos)
+            situacao = "" if valor == esperado else "  <-- DIVERGENTE"
+            print(f"{nome:<10}{valor:>10}{esperado:>10}{segundos:>8.2f}s{latencia * 1e6:>15.1f}{situacao}")
+        if servidor:
+            servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
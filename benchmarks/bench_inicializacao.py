@@ -0,0 +1,128 @@
+"""Mede o início a frio do app.py e o custo de importação de cada módulo.
+
+Uso:
+    python benchmarks/bench_inicializacao.py [--repeticoes 3] [--orcamento-ms 1500] [--saida inicio.json]
+
+Cada medida roda num processo novo (nada em cache na memória). O custo de
+um módulo é o tempo acumulado de `python -X importtime` para importá-lo
+depois do streamlit (que o app sempre paga). O início a frio é a primeira
+execução do app.py pelo AppTest, sem nenhuma aba processando arquivo.
+Sai com código 1 se o início passar do orçamento ou se algum módulo de
+MODULOS_SOB_DEMANDA for carregado nele.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos importados no topo do app.py e dependências das abas
+MODULOS = [
+    "streamlit",
+    "fitz",
+    "PIL.Image",
+    "arquivo_zip",
+    "cache_resultados",
+    "compressor",
+    "detector_marca_dagua",
+    "escritor_epub",
+    "espaco_trabalho",
+    "extrator_metadados",
+    "fila_tarefas",
+    "motor_regras",
+    "registro_acessos",
+    "verificador_ameacas",
+    "conversor_word",
+    "pdf2docx",
+    "pandas",
+    "requests",
+    "streamlit_lottie",
+    "matplotlib.pyplot",
+]
+# Só podem ser carregados quando uma aba processa um arquivo
+MODULOS_SOB_DEMANDA = ["pdf2docx", "conversor_word", "pandas", "matplotlib", "streamlit_lottie", "requests"]
+ORCAMENTO_MS = 1500
+
+INICIO_APP = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+inicio = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+segundos = time.perf_counter() - inicio
+print(json.dumps({{
+    "segundos": segundos,
+    "excecoes": [str(e.value) for e in at.exception],
+    "modulos": sorted(sys.modules),
+}}))
+"""
+
+
+def custo_importacao(modulo):
+    """Tempo acumulado (ms) de importar `modulo` num processo que já importou o streamlit."""
+    previo = "import streamlit; " if modulo != "streamlit" else ""
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{previo}import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True,
+    )
+    if processo.returncode != 0:
+        return None
+    # Linhas "import time: próprio | acumulado | nome"; o módulo pedido é o último de nível zero
+    for linha in reversed(processo.stderr.splitlines()):
+        if not linha.startswith("import time:"):
+            continue
+        _, acumulado, nome = (parte.strip() for parte in linha[len("import time:"):].split("|"))
+        if nome == modulo.split(".")[0] or nome == modulo:
+            return int(acumulado) / 1000
+    return 0.0
+
+
+def inicio_app():
+    with tempfile.TemporaryDirectory() as pasta:
+        # Roda numa pasta vazia: cache, estado e espaços de trabalho ficam nela
+        processo = subprocess.run(
+            [sys.executable, "-c", INICIO_APP.format(app=os.path.join(RAIZ, "app.py"))],
+            cwd=pasta, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": RAIZ},
+        )
+    if processo.returncode != 0:
+        raise RuntimeError(processo.stderr[-2000:])
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o início a frio do app e o custo de cada importação.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="fica a menor medida de cada item")
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_MS, help="limite do início a frio")
+    parser.add_argument("--saida", help="grava as medidas em JSON (para acompanhar ao longo do tempo)")
+    args = parser.parse_args()
+
+    custos = {}
+    print(f"{'módulo':<22}{'importação (ms)':>16}")
+    for modulo in MODULOS:
+        medidas = [custo_importacao(modulo) for _ in range(args.repeticoes)]
+        custos[modulo] = None if None in medidas else min(medidas)
+        texto = "não instalado" if custos[modulo] is None else f"{custos[modulo]:.1f}"
+        print(f"{modulo:<22}{texto:>16}")
+
+    execucoes = [inicio_app() for _ in range(args.repeticoes)]
+    melhor = min(execucoes, key=lambda execucao: execucao["segundos"])
+    inicio_ms = melhor["segundos"] * 1000
+    carregados = [modulo for modulo in MODULOS_SOB_DEMANDA if modulo in melhor["modulos"]]
+    print(f"\ninício a frio do app.py: {inicio_ms:.0f} ms (orçamento {args.orcamento_ms:.0f} ms)")
+    if melhor["excecoes"]:
+        print(f"exceções: {melhor['excecoes']}")
+    if carregados:
+        print(f"carregados no início sem necessidade: {', '.join(carregados)}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"importacao_ms": custos, "inicio_ms": inicio_ms, "orcamento_ms": args.orcamento_ms,
+                       "carregados_sob_demanda": carregados, "excecoes": melhor["excecoes"]}, f, indent=2)
+    dentro = inicio_ms <= args.orcamento_ms and not carregados and not melhor["excecoes"]
+    return 0 if dentro else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
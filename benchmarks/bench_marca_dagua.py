@@ -0,0 +1,115 @@
+"""Confere a detecção de marca d'água num documento com conteúdo que se repete.
+
+Uso:
+    python benchmarks/bench_marca_dagua.py [--paginas 40]
+
+Gera um relatório sintético em que todas as páginas têm o mesmo título em
+28 pt preto e o mesmo logotipo opaco (conteúdo, que precisa ficar) e três
+marcas d'água: um texto inclinado em cinza claro, um carimbo PNG com
+transparência e uma imagem opaca grande no centro da página (que precisam
+sair). Mede a detecção com a remoção e confere o resultado página a página;
+sai com código 1 se alguma conferência falhar.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+from detector_marca_dagua import remover_marca_dagua
+
+TITULO = "Relatório Anual de Atividades"
+MARCA = "CONFIDENCIAL"
+
+
+def _png(imagem):
+    buffer = io.BytesIO()
+    imagem.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def gerar_pdf_sintetico(paginas):
+    doc = fitz.open()
+    logo = _png(Image.effect_noise((240, 120), 40).convert("RGB"))
+    carimbo = Image.new("RGBA", (200, 200), (0, 0, 0, 0))
+    ImageDraw.Draw(carimbo).ellipse((10, 10, 190, 190), outline=(200, 0, 0, 120), width=12)
+    carimbo = _png(carimbo)
+    rascunho = Image.new("RGB", (400, 300), "white")
+    ImageDraw.Draw(rascunho).text((150, 140), "RASCUNHO", fill=(215, 215, 215))
+    rascunho = _png(rascunho)
+    for i in range(paginas):
+        page = doc.new_page()
+        centro = fitz.Point(page.rect.width / 2, page.rect.height / 2)
+        page.insert_image(fitz.Rect(116, 246, 496, 531), stream=rascunho)
+        page.insert_text((72, 110), TITULO, fontsize=28, fontname="hebo")
+        page.insert_image(fitz.Rect(470, 80, 540, 115), stream=logo)
+        page.insert_textbox(fitz.Rect(72, 140, 540, 700), f"Seção {i + 1}. " + "Texto corrido da seção. " * 40,
+                            fontsize=10)
+        page.insert_text((centro.x - 180, centro.y + 120), MARCA, fontsize=60, color=(0.75, 0.75, 0.75),
+                         morph=(centro, fitz.Matrix(-35)))
+        page.insert_image(fitz.Rect(460, 660, 540, 740), stream=carimbo)
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def conferir(original, limpo):
+    """Lista de (conferência, páginas em que passou, total de páginas)."""
+    antes, depois = fitz.open(stream=original), fitz.open(stream=limpo)
+    try:
+        total = depois.page_count
+        contagens = {
+            "título repetido mantido": 0,
+            "logotipo mantido": 0,
+            "texto da página mantido": 0,
+            "texto inclinado removido": 0,
+            "carimbo transparente removido": 0,
+            "imagem grande no centro removida": 0,
+        }
+        for numero in range(total):
+            pagina, pagina_antes = depois[numero], antes[numero]
+            texto = pagina.get_text()
+            # Uma imagem removida vira um pixel transparente no mesmo lugar
+            caixas = [fitz.Rect(info["bbox"]) for info in pagina.get_image_info() if info["width"] > 1]
+            contagens["título repetido mantido"] += TITULO in texto
+            contagens["logotipo mantido"] += any(abs(caixa.x0 - 470) < 1 for caixa in caixas)
+            contagens["texto da página mantido"] += f"Seção {numero + 1}." in texto and (
+                texto.count("Texto corrido") == pagina_antes.get_text().count("Texto corrido"))
+            contagens["texto inclinado removido"] += MARCA not in texto
+            contagens["carimbo transparente removido"] += not any(abs(caixa.x0 - 460) < 1 for caixa in caixas)
+            contagens["imagem grande no centro removida"] += not any(abs(caixa.x0 - 116) < 1 for caixa in caixas)
+        return [(nome, passou, total) for nome, passou in contagens.items()]
+    finally:
+        antes.close()
+        depois.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paginas", type=int, default=40)
+    args = parser.parse_args()
+
+    pdf = gerar_pdf_sintetico(args.paginas)
+    saida = io.BytesIO()
+    inicio = time.perf_counter()
+    relatorio = remover_marca_dagua(pdf, saida)
+    segundos = time.perf_counter() - inicio
+
+    print(f"{args.paginas} páginas em {segundos:.2f}s; marcas detectadas:")
+    for marca in relatorio["marcas"]:
+        print(f"  {marca['tipo']:<8}{marca['paginas']:>5} páginas  {marca['descricao']}")
+    falhas = 0
+    for nome, passou, total in conferir(pdf, saida.getvalue()):
+        situacao = "ok" if passou == total else "FALHOU"
+        falhas += passou != total
+        print(f"{nome:<36}{passou:>5}/{total}  {situacao}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
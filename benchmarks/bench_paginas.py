@@ -0,0 +1,84 @@
+"""Compara as leituras página a página num processo e divididas entre processos.
+
+Uso:
+    python benchmarks/bench_paginas.py [arquivo.pdf] [--paginas 1200] [--workers 4]
+
+Sem arquivo, gera um livro sintético com texto em vários tamanhos, títulos,
+anotações e um logotipo repetido. Para cada caminho (metadados, texto do
+ePub e imagens da compressão) mede o tempo com 1 worker e com --workers, e
+confere que os resultados são idênticos. O ganho depende dos núcleos livres.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import paginas_paralelas
+from compressor import imagens_da_pagina
+from escritor_epub import blocos_pagina
+from extrator_metadados import resumir_pagina
+
+
+def gerar_pdf_sintetico(paginas):
+    doc = fitz.open()
+    buffer = io.BytesIO()
+    Image.effect_noise((300, 150), 20).convert("RGB").save(buffer, format="PNG")
+    logo = buffer.getvalue()
+    paragrafo = "Texto corrido de um livro longo, com frases completas e hifeni-\nzação no fim da linha. " * 12
+    for i in range(paginas):
+        page = doc.new_page()
+        if i % 20 == 0:
+            page.insert_text((72, 80), f"Capítulo {i // 20 + 1}", fontsize=22, fontname="hebo")
+        page.insert_textbox(fitz.Rect(72, 110, 520, 700), paragrafo, fontsize=10)
+        page.insert_image(fitz.Rect(40, 720, 160, 780), stream=logo)
+        if i % 50 == 0:
+            page.add_text_annot((500, 60), "nota")
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def medir(pdf, funcao, argumentos, workers):
+    inicio = time.perf_counter()
+    resultados = [resultado for _, resultado in paginas_paralelas.mapear_paginas(pdf, funcao, *argumentos,
+                                                                                 workers=workers)]
+    return time.perf_counter() - inicio, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--paginas", type=int, default=1200)
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    if args.pdf:
+        pdf = args.pdf
+    else:
+        pdf = gerar_pdf_sintetico(args.paginas)
+    paginas_paralelas.MIN_PAGINAS_PARALELO = 1
+    caminhos = {
+        "metadados": (resumir_pagina, ()),
+        "texto do ePub": (blocos_pagina, ()),
+        "imagens (dpi)": (imagens_da_pagina, (True,)),
+    }
+    # Sobe os workers antes de medir (o custo de criar processos fica fora)
+    medir(pdf, resumir_pagina, (), args.workers)
+
+    print(f"{os.cpu_count()} núcleos, {args.workers} workers")
+    print(f"{'caminho':<16}{'1 worker':>10}{'paralelo':>10}{'ganho':>8}  resultado")
+    for nome, (funcao, argumentos) in caminhos.items():
+        serial, esperado = medir(pdf, funcao, argumentos, 1)
+        paralelo, obtido = medir(pdf, funcao, argumentos, args.workers)
+        situacao = "idêntico" if obtido == esperado else "DIVERGENTE"
+        print(f"{nome:<16}{serial:>9.2f}s{paralelo:>9.2f}s{serial / paralelo:>7.1f}x  {situacao}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+
+# Cache de resultados em disco, compartilhado entre sessões do Streamlit.
+# A chave é o SHA-256 do arquivo enviado + operação + parâmetros, então um
+# rerun (ou o mesmo PDF enviado por outro usuário) devolve o artefato pronto.
+DIRETORIO_CACHE = os.environ.get("SUITE_PDF_CACHE_DIR", os.path.join(".cache", "resultados"))
+LIMITE_CACHE_MB = int(os.environ.get("SUITE_PDF_CACHE_MB", "512"))
+# Toda chave é um SHA-256 em hex: qualquer outra coisa (vinda da URL, por
+# exemplo) nunca vira caminho de arquivo
+RE_CHAVE = re.compile(r"[0-9a-f]{64}")
+
+
+def hash_conteudo(dados):
+    """Retorna o SHA-256 (hex) dos bytes enviados."""
+    return hashlib.sha256(dados).hexdigest()
+
+
+def chave_valida(chave):
+    """Se `chave` tem o formato das chaves geradas por gerar_chave()."""
+    return isinstance(chave, str) and RE_CHAVE.fullmatch(chave) is not None
+
+
+def gerar_chave(dados_ou_hash, operacao, **parametros):
+    """Monta a chave do cache a partir do conteúdo, da operação e dos parâmetros."""
+    if isinstance(dados_ou_hash, str):
+        hash_arquivo = dados_ou_hash
+    else:
+        hash_arquivo = hash_conteudo(dados_ou_hash)
+    params = json.dumps(parametros, sort_keys=True, default=str)
+    return hashlib.sha256(f"{hash_arquivo}|{operacao}|{params}".encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """Cache LRU em disco com limite de tamanho total."""
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, limite_bytes=LIMITE_CACHE_MB * 1024 * 1024):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        self._indice = OrderedDict()  # chave -> tamanho, do menos para o mais recente
+        self._total = 0
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._carregar_indice()
+
+    def _caminho(self, chave):
+        if not chave_valida(chave):
+            raise ValueError(f"Chave de cache inválida: {chave!r}")
+        return os.path.join(self.diretorio, chave[:2], chave)
+
+    def _carregar_indice(self):
+        # Reconstrói a ordem LRU a partir do mtime (atualizado a cada acerto)
+        entradas = []
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                if not chave_valida(nome):
+                    continue  # temporários e arquivos estranhos ao cache
+                caminho = os.path.join(raiz, nome)
+                try:
+                    st_arq = os.stat(caminho)
+                except OSError:
+                    continue
+                entradas.append((st_arq.st_mtime, nome, st_arq.st_size))
+        for _, chave, tamanho in sorted(entradas):
+            self._indice[chave] = tamanho
+            self._total += tamanho
+
+    def obter(self, chave):
+        """Retorna os bytes guardados ou None."""
+        if not chave_valida(chave):
+            return None
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+        except OSError:
+            with self._lock:
+                tamanho = self._indice.pop(chave, None)
+                if tamanho is not None:
+                    self._total -= tamanho
+            return None
+
+        with self._lock:
+            if chave in self._indice:
+                self._indice.move_to_end(chave)
+            else:
+                # Gravado por outro processo (outro worker do servidor)
+                self._indice[chave] = len(dados)
+                self._total += len(dados)
+        try:
+            os.utime(caminho, None)
+        except OSError:
+            pass
+        return dados
+
+    def guardar(self, chave, dados):
+        """Grava o artefato de forma atômica e aplica o despejo LRU. Devolve se guardou."""
+        if len(dados) > self.limite_bytes:
+            return False
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+
+        with self._lock:
+            anterior = self._indice.pop(chave, None)
+            if anterior is not None:
+                self._total -= anterior
+            self._indice[chave] = len(dados)
+            self._total += len(dados)
+            self._despejar()
+        return True
+
+    def _despejar(self):
+        while self._total > self.limite_bytes and self._indice:
+            chave, tamanho = self._indice.popitem(last=False)
+            self._total -= tamanho
+            try:
+                os.remove(self._caminho(chave))
+            except OSError:
+                pass
+
+    def obter_ou_gerar(self, chave, gerar):
+        """Devolve (dados, veio_do_cache); chama gerar() só quando não há acerto."""
+        dados = self.obter(chave)
+        if dados is not None:
+            return dados, True
+        dados = gerar()
+        if dados is not None:
+            self.guardar(chave, dados)
+        return dados, False
+
+    def tamanho_total(self):
+        with self._lock:
+            return self._total
@@ -0,0 +1,473 @@
+import io
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops
+
+from espaco_trabalho import EspacoTrabalho, abrir_pdf
+from paginas_paralelas import mapear_paginas, paralelizar
+
+
+# Compressão de PDF: as imagens são recomprimidas uma única vez por xref
+# (um logotipo repetido em 300 páginas é o mesmo objeto) e a recodificação
+# roda em paralelo, já que o Pillow libera o GIL ao decodificar/codificar.
+WORKERS = int(os.environ.get("SUITE_PDF_COMPRESSOR_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+QUALIDADE_JPEG = 50
+
+# Resolução alvo das imagens, considerando o tamanho em que aparecem na página
+PRESETS_DPI = {
+    "Sem redução": None,
+    "Impressão (150 dpi)": 150,
+    "Tela (96 dpi)": 96,
+    "Mínimo (72 dpi)": 72,
+}
+# Só reduz quando a imagem passa do alvo por uma margem (evita reamostrar à toa)
+TOLERANCIA_DPI = 1.1
+
+# Classificação das imagens (ver classificar_imagem)
+LIMITE_DIFERENCA_CINZA = 8   # diferença máxima entre canais para considerar cinza
+FRACAO_BILEVEL = 0.98        # fração de pixels quase preto/branco para virar 1 bit
+MAX_CORES_TRACO = 64         # cores principais de uma imagem colorida de traço (e da paleta gerada)
+MAX_CORES_AMOSTRA = 4096     # com mais cores que isso na amostra, é foto
+FRACAO_TRACO = 0.9           # fração de pixels nos extremos para cinza ser tratado como traço
+# Sem redução de resolução, só troca uma imagem se o ganho passar disto
+GANHO_MINIMO = 0.05
+
+# Modos de gravação: quanto mais agressivo, mais CPU gasto depois das imagens
+MODOS = {
+    # Só descarta objetos soltos e comprime streams que estão sem compressão
+    "rapido": {
+        "salvar": {"garbage": 1, "deflate": True},
+        "subconjunto_fontes": False, "remover_miniaturas": False, "remover_metadados": False,
+    },
+    # Junta objetos duplicados, limpa recursos não usados e empacota em object streams
+    "equilibrado": {
+        "salvar": {"garbage": 3, "deflate": True, "clean": True, "use_objstms": 1},
+        "subconjunto_fontes": False, "remover_miniaturas": True, "remover_metadados": False,
+    },
+    # Tudo acima, mais subconjunto de fontes, streams duplicados e esforço máximo no Flate
+    "maximo": {
+        "salvar": {
+            "garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True,
+            "clean": True, "use_objstms": 1, "compression_effort": 100,
+        },
+        "subconjunto_fontes": True, "remover_miniaturas": True, "remover_metadados": True,
+    },
+}
+NOMES_MODOS = {"Rápido": "rapido", "Equilibrado": "equilibrado", "Máximo": "maximo"}
+MODO_PADRAO = "equilibrado"
+
+# O MuPDF deixou de linearizar na 1.24; o "fast web view" fica com o qpdf, se instalado
+QPDF = os.environ.get("SUITE_PDF_QPDF", "qpdf")
+TIMEOUT_LINEARIZAR = 300
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def _pool(workers):
+    # Um pool por tamanho, reaproveitado entre compressões e sessões
+    with _lock_pools:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="suite_pdf_imagens")
+            _pools[workers] = pool
+        return pool
+
+
+def imagens_da_pagina(page, medir_dpi=False):
+    """(xrefs das imagens da página, {xref: menor DPI efetivo na página})."""
+    xrefs = [img[0] for img in page.get_images(full=True)]
+    dpis = {}
+    if medir_dpi:
+        for info in page.get_image_info(xrefs=True):
+            xref = info["xref"]
+            if not xref:
+                continue  # imagem inline
+            # Comprimento dos lados da imagem na página, em polegadas (72 pt),
+            # a partir da matriz de transformação (vale também para rotação)
+            a, b, c, d = info["transform"][:4]
+            largura_pol = math.hypot(a, b) / 72
+            altura_pol = math.hypot(c, d) / 72
+            if largura_pol <= 0 or altura_pol <= 0:
+                continue
+            dpi = min(info["width"] / largura_pol, info["height"] / altura_pol)
+            dpis[xref] = min(dpis.get(xref, dpi), dpi)
+    return xrefs, dpis
+
+
+def coletar_imagens(doc, medir_dpi=False, pdf=None):
+    """Percorre as páginas uma vez e devolve (ocorrencias, dpis).
+
+    ocorrencias: {xref: número de páginas em que a imagem aparece}, na ordem do documento.
+    dpis: {xref: menor DPI efetivo entre todas as posições em que é desenhada}
+    (só calculado com medir_dpi=True, pois exige interpretar o conteúdo da página).
+    Com `pdf` (o caminho ou os bytes de `doc`), documentos grandes são lidos em vários processos.
+    """
+    if pdf is not None and paralelizar(doc.page_count):
+        paginas = (resultado for _, resultado in mapear_paginas(pdf, imagens_da_pagina, medir_dpi,
+                                                                 paginas=range(doc.page_count)))
+    else:
+        paginas = (imagens_da_pagina(page, medir_dpi) for page in doc)
+    ocorrencias = {}
+    dpis = {}
+    for xrefs, dpis_pagina in paginas:
+        for xref in xrefs:
+            ocorrencias[xref] = ocorrencias.get(xref, 0) + 1
+        for xref, dpi in dpis_pagina.items():
+            dpis[xref] = min(dpis.get(xref, dpi), dpi)
+    return ocorrencias, dpis
+
+
+def escala_para_dpi(dpi_efetivo, dpi_alvo):
+    """Fator de redução (<= 1) para levar a imagem ao DPI alvo."""
+    if not dpi_alvo or not dpi_efetivo or dpi_efetivo <= dpi_alvo * TOLERANCIA_DPI:
+        return 1.0
+    return dpi_alvo / dpi_efetivo
+
+
+def abrir_amostra(image_bytes, lado=1024):
+    """Abre a imagem para classificar, sem reamostragem que crie tons intermediários.
+
+    Só JPEGs chegam reduzidos (pelo decodificador, nunca abaixo de `lado`);
+    classificar_imagem tira dela a amostra por vizinho mais próximo.
+    """
+    image_pil = Image.open(io.BytesIO(image_bytes))
+    if image_pil.format == "JPEG":
+        image_pil.draft(image_pil.mode, (lado, lado))
+    image_pil.load()
+    return image_pil
+
+
+def abrir_reduzida(image_bytes, escala=1.0):
+    """Abre a imagem já reduzida por `escala` (<= 1)."""
+    image_pil = Image.open(io.BytesIO(image_bytes))
+    if escala >= 1.0:
+        image_pil.load()
+        return image_pil
+    largura, altura = image_pil.size
+    alvo = (max(1, round(largura * escala)), max(1, round(altura * escala)))
+    # JPEG: o decodificador já entrega 1/2, 1/4 ou 1/8 do tamanho, então
+    # a imagem grande nunca é decodificada por inteiro na memória
+    image_pil.draft(image_pil.mode, alvo)
+    if image_pil.mode not in ("1", "L", "RGB"):
+        image_pil = image_pil.convert("RGB")
+    if image_pil.size != alvo:
+        image_pil = image_pil.resize(alvo, Image.LANCZOS)
+    return image_pil
+
+
+def classificar_imagem(image_pil):
+    """Classifica a imagem: "alfa", "bilevel", "cinza_traco", "cinza_foto", "cor_traco" ou "cor_foto"."""
+    if "A" in image_pil.getbands() or "transparency" in image_pil.info:
+        return "alfa"
+    if image_pil.mode == "1":
+        return "bilevel"
+
+    # Amostra pequena sem interpolação, para não criar tons intermediários
+    largura, altura = image_pil.size
+    fator = max(1, max(largura, altura) // 256)
+    amostra = image_pil.resize((max(1, largura // fator), max(1, altura // fator)), Image.NEAREST)
+    amostra = amostra.convert("RGB")
+
+    r, g, b = amostra.split()
+    diferenca = max(ImageChops.difference(r, g).getextrema()[1], ImageChops.difference(g, b).getextrema()[1])
+    cinza = diferenca <= LIMITE_DIFERENCA_CINZA
+
+    histograma = amostra.convert("L").histogram()
+    extremos = sum(histograma[:48]) + sum(histograma[208:])
+    if cinza and extremos >= FRACAO_BILEVEL * sum(histograma):
+        return "bilevel"
+
+    # Traço (texto, gráficos, diagramas): em cinza, quase tudo é fundo ou tinta
+    # (o antisserrilhado só cria tons nas bordas)
+    if cinza:
+        return "cinza_traco" if extremos >= FRACAO_TRACO * sum(histograma) else "cinza_foto"
+    # Em cor, traço é quase tudo em poucas cores (o antisserrilhado fica nas bordas)
+    cores = amostra.getcolors(maxcolors=MAX_CORES_AMOSTRA)
+    if cores is None:
+        return "cor_foto"
+    principais = sum(sorted((contagem for contagem, _ in cores), reverse=True)[:MAX_CORES_TRACO])
+    return "cor_traco" if principais >= FRACAO_TRACO * sum(histograma) else "cor_foto"
+
+
+def _flate_png(image_pil):
+    """Codifica com Flate + preditor PNG (o IDAT do PNG é um stream FlateDecode válido).
+
+    Devolve (dados, bits por componente), já que o PNG de uma imagem com
+    paleta pequena usa 1, 2 ou 4 bits.
+    """
+    buffer = io.BytesIO()
+    image_pil.save(buffer, format="PNG", optimize=True)
+    png = buffer.getvalue()
+    bits = png[24]  # profundidade no IHDR
+    dados = []
+    posicao = 8  # assinatura PNG
+    while posicao < len(png):
+        tamanho = int.from_bytes(png[posicao:posicao + 4], "big")
+        tipo = png[posicao + 4:posicao + 8]
+        if tipo == b"IDAT":
+            dados.append(png[posicao + 8:posicao + 8 + tamanho])
+        posicao += 12 + tamanho
+    return b"".join(dados), bits
+
+
+def codificar_imagem(image_pil, classe):
+    """Gera o candidato mais barato para a classe da imagem."""
+    if classe == "bilevel":
+        imagem = image_pil.convert("L").point(lambda v: 255 if v >= 128 else 0).convert("1", dither=Image.Dither.NONE)
+        cores, espaco_cor, filtro = 1, "/DeviceGray", "/FlateDecode"
+    elif classe == "cinza_traco":
+        imagem = image_pil.convert("L")
+        cores, espaco_cor, filtro = 1, "/DeviceGray", "/FlateDecode"
+    elif classe == "cor_traco":
+        # Paleta com as poucas cores do traço (a redução cria tons nas bordas)
+        imagem = image_pil.convert("RGB").quantize(colors=MAX_CORES_TRACO, dither=Image.Dither.NONE)
+        paleta = imagem.getpalette()[:3 * (imagem.getextrema()[1] + 1)]
+        cores, espaco_cor, filtro = 1, f"[/Indexed/DeviceRGB {len(paleta) // 3 - 1}<{bytes(paleta).hex()}>]", "/FlateDecode"
+    elif classe == "cinza_foto":
+        imagem = image_pil.convert("L")
+        espaco_cor, filtro = "/DeviceGray", "/DCTDecode"
+    else:
+        imagem = image_pil.convert("RGB")
+        espaco_cor, filtro = "/DeviceRGB", "/DCTDecode"
+
+    largura, altura = imagem.size
+    if filtro == "/DCTDecode":
+        # Salva a imagem com compressão para reduzir o tamanho
+        buffer = io.BytesIO()
+        imagem.save(buffer, format="JPEG", quality=QUALIDADE_JPEG)
+        return {
+            "dados": buffer.getvalue(), "filtro": filtro, "espaco_cor": espaco_cor, "bits": 8,
+            "largura": largura, "altura": altura, "decode_parms": "null",
+        }
+    dados, bits = _flate_png(imagem)
+    return {
+        "dados": dados, "filtro": filtro, "espaco_cor": espaco_cor, "bits": bits,
+        "largura": largura, "altura": altura,
+        "decode_parms": f"<</Predictor 15/Colors {cores}/BitsPerComponent {bits}/Columns {largura}>>",
+    }
+
+
+def recomprimir_imagem(image_bytes, escala=1.0):
+    """Classifica e recodifica a imagem. Devolve (candidato ou None, classe, segundos)."""
+    inicio = time.perf_counter()
+    # Classifica a imagem de origem: o Lanczos da redução cria tons de cinza
+    # nas bordas, e traço ou scan de 1 bit pareceriam foto
+    classe = classificar_imagem(abrir_amostra(image_bytes))
+    if classe == "alfa":
+        return None, classe, time.perf_counter() - inicio
+    image_pil = abrir_reduzida(image_bytes, escala)
+    return codificar_imagem(image_pil, classe), classe, time.perf_counter() - inicio
+
+
+def _tentar_recomprimir(args):
+    try:
+        return recomprimir_imagem(*args)
+    except Exception:
+        return None
+
+
+def substituir_imagem(doc, xref, candidato):
+    """Troca o stream da imagem direto no xref (vale para todas as páginas que a usam)."""
+    doc.update_stream(xref, candidato["dados"], compress=0)
+    doc.xref_set_key(xref, "Filter", candidato["filtro"])
+    doc.xref_set_key(xref, "ColorSpace", candidato["espaco_cor"])
+    doc.xref_set_key(xref, "BitsPerComponent", str(candidato["bits"]))
+    doc.xref_set_key(xref, "Width", str(candidato["largura"]))
+    doc.xref_set_key(xref, "Height", str(candidato["altura"]))
+    doc.xref_set_key(xref, "DecodeParms", candidato["decode_parms"])
+    doc.xref_set_key(xref, "Decode", "null")
+
+
+def _eh_mascara(doc, xref):
+    # Máscaras de estêncil (1 bit) não podem virar JPEG colorido
+    return doc.xref_get_key(xref, "ImageMask")[1] == "true"
+
+
+def comprimir_pdf(pdf, saida, progresso=None, workers=None, dpi_alvo=None, modo=MODO_PADRAO, linearizar=False):
+    """Comprime o PDF e devolve um relatório com tamanhos e tempos.
+
+    Com dpi_alvo, imagens exibidas acima dessa resolução são reduzidas; `modo`
+    é uma das chaves de MODOS e `linearizar` pede saída "fast web view".
+    """
+    inicio_total = time.perf_counter()
+    doc = abrir_pdf(pdf)
+
+    # 1. Conjunto de imagens únicas do documento inteiro
+    if progresso:
+        progresso(0.0, "Localizando imagens...")
+    ocorrencias, dpis = coletar_imagens(doc, medir_dpi=bool(dpi_alvo), pdf=pdf)
+
+    # 2. Extração (PyMuPDF não é thread-safe, então fica nesta thread)
+    inicio = time.perf_counter()
+    originais = {}
+    tamanhos = {}
+    for xref in ocorrencias:
+        if _eh_mascara(doc, xref):
+            continue
+        try:
+            originais[xref] = doc.extract_image(xref)["image"]
+            # Tamanho real do stream no arquivo, que é o que o candidato precisa vencer
+            tamanhos[xref] = len(doc.xref_stream_raw(xref))
+        except Exception:
+            originais.pop(xref, None)
+            continue
+    tempo_extracao = time.perf_counter() - inicio
+
+    # 3. Classificação e recompressão em paralelo
+    if progresso:
+        progresso(0.1, f"Recomprimindo {len(originais)} imagens únicas...")
+    inicio = time.perf_counter()
+    escalas = {xref: escala_para_dpi(dpis.get(xref), dpi_alvo) for xref in originais}
+    tarefas = [(image_bytes, escalas[xref]) for xref, image_bytes in originais.items()]
+    workers = workers or WORKERS
+    if workers > 1:
+        resultados = _pool(workers).map(_tentar_recomprimir, tarefas)
+    else:
+        resultados = map(_tentar_recomprimir, tarefas)
+    novas = {}
+    imagens = []
+    tempo_cpu = 0.0
+    for numero, (xref, resultado) in enumerate(zip(originais, resultados), start=1):
+        if progresso:
+            progresso(0.1 + 0.75 * numero / len(originais), f"Imagem {numero} de {len(originais)}")
+        if resultado is None:
+            continue
+        candidato, classe, segundos = resultado
+        tempo_cpu += segundos
+        antes = tamanhos[xref]
+        depois = len(candidato["dados"]) if candidato else None
+
+        # Nunca deixa a imagem maior; sem redução, exige um ganho mínimo para
+        # não recomprimir à toa um JPEG que já está bom
+        limite = antes if escalas[xref] < 1.0 else antes * (1 - GANHO_MINIMO)
+        substituir = depois is not None and depois < limite
+        if substituir:
+            novas[xref] = candidato
+        imagens.append({
+            "xref": xref,
+            "classe": classe,
+            "codec": _descrever_codec(candidato) if substituir else "original",
+            "pixels": f"{candidato['largura']}x{candidato['altura']}" if candidato else "",
+            "ocorrencias": ocorrencias[xref],
+            "bytes_antes": antes,
+            "bytes_depois": depois if substituir else antes,
+        })
+    tempo_recompressao = time.perf_counter() - inicio
+
+    # 4. Aplica tudo de uma vez
+    for xref, candidato in novas.items():
+        substituir_imagem(doc, xref, candidato)
+
+    # 5. Limpeza e gravação conforme o modo
+    if progresso:
+        progresso(0.9, "Otimizando e salvando PDF...")
+    inicio = time.perf_counter()
+    configuracao = MODOS[modo]
+    limpeza = otimizar_documento(doc, configuracao)
+    linearizado = gravar_pdf(doc, saida, configuracao["salvar"], linearizar)
+    doc.close()
+    tempo_gravacao = time.perf_counter() - inicio
+    if linearizar and not linearizado and progresso:
+        progresso(aviso="Não foi possível linearizar o PDF (qpdf não encontrado); o arquivo foi salvo sem linearização.")
+
+    total_ocorrencias = sum(imagem["ocorrencias"] for imagem in imagens)
+    tempo_medio = tempo_cpu / len(imagens) if imagens else 0.0
+    return {
+        "imagens_unicas": len(imagens),
+        "imagens_substituidas": len(novas),
+        "ocorrencias": total_ocorrencias,
+        "imagens_reduzidas": sum(1 for xref in novas if escalas[xref] < 1.0),
+        "dpi_alvo": dpi_alvo,
+        "bytes_imagens_antes": sum(imagem["bytes_antes"] for imagem in imagens),
+        "bytes_imagens_depois": sum(imagem["bytes_depois"] for imagem in imagens),
+        "imagens": imagens,
+        "tempo_extracao": tempo_extracao,
+        "modo": modo,
+        "linearizado": linearizado,
+        **limpeza,
+        "tempo_recompressao": tempo_recompressao,
+        "tempo_gravacao": tempo_gravacao,
+        "tempo_cpu_recompressao": tempo_cpu,
+        # Quanto custaria recomprimir cada ocorrência, como antes, em série
+        "economia_deduplicacao": tempo_medio * (total_ocorrencias - len(imagens)),
+        "economia_paralelismo": max(tempo_cpu - tempo_recompressao, 0.0),
+        "tempo_total": time.perf_counter() - inicio_total,
+    }
+
+
+def _descrever_codec(candidato):
+    if candidato["filtro"] == "/DCTDecode":
+        codec = "JPEG"
+    else:
+        codec = "Flate"
+    if candidato["bits"] == 1:
+        return f"{codec} 1 bit"
+    if candidato["espaco_cor"] == "/DeviceGray":
+        return f"{codec} cinza"
+    if candidato["espaco_cor"].startswith("[/Indexed"):
+        return f"{codec} paleta"
+    return codec
+
+
+def otimizar_documento(doc, configuracao):
+    """Aplica as etapas de limpeza do modo antes de gravar e diz o que foi feito."""
+    miniaturas = 0
+    if configuracao["remover_miniaturas"]:
+        for page in doc:
+            if doc.xref_get_key(page.xref, "Thumb")[0] != "null":
+                doc.xref_set_key(page.xref, "Thumb", "null")
+                miniaturas += 1
+    if configuracao["remover_metadados"]:
+        doc.set_metadata({})
+        doc.del_xml_metadata()
+    if configuracao["subconjunto_fontes"]:
+        # Mantém nas fontes embutidas só os glifos usados no texto
+        doc.subset_fonts()
+    return {
+        "miniaturas_removidas": miniaturas,
+        "metadados_removidos": configuracao["remover_metadados"],
+        "fontes_subconjunto": configuracao["subconjunto_fontes"],
+    }
+
+
+def gravar_pdf(doc, saida, opcoes, linearizar=False):
+    """Grava o documento em `saida` (caminho ou arquivo aberto). Devolve True se ficou linearizado."""
+    if not linearizar:
+        doc.save(saida, **opcoes)
+        return False
+    dados = doc.tobytes(**opcoes)
+    linearizado = linearizar_pdf(dados)
+    if isinstance(saida, (str, os.PathLike)):
+        with open(saida, "wb") as f:
+            f.write(linearizado or dados)
+    else:
+        saida.write(linearizado or dados)
+    return linearizado is not None
+
+
+def linearizar_pdf(dados):
+    """Lineariza com o qpdf; devolve None se o qpdf não estiver disponível ou falhar."""
+    qpdf = shutil.which(QPDF)
+    if qpdf is None:
+        return None
+    with EspacoTrabalho("linearizar") as ws:
+        entrada, saida = ws.caminho("entrada.pdf"), ws.caminho("saida.pdf")
+        with open(entrada, "wb") as f:
+            f.write(dados)
+        try:
+            processo = subprocess.run([qpdf, "--linearize", entrada, saida],
+                                      capture_output=True, timeout=TIMEOUT_LINEARIZAR)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        # 3 = concluído com avisos
+        if processo.returncode not in (0, 3) or not os.path.exists(saida):
+            return None
+        with open(saida, "rb") as f:
+            return f.read()
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf2docx import Converter
+
+from espaco_trabalho import EspacoTrabalho, abrir_pdf
+
+
+# Conversão PDF -> DOCX em paralelo: as páginas são divididas em blocos
+# contíguos, cada processo analisa um bloco (a parte cara do pdf2docx) e o
+# processo principal junta os layouts na ordem original e gera um único DOCX.
+WORKERS = int(os.environ.get("SUITE_PDF_WORD_WORKERS", "0")) or os.cpu_count() or 1
+PAGINAS_POR_BLOCO = int(os.environ.get("SUITE_PDF_WORD_PAGINAS_POR_BLOCO", "16"))
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def _pool(workers):
+    # Um pool por tamanho, reaproveitado entre conversões e sessões. "spawn"
+    # porque o servidor do Streamlit tem várias threads e fork não é seguro.
+    with _lock_pools:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        return pool
+
+
+def _abrir_conversor(pdf):
+    if isinstance(pdf, str):
+        return Converter(pdf)
+    return Converter(stream=pdf)
+
+
+def dividir_paginas(total_paginas, paginas_por_bloco):
+    """Divide [0, total) em intervalos contíguos (inicio, fim)."""
+    paginas_por_bloco = max(1, paginas_por_bloco)
+    return [(inicio, min(inicio + paginas_por_bloco, total_paginas))
+            for inicio in range(0, total_paginas, paginas_por_bloco)]
+
+
+def _analisar_bloco(args):
+    caminho_pdf, inicio, fim = args
+    cv = Converter(caminho_pdf)
+    try:
+        configuracoes = cv.default_settings
+        cv.load_pages(inicio, fim)
+        cv.parse_document(**configuracoes).parse_pages(**configuracoes)
+        return cv.store()
+    finally:
+        cv.close()
+
+
+def converter_serial(pdf, saida):
+    """Caminho original: uma única chamada ao pdf2docx, em um núcleo."""
+    cv = _abrir_conversor(pdf)
+    cv.convert(saida, start=0, end=None)
+    cv.close()
+
+
+def converter_paralelo(caminho_pdf, saida, workers=WORKERS, paginas_por_bloco=PAGINAS_POR_BLOCO, progresso=None):
+    cv = Converter(caminho_pdf)
+    try:
+        configuracoes = cv.default_settings
+        blocos = dividir_paginas(len(cv.fitz_doc), paginas_por_bloco)
+        tarefas = [(caminho_pdf, inicio, fim) for inicio, fim in blocos]
+
+        # map() devolve os blocos na ordem das páginas
+        cv.load_pages()
+        for concluidos, dados in enumerate(_pool(workers).map(_analisar_bloco, tarefas), start=1):
+            cv.restore(dados)
+            if progresso:
+                progresso(0.9 * concluidos / len(tarefas), f"Páginas analisadas: {blocos[concluidos - 1][1]}")
+        if progresso:
+            progresso(0.9, "Gerando DOCX...")
+        cv.make_docx(saida, **configuracoes)
+    finally:
+        cv.close()
+
+
+def converter_pdf_para_word(pdf, saida, workers=None, paginas_por_bloco=None, progresso=None):
+    """Converte o PDF (caminho ou bytes) para DOCX, em paralelo quando compensa."""
+    workers = workers or WORKERS
+    paginas_por_bloco = paginas_por_bloco or PAGINAS_POR_BLOCO
+
+    doc = abrir_pdf(pdf)
+    total_paginas = doc.page_count
+    doc.close()
+
+    if workers <= 1 or total_paginas <= paginas_por_bloco:
+        if progresso:
+            progresso(0.0, f"Convertendo {total_paginas} páginas...")
+        converter_serial(pdf, saida)
+        return
+
+    if isinstance(pdf, str):
+        converter_paralelo(pdf, saida, workers, paginas_por_bloco, progresso)
+        return
+
+    # Os processos precisam de um caminho: gravar uma vez é mais barato do
+    # que serializar o PDF inteiro para cada bloco.
+    with EspacoTrabalho("word") as ws:
+        caminho_pdf = ws.caminho("entrada.pdf")
+        with open(caminho_pdf, "wb") as f:
+            f.write(pdf)
+        converter_paralelo(caminho_pdf, saida, workers, paginas_por_bloco, progresso)
+
@@ -0,0 +1,308 @@
+import math
+from collections import Counter
+
+import fitz  # PyMuPDF
+
+from espaco_trabalho import abrir_pdf
+from paginas_paralelas import mapear_paginas
+
+
+# Detecção de marca d'água sem saber o texto: uma passada pelas páginas monta
+# um índice de frequência dos elementos (imagens por xref, trechos de texto e
+# desenhos vetoriais) com a posição relativa na página, e o que se repete na
+# mesma posição na maioria das páginas é marca d'água. Os elementos precisam
+# ainda ter cara de marca (texto e desenhos inclinados, transparentes ou
+# claros; imagens transparentes, inclinadas ou grandes no centro da página),
+# senão um formulário perderia os rótulos, e um relatório os títulos e o
+# logotipo, que se repetem em todas as páginas. Uma segunda passada
+# remove só esses elementos, com as redações de cada página aplicadas de uma
+# vez: o texto sai caractere a caractere (pelo centro do glifo, sem levar o
+# texto do corpo que passa por baixo) e as imagens saem pelo xref, nunca pela
+# área (um scan de página inteira sob o logotipo continua lá).
+FRACAO_PAGINAS_MARCA = 0.6  # presente em 60% das páginas ou mais
+MIN_PAGINAS_MARCA = 3  # com menos páginas tudo "se repete": só o texto informado é removido
+GRADE_POSICAO = 100  # posição em centésimos da largura/altura da página
+# Cabeçalhos e rodapés também se repetem: elementos horizontais e opacos
+# inteiramente nessas faixas (fração da altura) nunca são marca d'água
+MARGEM_CABECALHO = 0.08
+MIN_CARACTERES_TEXTO = 3
+CLARIDADE_MARCA = 0.6  # luminância (0 a 1) a partir da qual a cor é "clara"
+# Letras grandes sozinhas não fazem uma marca (um título escuro se repete
+# igual); só tornam suspeito um cinza médio, que não passaria de "claro"
+TAMANHO_MARCA = 24  # pontos
+CLARIDADE_MARCA_GRANDE = 0.4
+# Imagem opaca e reta só é marca se cobrir esta fração da página com o
+# centro perto do centro da página (fração da largura/altura)
+AREA_IMAGEM_MARCA = 0.15
+DESVIO_CENTRO_MARCA = 0.15
+FOLGA_MITER = 10  # limite de miter padrão do PDF, em larguras de traço
+# De quantas em quantas páginas o índice descarta o que não chega mais ao limiar
+INTERVALO_PODA = 64
+FLAGS_DICT = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+FLAGS_RAWDICT = fitz.TEXTFLAGS_RAWDICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def _posicao(rect, pagina):
+    largura, altura = pagina.rect.width or 1, pagina.rect.height or 1
+    x0, y0, x1, y1 = rect
+    return (round(x0 / largura * GRADE_POSICAO), round(y0 / altura * GRADE_POSICAO),
+            round(x1 / largura * GRADE_POSICAO), round(y1 / altura * GRADE_POSICAO))
+
+
+def _na_margem(posicao):
+    limite = MARGEM_CABECALHO * GRADE_POSICAO
+    return posicao[3] <= limite or posicao[1] >= GRADE_POSICAO - limite
+
+
+def _clara(cor, claridade=CLARIDADE_MARCA):
+    """Se a cor (inteiro sRGB ou tupla cinza/RGB/CMYK de 0 a 1) tem ao menos a `claridade`."""
+    if cor is None:
+        return False
+    if isinstance(cor, int):
+        cor = ((cor >> 16 & 255) / 255, (cor >> 8 & 255) / 255, (cor & 255) / 255)
+    if len(cor) == 4:
+        c, m, y, k = cor
+        cor = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    if len(cor) == 1:
+        return cor[0] >= claridade
+    return 0.299 * cor[0] + 0.587 * cor[1] + 0.114 * cor[2] >= claridade
+
+
+def _arredondar(valor):
+    if isinstance(valor, (list, tuple)):
+        return tuple(round(item, 3) for item in valor)
+    return valor if valor is None else round(valor, 3)
+
+
+def _elemento_texto(texto, span, direcao, pagina):
+    """(tipo, assinatura, posição, pode ser marca) de um trecho de texto, ou None se for curto demais."""
+    texto = " ".join(texto.split())
+    if len(texto) < MIN_CARACTERES_TEXTO or not any(c.isalnum() for c in texto):
+        return None
+    direcao = _arredondar(direcao)
+    posicao = _posicao(span["bbox"], pagina)
+    inclinado = direcao != (1.0, 0.0)
+    transparente = span.get("alpha", 255) < 255
+    if not (inclinado or transparente) and _na_margem(posicao):
+        suspeito = False
+    else:
+        claridade = CLARIDADE_MARCA_GRANDE if span["size"] >= TAMANHO_MARCA else CLARIDADE_MARCA
+        suspeito = inclinado or transparente or _clara(span.get("color"), claridade)
+    return "texto", (texto, direcao), posicao, suspeito
+
+
+def _elemento_desenho(desenho, pagina):
+    assinatura = (
+        desenho["type"], _arredondar(desenho.get("fill")), _arredondar(desenho.get("color")), len(desenho["items"]),
+        _arredondar(desenho.get("width")), _arredondar(desenho.get("fill_opacity")),
+        _arredondar(desenho.get("stroke_opacity")),
+    )
+    posicao = _posicao(desenho["rect"], pagina)
+    opaco = (desenho.get("fill_opacity") or 1) >= 1 and (desenho.get("stroke_opacity") or 1) >= 1
+    claro = _clara(desenho.get("fill")) if "f" in desenho["type"] else _clara(desenho.get("color"))
+    suspeito = not (opaco and _na_margem(posicao)) and (not opaco or claro)
+    return "desenho", assinatura, posicao, suspeito
+
+
+def _grande_no_centro(posicao):
+    x0, y0, x1, y1 = (valor / GRADE_POSICAO for valor in posicao)
+    return ((x1 - x0) * (y1 - y0) >= AREA_IMAGEM_MARCA
+            and abs((x0 + x1) / 2 - 0.5) <= DESVIO_CENTRO_MARCA and abs((y0 + y1) / 2 - 0.5) <= DESVIO_CENTRO_MARCA)
+
+
+def _elemento_imagem(info, pagina):
+    posicao = _posicao(info["bbox"], pagina)
+    transparente = info.get("has-mask", False)
+    inclinada = abs(info["transform"][1]) > 1e-3 or abs(info["transform"][2]) > 1e-3
+    if not (transparente or inclinada) and _na_margem(posicao):
+        suspeito = False
+    else:
+        suspeito = transparente or inclinada or _grande_no_centro(posicao)
+    return "imagem", info["xref"], posicao, suspeito
+
+
+def elementos_pagina(pagina):
+    """Elementos da página (tipo, assinatura, posição, pode ser marca), sem repetição.
+
+    Executada pelos workers de mapear_paginas na passada de análise.
+    """
+    elementos = set()
+    for bloco in pagina.get_text("dict", flags=FLAGS_DICT)["blocks"]:
+        for linha in bloco.get("lines", []):
+            for span in linha["spans"]:
+                elemento = _elemento_texto(span["text"], span, linha["dir"], pagina)
+                if elemento:
+                    elementos.add(elemento)
+    for info in pagina.get_image_info(xrefs=True):
+        if info["xref"]:  # imagens inline não têm xref para remover
+            elementos.add(_elemento_imagem(info, pagina))
+    for desenho in pagina.get_cdrawings():
+        elementos.add(_elemento_desenho(desenho, pagina))
+    return list(elementos)
+
+
+def detectar_marcas(pdf, texto=None, analise=None, progresso=None):
+    """Elementos classificados como marca d'água: {(tipo, assinatura, posição): páginas em que aparece}.
+
+    `texto`, se informado, marca também, em qualquer página e posição, os
+    trechos iguais a ele e os que o contêm e têm cara de marca (um parágrafo
+    do corpo que só cita a palavra fica). Com `analise` (AnaliseDocumento do mesmo conteúdo), os
+    elementos das páginas ficam memorizados para a próxima detecção.
+    """
+    doc = abrir_pdf(pdf)
+    total = doc.page_count
+    doc.close()
+    limiar = max(MIN_PAGINAS_MARCA, math.ceil(FRACAO_PAGINAS_MARCA * total))
+    procurado = " ".join(texto.split()).casefold() if texto else None
+    frequencia = Counter()
+    informados = Counter()  # trechos com o texto informado, contados à parte (não são podados)
+    for numero, elementos in mapear_paginas(pdf, elementos_pagina, paginas=range(total), analise=analise):
+        if progresso:
+            progresso(0.5 * numero / max(total, 1), f"Analisando página {numero + 1} de {total}")
+        for tipo, assinatura, posicao, suspeito in elementos:
+            chave = (tipo, assinatura, posicao)
+            if (procurado and tipo == "texto" and procurado in assinatura[0].casefold()
+                    and (suspeito or assinatura[0].casefold() == procurado)):
+                informados[chave] += 1
+            elif suspeito:
+                frequencia[chave] += 1
+        restantes = total - numero - 1
+        if numero % INTERVALO_PODA == INTERVALO_PODA - 1:
+            # O que não alcança o limiar nem aparecendo em todas as páginas restantes sai do índice
+            for chave in [chave for chave, paginas in frequencia.items() if paginas + restantes < limiar]:
+                del frequencia[chave]
+    marcas = dict(informados)
+    if total >= MIN_PAGINAS_MARCA:
+        marcas.update((chave, paginas) for chave, paginas in frequencia.items() if paginas >= limiar)
+    return marcas
+
+
+def _descrever(tipo, assinatura):
+    if tipo == "texto":
+        return assinatura[0]
+    if tipo == "imagem":
+        return f"Imagem (xref {assinatura})"
+    return f"Desenho vetorial ({assinatura[3]} segmentos)"
+
+
+def _marcar(pagina, retangulo):
+    # Sem preenchimento: a área da redação não vira um retângulo branco
+    pagina.add_redact_annot(retangulo, fill=False, cross_out=False)
+
+
+def _redacoes_texto(pagina, textos):
+    """(redações dos trechos da marca, caixas dos demais trechos, trechos da marca) da página.
+
+    As redações passam só pelo centro dos glifos: saem os caracteres da marca,
+    o texto do corpo que passa por baixo fica.
+    """
+    redacoes, outros, trechos = [], [], 0
+    for bloco in pagina.get_text("rawdict", flags=FLAGS_RAWDICT)["blocks"]:
+        for linha in bloco.get("lines", []):
+            for span in linha["spans"]:
+                texto = "".join(caractere["c"] for caractere in span["chars"])
+                elemento = _elemento_texto(texto, span, linha["dir"], pagina)
+                if elemento is None or elemento[:3] not in textos:
+                    outros.append(fitz.Rect(span["bbox"]))
+                    continue
+                centros = [((x0 + x1) / 2, (y0 + y1) / 2) for x0, y0, x1, y1 in (c["bbox"] for c in span["chars"])]
+                if elemento[1][1] == (1.0, 0.0):
+                    # Horizontal: uma faixa de 1 pt pelos centros basta
+                    y = sum(centro[1] for centro in centros) / len(centros)
+                    redacoes.append(fitz.Rect(centros[0][0] - 0.5, y - 0.5, centros[-1][0] + 0.5, y + 0.5))
+                else:
+                    redacoes.extend(fitz.Rect(x - 0.5, y - 0.5, x + 0.5, y + 0.5) for x, y in centros)
+                trechos += 1
+    return redacoes, outros, trechos
+
+
+def _redacoes_desenho(pagina, desenhos):
+    """Redações dos desenhos da marca que não cobrem nenhum desenho do conteúdo."""
+    marcados, conteudo = [], []
+    for desenho in pagina.get_cdrawings():
+        retangulo = fitz.Rect(desenho["rect"])
+        if _elemento_desenho(desenho, pagina)[:3] in desenhos:
+            # O MuPDF só considera o traço coberto com a folga das quinas (limite de miter)
+            folga = FOLGA_MITER * max(desenho.get("width") or 0, 1) + 1
+            marcados.append(retangulo + (-folga, -folga, folga, folga))
+        else:
+            conteudo.append(retangulo)
+    # A redação leva todo traço coberto pelo retângulo: desenhos da marca que
+    # cobririam um desenho do conteúdo ficam
+    return [retangulo for retangulo in marcados if not any(retangulo.contains(outro) for outro in conteudo)]
+
+
+def _aplicar(pagina, redacoes, texto, graficos):
+    if not redacoes:
+        return
+    for retangulo in redacoes:
+        _marcar(pagina, retangulo)
+    pagina.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=graficos, text=texto)
+
+
+def remover_marcas(pdf, saida, marcas, progresso=None):
+    """Grava em `saida` o PDF sem os elementos de `marcas` (ver detectar_marcas).
+
+    Devolve (páginas alteradas, elementos removidos).
+    """
+    textos = {chave for chave in marcas if chave[0] == "texto"}
+    desenhos = {chave for chave in marcas if chave[0] == "desenho"}
+    imagens = {chave for chave in marcas if chave[0] == "imagem"}
+    doc = abrir_pdf(pdf)
+    removidas = set()
+    paginas_alteradas = 0
+    remocoes = 0
+    try:
+        for pagina in doc:
+            if progresso:
+                progresso(0.5 + 0.45 * pagina.number / doc.page_count,
+                          f"Removendo marcas da página {pagina.number + 1} de {doc.page_count}")
+            redacoes_texto, outros_textos, trechos = _redacoes_texto(pagina, textos) if textos else ([], [], 0)
+            redacoes_desenho = _redacoes_desenho(pagina, desenhos) if desenhos else []
+            # As redações da página são aplicadas de uma vez; só quando um
+            # desenho da marca cobre texto do conteúdo o texto vai numa aplicação
+            # própria (a do desenho não pode remover texto)
+            if redacoes_desenho and any(redacao.intersects(caixa) for redacao in redacoes_desenho
+                                        for caixa in outros_textos):
+                _aplicar(pagina, redacoes_texto, fitz.PDF_REDACT_TEXT_REMOVE, fitz.PDF_REDACT_LINE_ART_NONE)
+                _aplicar(pagina, redacoes_desenho, fitz.PDF_REDACT_TEXT_NONE, fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED)
+            elif redacoes_texto or redacoes_desenho:
+                _aplicar(pagina, redacoes_texto + redacoes_desenho,
+                         fitz.PDF_REDACT_TEXT_REMOVE if textos else fitz.PDF_REDACT_TEXT_NONE,
+                         fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED)
+            alterada = bool(trechos or redacoes_desenho)
+            remocoes += trechos + len(redacoes_desenho)
+            # Uma imagem sai trocando o objeto pelo xref, o que vale para todas as
+            # páginas que a usam: depois disso não há mais o que procurar
+            if len(removidas) < len({chave[1] for chave in imagens}):
+                for info in pagina.get_image_info(xrefs=True):
+                    xref = info["xref"]
+                    if xref and xref not in removidas and _elemento_imagem(info, pagina)[:3] in imagens:
+                        pagina.delete_image(xref)
+                        removidas.add(xref)
+                        remocoes += 1
+                        alterada = True
+            paginas_alteradas += alterada
+        if progresso:
+            progresso(0.95, "Salvando PDF...")
+        doc.save(saida, garbage=1, deflate=True)
+    finally:
+        doc.close()
+    return paginas_alteradas, remocoes
+
+
+def remover_marca_dagua(pdf, saida, texto=None, progresso=None, analise=None):
+    """Detecta e remove a marca d'água do PDF (caminho ou bytes), gravando em `saida`.
+
+    Devolve um relatório com as marcas encontradas e o que foi removido.
+    """
+    marcas = detectar_marcas(pdf, texto, analise=analise, progresso=progresso)
+    paginas_alteradas, remocoes = remover_marcas(pdf, saida, marcas, progresso=progresso)
+    return {
+        "marcas": [
+            {"tipo": tipo, "descricao": _descrever(tipo, assinatura), "paginas": paginas}
+            for (tipo, assinatura, _), paginas in sorted(marcas.items(), key=lambda item: -item[1])
+        ],
+        "paginas_alteradas": paginas_alteradas,
+        "remocoes": remocoes,
+    }
@@ -0,0 +1,526 @@
+import hashlib
+import html
+import io
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFont
+
+from analise_documento import LeituraDocumento
+from arquivo_zip import adicionar_entrada
+from compressor import MAX_CORES_TRACO, abrir_amostra, abrir_reduzida, classificar_imagem
+from espaco_trabalho import abrir_pdf
+from paginas_paralelas import mapear_paginas
+
+
+# Gerador de ePub que grava capítulos e imagens direto no ZIP de saída à
+# medida que as páginas são lidas: da página só sobra o nome do capítulo e,
+# das imagens, o caminho dentro do livro, então a memória não cresce com o
+# número de páginas. Cada imagem é gravada uma vez (por xref e por conteúdo)
+# e referenciada em todas as páginas em que aparece. Da análise compartilhada
+# com as outras abas o ePub só lê: o que ele extrai não fica guardado nela.
+#
+# As páginas não viram arquivos: MontadorCapitulos junta as páginas
+# consecutivas em capítulos, abrindo um novo a cada título detectado (pelo
+# tamanho/negrito da fonte em relação ao texto corrido ou pelo padrão
+# Prólogo/Capítulo N/...), e reflui as linhas em parágrafos.
+RE_SECAO = re.compile(r"(Prólogo|Cap(ítulo)?\.?\s*\d+|Epílogo|Introdução|Conclusão)", re.IGNORECASE)
+RE_NUMERO_PAGINA = re.compile(r"^\s*(\d+|[ivxlcdm]+)\s*$", re.IGNORECASE)
+FATOR_SUBTITULO = 1.2  # fonte 20% maior que a do texto corrido: subtítulo
+FATOR_CAPITULO = 1.5  # 50% maior: título de capítulo
+MAX_CARACTERES_TITULO = 120
+MAX_LINHAS_TITULO = 3
+FIM_FRASE = (".", "!", "?", ":", ";", '"', "”", "»", ")")
+HIFENS = ("-", "\xad")
+# Capítulo maior que isso é gravado em mais de um arquivo (só o primeiro vai para o índice)
+LIMITE_CARACTERES_CAPITULO = 200_000
+FLAGS_TEXTO = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Perfis de saída: as imagens são reduzidas à tela do leitor e recodificadas
+# em JPEG (fotos) ou PNG (traço, transparência), em cinza nos de tinta
+# eletrônica. "original" mantém as imagens, só convertendo formatos que os
+# leitores não abrem (JPX, JBIG2, TIFF...) para PNG.
+PERFIS_LEITOR = {
+    "original": None,
+    "kindle": {"tela": (1072, 1448), "cinza": True, "qualidade": 75},
+    "kobo": {"tela": (1264, 1680), "cinza": True, "qualidade": 75},
+    "celular": {"tela": (1080, 1920), "cinza": False, "qualidade": 70},
+}
+NOMES_PERFIS = {"Celular": "celular", "Kindle": "kindle", "Kobo": "kobo", "Original (sem alterar)": "original"}
+PERFIL_PADRAO = "celular"
+WORKERS = int(os.environ.get("SUITE_PDF_EPUB_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+# Páginas lidas à frente enquanto as imagens delas são processadas em paralelo
+JANELA_PAGINAS = 8
+TIPOS_IMAGEM = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "gif": "image/gif"}
+ESTILO = "BODY { font-family: Arial; padding: 10px; }"
+
+CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+PAGINA = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{idioma}" xml:lang="{idioma}">
+<head><title>{titulo}</title><link rel="stylesheet" type="text/css" href="style/nav.css"/></head>
+<body>{corpo}</body>
+</html>
+"""
+
+
+_executor = None
+_lock_executor = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _lock_executor:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="suite_pdf_epub")
+        return _executor
+
+
+class EscritorEpub:
+    """Escreve um ePub 3 em `saida` (arquivo aberto) item a item."""
+
+    def __init__(self, saida, titulo, autor, idioma="pt-BR", identificador=None):
+        self.titulo = titulo
+        self.autor = autor
+        self.idioma = idioma
+        self.identificador = identificador or f"urn:uuid:{uuid.uuid4()}"
+        self._zip = zipfile.ZipFile(saida, "w", allowZip64=True)
+        # O mimetype precisa ser a primeira entrada, sem compressão
+        self._zip.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        self._zip.writestr("META-INF/container.xml", CONTAINER, compress_type=zipfile.ZIP_DEFLATED)
+        self._manifesto = []  # (id, href, tipo, propriedades)
+        self._espinha = []  # ids dos arquivos de texto, na ordem de leitura
+        self.capitulos = []  # (titulo, href) dos que entram no índice
+        self._imagens_por_xref = {}
+        self._imagens_por_hash = {}
+        self._capa = None
+        self.imagens_repetidas = 0
+        self.bytes_imagens = 0
+        self._adicionar("estilo", "style/nav.css", "text/css", ESTILO.encode("utf-8"))
+
+    def _adicionar(self, id_item, href, tipo, conteudo, propriedades=None):
+        adicionar_entrada(self._zip, f"EPUB/{href}", conteudo)
+        self._manifesto.append((id_item, href, tipo, propriedades))
+
+    def adicionar_capa(self, dados, extensao="jpg"):
+        href = f"images/capa.{extensao}"
+        self._adicionar("capa", href, TIPOS_IMAGEM.get(extensao, f"image/{extensao}"), dados, "cover-image")
+        self._capa = href
+
+    def referencia_imagem(self, xref):
+        """Caminho da imagem do xref se ela já está no livro (sem precisar extraí-la de novo), senão None."""
+        href = self._imagens_por_xref.get(xref)
+        if href is not None:
+            self.imagens_repetidas += 1
+        return href
+
+    def adicionar_imagem(self, dados, extensao, xref=None):
+        """Grava a imagem (se o mesmo conteúdo ainda não estiver no livro) e devolve o caminho para o <img>."""
+        resumo = hashlib.sha1(dados).hexdigest()
+        href = self._imagens_por_hash.get(resumo)
+        if href is None:
+            href = f"images/imagem_{len(self._imagens_por_hash) + 1}.{extensao}"
+            self._adicionar(f"imagem_{len(self._imagens_por_hash) + 1}", href,
+                            TIPOS_IMAGEM.get(extensao, f"image/{extensao}"), dados)
+            self._imagens_por_hash[resumo] = href
+            self.bytes_imagens += len(dados)
+        else:
+            self.imagens_repetidas += 1
+        if xref is not None:
+            self._imagens_por_xref[xref] = href
+        return href
+
+    @property
+    def imagens_unicas(self):
+        return len(self._imagens_por_hash)
+
+    def adicionar_capitulo(self, titulo, corpo_html, indice=True):
+        numero = len(self._espinha) + 1
+        href = f"capitulo_{numero}.xhtml"
+        pagina = PAGINA.format(idioma=self.idioma, titulo=html.escape(titulo), corpo=corpo_html)
+        self._adicionar(f"capitulo_{numero}", href, "application/xhtml+xml", pagina.encode("utf-8"))
+        self._espinha.append(f"capitulo_{numero}")
+        if indice:
+            self.capitulos.append((titulo, href))
+
+    @property
+    def arquivos(self):
+        return len(self._espinha)
+
+    def _nav(self):
+        links = "".join(f'<li><a href="{href}">{html.escape(titulo)}</a></li>' for titulo, href in self.capitulos)
+        corpo = f'<nav epub:type="toc" id="toc"><h2>{html.escape(self.titulo)}</h2><ol>{links}</ol></nav>'
+        return PAGINA.format(idioma=self.idioma, titulo=html.escape(self.titulo), corpo=corpo)
+
+    def _ncx(self):
+        pontos = "".join(
+            f'<navPoint id="p{ordem}" playOrder="{ordem}"><navLabel><text>{html.escape(titulo)}</text>'
+            f'</navLabel><content src="{href}"/></navPoint>'
+            for ordem, (titulo, href) in enumerate(self.capitulos, 1)
+        )
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+            f'<head><meta name="dtb:uid" content="{html.escape(self.identificador)}"/></head>'
+            f'<docTitle><text>{html.escape(self.titulo)}</text></docTitle>'
+            f'<navMap>{pontos}</navMap></ncx>'
+        )
+
+    def _opf(self):
+        manifesto = "".join(
+            f'<item id="{id_item}" href="{href}" media-type="{tipo}"'
+            + (f' properties="{propriedades}"' if propriedades else "") + "/>"
+            for id_item, href, tipo, propriedades in self._manifesto
+        )
+        espinha = '<itemref idref="nav"/>' + "".join(f'<itemref idref="{id_item}"/>' for id_item in self._espinha)
+        capa = '<meta name="cover" content="capa"/>' if self._capa else ""
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="id">{html.escape(self.identificador)}</dc:identifier>'
+            f'<dc:title>{html.escape(self.titulo)}</dc:title>'
+            f'<dc:language>{self.idioma}</dc:language>'
+            f'<dc:creator>{html.escape(self.autor)}</dc:creator>'
+            f'<meta property="dcterms:modified">{time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}</meta>'
+            f'{capa}</metadata>'
+            f'<manifest>{manifesto}'
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+            '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/></manifest>'
+            f'<spine toc="ncx">{espinha}</spine></package>'
+        )
+
+    def fechar(self):
+        """Grava índice e manifesto (só nomes e caminhos, nunca o conteúdo) e fecha o ZIP."""
+        adicionar_entrada(self._zip, "EPUB/nav.xhtml", self._nav().encode("utf-8"))
+        adicionar_entrada(self._zip, "EPUB/toc.ncx", self._ncx().encode("utf-8"))
+        adicionar_entrada(self._zip, "EPUB/content.opf", self._opf().encode("utf-8"))
+        self._zip.close()
+
+
+def juntar_linhas(linhas):
+    """Reflui as linhas num parágrafo, desfazendo a hifenização de fim de linha."""
+    texto = ""
+    for linha in linhas:
+        if texto.endswith(HIFENS) and linha[:1].islower():
+            texto = texto[:-1] + linha
+        elif texto:
+            texto = f"{texto} {linha}"
+        else:
+            texto = linha
+    return texto
+
+
+def blocos_da_pagina(dados):
+    """Blocos de texto de page.get_text("dict"), cada um como lista de linhas (texto, tamanho da fonte, negrito)."""
+    blocos = []
+    for bloco in dados["blocks"]:
+        linhas = []
+        for linha in bloco.get("lines", []):
+            spans = [span for span in linha["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            # Tamanho do trecho com mais caracteres: uma capitular não faz da linha um título
+            tamanho = max(spans, key=lambda span: len(span["text"].strip()))["size"]
+            negrito = all(span["flags"] & fitz.TEXT_FONT_BOLD or "bold" in span["font"].lower() for span in spans)
+            linhas.append(("".join(span["text"] for span in linha["spans"]).strip(), round(tamanho, 1), negrito))
+        if linhas:
+            blocos.append(linhas)
+    return blocos
+
+
+def blocos_pagina(pagina):
+    """blocos_da_pagina() de uma página do documento (executada pelos workers de mapear_paginas)."""
+    return blocos_da_pagina(pagina.get_text("dict", flags=FLAGS_TEXTO))
+
+
+def nivel_titulo(texto, linhas, tamanho_corpo):
+    """1 para título de capítulo, 2 para subtítulo e 0 para texto corrido."""
+    if len(texto) < 2 or len(texto) > MAX_CARACTERES_TITULO or len(linhas) > MAX_LINHAS_TITULO:
+        return 0
+    tamanho = max(linha[1] for linha in linhas)
+    destaque = tamanho >= tamanho_corpo * FATOR_SUBTITULO or all(linha[2] for linha in linhas)
+    if RE_SECAO.match(texto) and (destaque or len(texto.split()) <= 6):
+        return 1
+    if tamanho >= tamanho_corpo * FATOR_CAPITULO:
+        return 1
+    return 2 if destaque else 0
+
+
+class MontadorCapitulos:
+    """Junta as páginas em capítulos do EscritorEpub: cada título de capítulo fecha o anterior."""
+
+    def __init__(self, livro, titulo_inicial="Início"):
+        self.livro = livro
+        # Caracteres por tamanho de fonte: o mais comum é o do texto corrido
+        self.tamanhos = Counter()
+        self._titulo = titulo_inicial
+        self._tem_cabecalho = False
+        self._entra_indice = True
+        self._partes = []
+        self._caracteres = 0
+        self._paragrafo = None
+        self._imagens = []
+
+    @property
+    def tamanho_corpo(self):
+        return self.tamanhos.most_common(1)[0][0] if self.tamanhos else 0
+
+    def adicionar_pagina(self, blocos):
+        for linhas in blocos:
+            for texto, tamanho, _ in linhas:
+                self.tamanhos[tamanho] += len(texto)
+        tamanho_corpo = self.tamanho_corpo
+        for linhas in blocos:
+            texto = juntar_linhas(linha[0] for linha in linhas)
+            if RE_NUMERO_PAGINA.match(texto):
+                continue
+            nivel = nivel_titulo(texto, linhas, tamanho_corpo)
+            if nivel == 1:
+                if len(linhas) > 1 and RE_SECAO.fullmatch(linhas[0][0]):
+                    texto = f"{linhas[0][0]} — {juntar_linhas(linha[0] for linha in linhas[1:])}"
+                self._abrir_capitulo(texto)
+            elif nivel == 2:
+                self._fechar_paragrafo()
+                self._acrescentar(f"<h3>{html.escape(texto)}</h3>")
+            else:
+                self._adicionar_texto(texto)
+
+    def adicionar_imagem(self, href):
+        # Imagem no meio de um parágrafo que continua na página seguinte entra depois dele
+        self._imagens.append(href)
+        if self._paragrafo is None:
+            self._fechar_paragrafo()
+
+    def _adicionar_texto(self, texto):
+        # Bloco que começa em minúscula depois de um sem ponto final continua o mesmo parágrafo
+        # (o caso comum é o parágrafo que passa de uma página para a outra)
+        if self._paragrafo and not self._paragrafo.endswith(FIM_FRASE) and texto[:1].islower():
+            self._paragrafo = juntar_linhas([self._paragrafo, texto])
+        else:
+            self._fechar_paragrafo()
+            self._paragrafo = texto
+
+    def _fechar_paragrafo(self):
+        if self._paragrafo:
+            self._acrescentar(f"<p>{html.escape(self._paragrafo)}</p>")
+        self._paragrafo = None
+        for href in self._imagens:
+            self._acrescentar(f'<div><img src="{href}" alt="" style="max-width: 100%;"/></div>')
+        self._imagens = []
+
+    def _acrescentar(self, parte):
+        self._partes.append(parte)
+        self._caracteres += len(parte)
+        if self._caracteres >= LIMITE_CARACTERES_CAPITULO:
+            self._gravar()
+
+    def _abrir_capitulo(self, texto):
+        self._fechar_paragrafo()
+        if self._tem_cabecalho and self._entra_indice and not self._partes and not RE_SECAO.match(texto):
+            # Título em duas linhas ("Capítulo 1" e depois "O começo"): vira um só
+            self._titulo = f"{self._titulo} — {texto}"
+            return
+        self._gravar()
+        self._titulo, self._tem_cabecalho, self._entra_indice = texto, True, True
+
+    def _gravar(self):
+        if not self._partes and not (self._tem_cabecalho and self._entra_indice):
+            return
+        cabecalho = f"<h2>{html.escape(self._titulo)}</h2>" if self._tem_cabecalho and self._entra_indice else ""
+        self.livro.adicionar_capitulo(self._titulo, cabecalho + "".join(self._partes), self._entra_indice)
+        self._partes, self._caracteres, self._entra_indice = [], 0, False
+
+    def fechar(self):
+        self._fechar_paragrafo()
+        self._gravar()
+
+
+def otimizar_imagem(dados, extensao, perfil=None):
+    """Adapta a imagem ao perfil (dicionário de PERFIS_LEITOR). Devolve (dados, extensão)."""
+    if perfil is None:
+        if extensao in TIPOS_IMAGEM:
+            return dados, extensao
+        imagem = Image.open(io.BytesIO(dados))
+        if imagem.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            imagem = imagem.convert("RGBA" if "A" in imagem.getbands() else "RGB")
+        buffer = io.BytesIO()
+        imagem.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue(), "png"
+
+    largura_tela, altura_tela = perfil["tela"]
+    largura, altura = Image.open(io.BytesIO(dados)).size
+    escala = min(1.0, largura_tela / largura, altura_tela / altura)
+    # Classificada antes da redução: a suavização faria traço parecer foto
+    classe = classificar_imagem(abrir_amostra(dados))
+    imagem = abrir_reduzida(dados, escala)
+    buffer = io.BytesIO()
+    if classe == "alfa":
+        imagem.convert("LA" if perfil["cinza"] else "RGBA").save(buffer, format="PNG", optimize=True)
+        nova_extensao = "png"
+    elif classe.endswith("foto"):
+        imagem = imagem.convert("L" if perfil["cinza"] or classe == "cinza_foto" else "RGB")
+        # JPEG baseline: leitores antigos não abrem JPEG progressivo
+        imagem.save(buffer, format="JPEG", quality=perfil["qualidade"], optimize=True)
+        nova_extensao = "jpg"
+    else:
+        if classe == "bilevel":
+            imagem = imagem.convert("L").point(lambda v: 255 if v >= 128 else 0).convert("1", dither=Image.Dither.NONE)
+        elif classe == "cor_traco" and not perfil["cinza"]:
+            # Poucas cores: paleta (a mesma da compressão), bem menor que RGB
+            imagem = imagem.convert("RGB").quantize(colors=MAX_CORES_TRACO, dither=Image.Dither.NONE)
+        else:
+            imagem = imagem.convert("L" if perfil["cinza"] or classe == "cinza_traco" else "RGB")
+        imagem.save(buffer, format="PNG", optimize=True)
+        nova_extensao = "png"
+    # Traço reduzido ganha tons de cinza nas bordas e pode crescer em PNG: nesse
+    # caso fica a original, se já estiver num formato que os leitores abrem
+    if extensao in TIPOS_IMAGEM and buffer.tell() >= len(dados):
+        return dados, extensao
+    return buffer.getvalue(), nova_extensao
+
+
+def _otimizar_imagem_segura(dados, extensao, perfil):
+    """Como otimizar_imagem, mas devolve None se o Pillow não abrir a imagem (JBIG2, JPX...)."""
+    try:
+        return otimizar_imagem(dados, extensao, perfil)
+    except Exception:
+        return None
+
+
+def _renderizar_imagem(doc, xref, perfil):
+    """A imagem do xref decodificada pelo MuPDF, em PNG, e adaptada ao perfil; None se nem ele abrir.
+
+    Usa o documento: chamar só na thread que o abriu.
+    """
+    try:
+        pixmap = fitz.Pixmap(doc, xref)
+        if pixmap.colorspace is not None and pixmap.colorspace.n > 3:
+            pixmap = fitz.Pixmap(fitz.csRGB, pixmap)  # PNG não tem CMYK
+        return otimizar_imagem(pixmap.tobytes("png"), "png", perfil)
+    except Exception:
+        return None
+
+
+def gerar_capa(image_bytes, titulo, autor, tela=None):
+    """Capa personalizada: a imagem (reduzida à `tela`, se dada) com título e autor por cima, em JPEG."""
+    img_pil = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    if tela:
+        img_pil.thumbnail(tela, Image.LANCZOS)
+    draw = ImageDraw.Draw(img_pil)
+
+    try:
+        font_title = ImageFont.truetype("arial.ttf", size=48)
+        font_author = ImageFont.truetype("arial.ttf", size=32)
+    except OSError:
+        font_title = ImageFont.load_default()
+        font_author = ImageFont.load_default()
+
+    W, H = img_pil.size
+    draw.text((W / 2, H / 1.5), titulo, fill="white", font=font_title, anchor="mm")
+    draw.text((W / 2, H / 1.4 + 50), f"por {autor}", fill="white", font=font_author, anchor="mm")
+
+    capa_buffer = io.BytesIO()
+    img_pil.save(capa_buffer, "JPEG")
+    return capa_buffer.getvalue()
+
+
+def gerar_epub(pdf, saida, progresso=None, titulo="eBook Convertido", autor="Autor Desconhecido",
+               perfil=PERFIL_PADRAO, analise=None):
+    """Converte o PDF (caminho ou bytes) em ePub, com um arquivo por capítulo detectado.
+
+    Com `analise` (AnaliseDocumento do mesmo conteúdo), o texto e a lista de
+    imagens de cada página vêm da extração já feita por outra conversão (as
+    páginas extraídas aqui não são guardadas nela). Em
+    documentos grandes, o texto das páginas é extraído em vários processos.
+    """
+    configuracao = PERFIS_LEITOR[perfil]
+    doc = abrir_pdf(pdf)
+    livro = EscritorEpub(saida, titulo, autor)
+    montador = MontadorCapitulos(livro)
+    capa_definida = False
+    # As imagens de uma janela de páginas são extraídas aqui (o MuPDF não é
+    # seguro entre threads) e adaptadas em paralelo; o texto só entra no
+    # livro quando as imagens da página ficam prontas, mantendo a ordem.
+    janela = []  # (blocos, xrefs) das páginas lidas e ainda não gravadas
+    pendentes = {}  # xref -> Future de (dados, extensão)
+    enviados = set()
+    omitidas = set()  # xrefs que nem o Pillow nem o MuPDF conseguiram decodificar
+    bytes_antes = 0
+
+    def gravar_janela():
+        for blocos, xrefs in janela:
+            montador.adicionar_pagina(blocos)
+            for xref in xrefs:
+                if xref in omitidas:
+                    continue
+                href = livro.referencia_imagem(xref)
+                if href is None:
+                    # Formato que o Pillow não abre: o MuPDF decodifica (ele não
+                    # pode ir para as threads, então fica aqui) ou a imagem é omitida
+                    imagem = pendentes.pop(xref).result() or _renderizar_imagem(doc, xref, configuracao)
+                    if imagem is None:
+                        omitidas.add(xref)
+                        continue
+                    href = livro.adicionar_imagem(*imagem, xref)
+                montador.adicionar_imagem(href)
+        janela.clear()
+
+    try:
+        leitura = LeituraDocumento(doc, analise, guardar=False)
+        for i, blocos in mapear_paginas(pdf, blocos_pagina, paginas=range(doc.page_count),
+                                         analise=analise, guardar=False):
+            if progresso:
+                progresso(0.95 * i / doc.page_count, f"Página {i+1} de {doc.page_count}")
+            xrefs = []
+            for img in leitura.imagens(i):
+                xref = img[0]
+                # Capa personalizada com a primeira imagem da página 1
+                if i == 0 and not capa_definida:
+                    try:
+                        livro.adicionar_capa(gerar_capa(doc.extract_image(xref)["image"], titulo, autor,
+                                                        configuracao and configuracao["tela"]))
+                        capa_definida = True
+                    except Exception as e:
+                        if progresso:
+                            progresso(aviso=f"Erro ao gerar capa personalizada: {e}")
+                    continue  # Não adicionar essa imagem no conteúdo
+
+                # Cada xref é extraído e adaptado uma única vez
+                if xref not in enviados:
+                    enviados.add(xref)
+                    base_image = doc.extract_image(xref)
+                    bytes_antes += len(base_image["image"])
+                    pendentes[xref] = _pool().submit(_otimizar_imagem_segura, base_image["image"],
+                                                     base_image["ext"], configuracao)
+                xrefs.append(xref)
+            janela.append((blocos, xrefs))
+            if len(janela) >= JANELA_PAGINAS:
+                gravar_janela()
+
+        gravar_janela()
+        montador.fechar()
+        if progresso:
+            progresso(0.95, "Gravando índice do ePub...")
+    finally:
+        for futuro in pendentes.values():
+            futuro.cancel()
+        livro.fechar()
+        doc.close()
+    return {"capitulos": len(livro.capitulos), "arquivos": livro.arquivos, "imagens": livro.imagens_unicas,
+            "imagens_repetidas": livro.imagens_repetidas, "bytes_imagens_antes": bytes_antes,
+            "bytes_imagens_depois": livro.bytes_imagens}
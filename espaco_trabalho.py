@@ -0,0 +1,120 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import fitz  # PyMuPDF
+
+
+# Diretórios de rascunho isolados por sessão/tarefa. Cada conversão grava
+# seus arquivos temporários num diretório próprio, então sessões simultâneas
+# não sobrescrevem os arquivos umas das outras.
+DIRETORIO_BASE = os.environ.get("SUITE_PDF_TMP_DIR", os.path.join(tempfile.gettempdir(), "suite_pdf"))
+IDADE_MAXIMA_SEGUNDOS = 6 * 60 * 60
+
+# Arquivos até este tamanho são processados inteiramente em memória; acima
+# dele a entrada e as saídas são despejadas no espaço de trabalho em disco.
+LIMITE_MEMORIA_MB = int(os.environ.get("SUITE_PDF_LIMITE_MEMORIA_MB", "32"))
+LIMITE_MEMORIA_BYTES = LIMITE_MEMORIA_MB * 1024 * 1024
+
+
+class EspacoTrabalho:
+    """Diretório temporário de uma tarefa, removido ao sair do bloco `with`."""
+
+    def __init__(self, sessao="local", tarefa=None, base=DIRETORIO_BASE):
+        self.sessao = _nome_seguro(sessao)
+        self.tarefa = _nome_seguro(tarefa or uuid.uuid4().hex[:12])
+        self.diretorio = os.path.join(base, self.sessao, self.tarefa)
+
+    def __enter__(self):
+        os.makedirs(self.diretorio, exist_ok=False)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.limpar()
+        return False
+
+    def caminho(self, nome):
+        """Caminho de um arquivo dentro do espaço de trabalho."""
+        return os.path.join(self.diretorio, nome)
+
+    def subdiretorio(self, nome):
+        caminho = self.caminho(nome)
+        os.makedirs(caminho, exist_ok=True)
+        return caminho
+
+    def limpar(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+        # Remove o diretório da sessão se ficou vazio
+        try:
+            os.rmdir(os.path.dirname(self.diretorio))
+        except OSError:
+            pass
+
+
+def ler_upload(arquivo):
+    """Retorna o conteúdo do upload do Streamlit sem copiá-lo (memoryview)."""
+    try:
+        return arquivo.getbuffer()
+    except (AttributeError, BufferError):
+        return arquivo.getvalue()
+
+
+def entrada_pdf(dados, ws=None, nome="entrada.pdf"):
+    """Devolve os bytes como estão ou, acima do limite, um caminho em disco."""
+    if ws is None or len(dados) <= LIMITE_MEMORIA_BYTES:
+        return dados
+    caminho = ws.caminho(nome)
+    with open(caminho, "wb") as f:
+        f.write(dados)
+    return caminho
+
+
+def abrir_pdf(pdf):
+    """Abre um PDF a partir de um caminho ou de um buffer em memória."""
+    if isinstance(pdf, (str, os.PathLike)):
+        return fitz.open(pdf)
+    return fitz.open(stream=pdf, filetype="pdf")
+
+
+def buffer_saida(ws=None, tamanho_entrada=0, nome="saida.bin"):
+    """Buffer de saída: BytesIO para arquivos pequenos, arquivo no espaço de trabalho acima do limite."""
+    if ws is not None and tamanho_entrada > LIMITE_MEMORIA_BYTES:
+        return open(ws.caminho(nome), "w+b")
+    return io.BytesIO()
+
+
+def conteudo_buffer(buffer):
+    buffer.seek(0)
+    return buffer.read()
+
+
+def _nome_seguro(nome):
+    return "".join(c for c in str(nome) if c.isalnum() or c in "-_") or "x"
+
+
+def limpar_espacos_antigos(base=DIRETORIO_BASE, idade_maxima=IDADE_MAXIMA_SEGUNDOS):
+    """Remove sobras de processos que morreram sem limpar (ex.: dyno reiniciado)."""
+    if not os.path.isdir(base):
+        return 0
+    limite = time.time() - idade_maxima
+    removidos = 0
+    for sessao in os.listdir(base):
+        dir_sessao = os.path.join(base, sessao)
+        if not os.path.isdir(dir_sessao):
+            continue
+        for tarefa in os.listdir(dir_sessao):
+            dir_tarefa = os.path.join(dir_sessao, tarefa)
+            try:
+                if os.path.getmtime(dir_tarefa) < limite:
+                    shutil.rmtree(dir_tarefa, ignore_errors=True)
+                    removidos += 1
+            except OSError:
+                continue
+        try:
+            os.rmdir(dir_sessao)
+        except OSError:
+            pass
+    return removidos
@@ -0,0 +1,430 @@
+import atexit
+import json
+import os
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Estado compartilhado entre sessões e entre dynos (contadores e totais de
+# acesso). Os dados são grupos de contadores inteiros, como um hash do Redis:
+# grupo -> campo -> valor. Três backends, escolhidos por SUITE_PDF_ESTADO:
+#   arquivo:estado.json    JSON local protegido por trava de arquivo
+#   sqlite:estado.sqlite3  SQLite local (padrão; serve para um só dyno)
+#   redis://... ou rediss://...  qualquer servidor que fale o protocolo do
+#                                Redis (o REDIS_URL do Heroku é usado se existir)
+# ContadorEmLote junta os incrementos na memória e os grava numa thread a
+# cada INTERVALO_GRAVACAO_MS; a mesma thread relê os valores, então a
+# requisição nunca espera pelo backend (nem falha se ele estiver fora).
+URL_ESTADO = os.environ.get("SUITE_PDF_ESTADO") or os.environ.get("REDIS_URL") or "sqlite:estado.sqlite3"
+INTERVALO_GRAVACAO_MS = int(os.environ.get("SUITE_PDF_ESTADO_INTERVALO_MS", "500"))
+# Quanto tempo um valor lido do backend é reaproveitado antes de ser lido de novo
+VALIDADE_LEITURA = 5.0
+# Quanto a primeira consulta de um valor espera pela leitura da thread
+ESPERA_PRIMEIRA_LEITURA = 0.5
+TIMEOUT_BACKEND = 5
+PREFIXO_REDIS = os.environ.get("SUITE_PDF_REDIS_PREFIXO", "suite_pdf:")
+# O Redis do Heroku usa certificado autoassinado: lá é preciso SUITE_PDF_REDIS_VERIFICAR_TLS=0
+VERIFICAR_TLS_REDIS = os.environ.get("SUITE_PDF_REDIS_VERIFICAR_TLS", "1") != "0"
+
+
+class ErroRedis(Exception):
+    pass
+
+
+class BackendEstado:
+    """Interface dos backends: grupos de contadores com soma atômica por campo."""
+
+    def somar(self, grupo, valores):
+        """Soma {campo: quantidade} ao grupo e devolve {campo: novo valor}."""
+        raise NotImplementedError
+
+    def ler(self, grupo, campo):
+        return self.ler_grupo(grupo).get(campo, 0)
+
+    def ler_grupo(self, grupo):
+        """Todos os campos do grupo, {campo: valor}."""
+        raise NotImplementedError
+
+    def fechar(self):
+        pass
+
+
+class BackendArquivo(BackendEstado):
+    """Um arquivo JSON; a leitura-modificação-escrita é feita com uma trava exclusiva."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def _ler(self):
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def somar(self, grupo, valores):
+        with self._lock, open(self.caminho + ".lock", "a+b") as trava:
+            if fcntl is not None:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            else:
+                trava.seek(0)
+                msvcrt.locking(trava.fileno(), msvcrt.LK_LOCK, 1)
+            estado = self._ler()
+            campos = estado.setdefault(grupo, {})
+            for campo, quantidade in valores.items():
+                campos[campo] = campos.get(campo, 0) + quantidade
+            # Grava num temporário e renomeia: quem lê sem a trava nunca vê um JSON pela metade
+            with open(self.caminho + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(estado, f)
+            os.replace(self.caminho + ".tmp", self.caminho)
+            return {campo: campos[campo] for campo in valores}
+
+    def ler_grupo(self, grupo):
+        return dict(self._ler().get(grupo, {}))
+
+
+class BackendSQLite(BackendEstado):
+    """Uma tabela (grupo, campo, valor) com upsert; o SQLite serializa as gravações."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        conexao = self._conectar()
+        try:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS estado (grupo TEXT NOT NULL, campo TEXT NOT NULL, "
+                "valor INTEGER NOT NULL, PRIMARY KEY (grupo, campo))"
+            )
+        finally:
+            conexao.close()
+
+    def _conectar(self):
+        # Uma conexão por operação: as chamadas vêm de threads diferentes
+        conexao = sqlite3.connect(self.caminho, timeout=TIMEOUT_BACKEND)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        return conexao
+
+    def somar(self, grupo, valores):
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.executemany(
+                    "INSERT INTO estado (grupo, campo, valor) VALUES (?, ?, ?) "
+                    "ON CONFLICT(grupo, campo) DO UPDATE SET valor = valor + excluded.valor",
+                    [(grupo, campo, quantidade) for campo, quantidade in valores.items()],
+                )
+                return {
+                    campo: conexao.execute(
+                        "SELECT valor FROM estado WHERE grupo = ? AND campo = ?", (grupo, campo)
+                    ).fetchone()[0]
+                    for campo in valores
+                }
+        finally:
+            conexao.close()
+
+    def ler(self, grupo, campo):
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT valor FROM estado WHERE grupo = ? AND campo = ?", (grupo, campo)).fetchone()
+            return linha[0] if linha else 0
+        finally:
+            conexao.close()
+
+    def ler_grupo(self, grupo):
+        conexao = self._conectar()
+        try:
+            return dict(conexao.execute("SELECT campo, valor FROM estado WHERE grupo = ?", (grupo,)))
+        finally:
+            conexao.close()
+
+
+class BackendRedis(BackendEstado):
+    """Cliente mínimo do protocolo do Redis (RESP) sobre socket, sem dependências.
+
+    Cada grupo é um hash (HINCRBY/HGET/HGETALL); os comandos de uma soma vão
+    juntos num pipeline.
+    """
+
+    def __init__(self, url, timeout=TIMEOUT_BACKEND, prefixo=PREFIXO_REDIS):
+        partes = urllib.parse.urlsplit(url)
+        self.host = partes.hostname or "localhost"
+        self.porta = partes.port or 6379
+        self.usuario = urllib.parse.unquote(partes.username) if partes.username else None
+        self.senha = urllib.parse.unquote(partes.password) if partes.password else None
+        self.banco = int(partes.path.lstrip("/") or 0)
+        self.tls = partes.scheme == "rediss"
+        self.timeout = timeout
+        self.prefixo = prefixo
+        self._lock = threading.Lock()
+        self._socket = None
+        self._leitor = None
+
+    def _conectar(self):
+        conexao = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+        if self.tls:
+            contexto = ssl.create_default_context()
+            if not VERIFICAR_TLS_REDIS:
+                contexto.check_hostname = False
+                contexto.verify_mode = ssl.CERT_NONE
+            conexao = contexto.wrap_socket(conexao, server_hostname=self.host)
+        self._socket = conexao
+        self._leitor = conexao.makefile("rb")
+        iniciais = []
+        if self.senha:
+            iniciais.append(["AUTH", self.usuario, self.senha] if self.usuario else ["AUTH", self.senha])
+        if self.banco:
+            iniciais.append(["SELECT", str(self.banco)])
+        if iniciais:
+            self._enviar(iniciais)
+
+    @staticmethod
+    def _codificar(comando):
+        partes = [f"*{len(comando)}\r\n".encode()]
+        for argumento in comando:
+            dados = argumento if isinstance(argumento, bytes) else str(argumento).encode("utf-8")
+            partes.append(b"$%d\r\n%s\r\n" % (len(dados), dados))
+        return b"".join(partes)
+
+    def _resposta(self):
+        linha = self._leitor.readline()
+        if not linha.endswith(b"\r\n"):
+            raise ConnectionError("Conexão com o Redis encerrada")
+        tipo, conteudo = linha[:1], linha[1:-2]
+        if tipo == b"+":
+            return conteudo.decode("utf-8")
+        if tipo == b"-":
+            raise ErroRedis(conteudo.decode("utf-8", "replace"))
+        if tipo == b":":
+            return int(conteudo)
+        if tipo == b"$":
+            tamanho = int(conteudo)
+            if tamanho < 0:
+                return None
+            dados = self._leitor.read(tamanho + 2)
+            return dados[:-2].decode("utf-8")
+        if tipo == b"*":
+            tamanho = int(conteudo)
+            return None if tamanho < 0 else [self._resposta() for _ in range(tamanho)]
+        raise ErroRedis(f"Resposta inválida do servidor: {linha!r}")
+
+    def _enviar(self, comandos):
+        self._socket.sendall(b"".join(self._codificar(comando) for comando in comandos))
+        return [self._resposta() for _ in comandos]
+
+    def executar(self, comandos):
+        """Envia os comandos num pipeline e devolve as respostas, na ordem."""
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._conectar()
+                return self._enviar(comandos)
+            except (OSError, ConnectionError):
+                # A próxima chamada reconecta; quem chamou decide se repete
+                self._fechar_conexao()
+                raise
+
+    def somar(self, grupo, valores):
+        chave = self.prefixo + grupo
+        campos = list(valores)
+        respostas = self.executar([["HINCRBY", chave, campo, valores[campo]] for campo in campos])
+        return dict(zip(campos, respostas))
+
+    def ler(self, grupo, campo):
+        valor = self.executar([["HGET", self.prefixo + grupo, campo]])[0]
+        return int(valor) if valor is not None else 0
+
+    def ler_grupo(self, grupo):
+        itens = self.executar([["HGETALL", self.prefixo + grupo]])[0] or []
+        return {itens[i]: int(itens[i + 1]) for i in range(0, len(itens), 2)}
+
+    def _fechar_conexao(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = None
+        self._leitor = None
+
+    def fechar(self):
+        with self._lock:
+            self._fechar_conexao()
+
+
+def criar_backend(url=URL_ESTADO):
+    """Backend a partir da URL (arquivo:caminho, sqlite:caminho, redis://... ou rediss://...)."""
+    esquema, _, resto = url.partition(":")
+    if esquema in ("redis", "rediss"):
+        return BackendRedis(url)
+    if esquema == "sqlite":
+        return BackendSQLite(resto)
+    if esquema == "arquivo":
+        return BackendArquivo(resto)
+    raise ValueError(f"Backend de estado desconhecido: {url}")
+
+
+class ContadorEmLote:
+    """Incrementos acumulados na memória e gravados no backend por uma thread.
+
+    `incrementar` só soma num dicionário e devolve o valor estimado (último
+    valor conhecido do backend + o que ainda não foi gravado). Se a gravação
+    falhar, os incrementos voltam para a fila e vão na próxima rodada. Os
+    valores consultados (campos e grupos inteiros) são relidos pela thread a
+    cada VALIDADE_LEITURA; com o backend fora, `valor` e `ler_grupo`
+    continuam respondendo com a última leitura que deu certo.
+    """
+
+    def __init__(self, backend, intervalo_ms=INTERVALO_GRAVACAO_MS):
+        self.backend = backend
+        self.intervalo = intervalo_ms / 1000
+        self.ultimo_erro = None
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._pendentes = defaultdict(Counter)  # grupo -> campo -> quantidade
+        self._gravando = defaultdict(Counter)  # lote que está indo para o backend
+        # (grupo, campo) -> (valor no backend, quando foi lido); campo None: o grupo inteiro, {campo: valor}
+        self._conhecidos = {}
+        self._consultados = set()  # chaves de _conhecidos que a thread mantém atualizadas
+        self._tentados = set()  # consultados que a thread já tentou ler (com ou sem sucesso)
+        self._respondendo = True  # se vale esperar pela primeira leitura (falso com o backend fora ou lento)
+        self._lido = threading.Condition(self._lock)
+        self._tarefas = []  # funções a rodar na thread até darem certo
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name="suite_pdf_estado", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def _laco(self):
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            self._executar_tarefas()
+            self.gravar()
+            self.atualizar()
+
+    def agendar(self, tarefa):
+        """Roda `tarefa()` na thread (nunca na requisição); se falhar, tenta de novo na próxima rodada."""
+        with self._lock:
+            self._tarefas.append(tarefa)
+        self._acordar.set()
+
+    def _executar_tarefas(self):
+        with self._lock:
+            tarefas, self._tarefas = self._tarefas, []
+        for posicao, tarefa in enumerate(tarefas):
+            try:
+                tarefa()
+            except Exception as e:
+                self.ultimo_erro = e
+                with self._lock:
+                    self._tarefas[:0] = tarefas[posicao:]
+                return
+
+    def atualizar(self):
+        """Relê do backend os valores consultados que passaram da validade (chamado pela thread)."""
+        with self._lock:
+            vencidos = [
+                chave for chave in self._consultados
+                if chave not in self._conhecidos or time.monotonic() - self._conhecidos[chave][1] > VALIDADE_LEITURA
+            ]
+        for grupo, campo in vencidos:
+            inicio = time.monotonic()
+            try:
+                lido = self.backend.ler_grupo(grupo) if campo is None else self.backend.ler(grupo, campo)
+            except Exception as e:
+                self.ultimo_erro = e
+                with self._lock:
+                    # Backend fora: quem espera pela primeira leitura segue com o que tem
+                    self._tentados.update(vencidos)
+                    self._respondendo = False
+                    self._lido.notify_all()
+                return
+            with self._lock:
+                # Se uma gravação terminou durante a leitura, o valor dela é mais novo
+                atual = self._conhecidos.get((grupo, campo))
+                if atual is None or atual[1] < inicio:
+                    self._conhecidos[(grupo, campo)] = (lido, inicio)
+                self._tentados.add((grupo, campo))
+                self._respondendo = True
+                self._lido.notify_all()
+
+    def _consultar(self, chave):
+        """Último valor lido da chave (None se nunca foi lido). Chamar com self._lock."""
+        if chave not in self._consultados:
+            # Primeira consulta: a thread lê o valor; espera um pouco por ele
+            self._consultados.add(chave)
+            self._acordar.set()
+            if self._respondendo and not self._lido.wait_for(
+                lambda: chave in self._conhecidos or chave in self._tentados, ESPERA_PRIMEIRA_LEITURA
+            ):
+                self._respondendo = False
+        return self._conhecidos.get(chave, (None, None))[0]
+
+    def _nao_gravado(self, grupo, campo):
+        return self._pendentes.get(grupo, {}).get(campo, 0) + self._gravando.get(grupo, {}).get(campo, 0)
+
+    def incrementar(self, grupo, campo, quantidade=1):
+        with self._lock:
+            self._pendentes[grupo][campo] += quantidade
+        return self.valor(grupo, campo)
+
+    def valor(self, grupo, campo):
+        with self._lock:
+            return (self._consultar((grupo, campo)) or 0) + self._nao_gravado(grupo, campo)
+
+    def ler_grupo(self, grupo):
+        """Todos os campos do grupo, já com os incrementos ainda não gravados."""
+        with self._lock:
+            valores = Counter(self._consultar((grupo, None)) or {})
+            valores.update(self._pendentes.get(grupo, {}))
+            valores.update(self._gravando.get(grupo, {}))
+        return dict(valores)
+
+    def gravar(self):
+        """Envia os incrementos acumulados (chamado pela thread; pode ser chamado à mão)."""
+        with self._lock_gravacao:
+            with self._lock:
+                if not any(self._pendentes.values()):
+                    return
+                self._gravando, self._pendentes = self._pendentes, defaultdict(Counter)
+            for grupo in list(self._gravando):
+                valores = {campo: quantidade for campo, quantidade in self._gravando[grupo].items() if quantidade}
+                if not valores:
+                    continue
+                try:
+                    novos = self.backend.somar(grupo, valores)
+                except Exception as e:
+                    self.ultimo_erro = e
+                    continue
+                agora = time.monotonic()
+                with self._lock:
+                    for campo, valor in novos.items():
+                        self._conhecidos[(grupo, campo)] = (valor, agora)
+                    if (grupo, None) in self._conhecidos:
+                        # O grupo lido antes já não conta com o que acabou de ser gravado
+                        self._conhecidos[(grupo, None)][0].update(novos)
+                    del self._gravando[grupo]
+                    self._lido.notify_all()
+            with self._lock:
+                # O que não foi gravado volta para a fila
+                for grupo, valores in self._gravando.items():
+                    self._pendentes[grupo].update(valores)
+                self._gravando = defaultdict(Counter)
+
+    def fechar(self):
+        self._parar.set()
+        self._acordar.set()
+        self.gravar()
+        self.backend.fechar()
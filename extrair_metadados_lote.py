@@ -0,0 +1,213 @@
+"""Extração de metadados em lote para auditoria de acervos.
+
+Uso:
+    python extrair_metadados_lote.py pasta/ [--lista arquivos.txt] --saida indice
+                                     [--formato parquet|csv] [--workers 4] [--lote 1000]
+
+Grava uma linha por documento, com esquema fixo (COLUNAS). Em Parquet, a
+saída é uma pasta com um arquivo por lote (parte-00000.parquet, ...); em
+CSV, um único arquivo que recebe os lotes no fim. Rodar de novo com a mesma
+saída continua de onde parou: os documentos já indexados são pulados.
+"""
+import argparse
+import csv
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+
+from extrator_metadados import extrair_metadados
+from verificar_lote import listar_arquivos
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow, só CSV
+    pa = None
+    pq = None
+
+
+# Esquema estável: a ordem e os tipos (nomes do pyarrow) não dependem do documento
+COLUNAS = [
+    ("arquivo", "string"),
+    ("tamanho_bytes", "int64"),
+    ("paginas", "int64"),
+    ("formato", "string"),
+    ("titulo", "string"),
+    ("autor", "string"),
+    ("assunto", "string"),
+    ("palavras_chave", "string"),
+    ("criador", "string"),
+    ("produtor", "string"),
+    ("data_criacao", "string"),
+    ("data_modificacao", "string"),
+    ("protegido", "bool_"),
+    ("permissoes", "int64"),
+    ("tem_anotacoes", "bool_"),
+    ("tem_formularios", "bool_"),
+    ("fontes", "string"),
+    ("latitude", "float64"),
+    ("longitude", "float64"),
+    ("erro", "string"),
+    ("processado_em", "string"),
+]
+# Campos de doc.metadata -> colunas
+CAMPOS_INFO = {
+    "format": "formato",
+    "title": "titulo",
+    "author": "autor",
+    "subject": "assunto",
+    "keywords": "palavras_chave",
+    "creator": "criador",
+    "producer": "produtor",
+    "creationDate": "data_criacao",
+    "modDate": "data_modificacao",
+}
+SEPARADOR_FONTES = "; "
+DOCUMENTOS_POR_LOTE = 1000
+
+
+def linha_documento(caminho):
+    """Extrai os metadados de um arquivo e devolve a linha da tabela (nunca levanta exceção)."""
+    linha = {nome: None for nome, _ in COLUNAS}
+    linha["arquivo"] = caminho
+    try:
+        # O paralelismo já é entre documentos: as páginas ficam neste worker
+        metadados = extrair_metadados(caminho, workers=1)
+        for campo, coluna in CAMPOS_INFO.items():
+            linha[coluna] = metadados.metadados.get(campo) or None
+        linha.update(
+            tamanho_bytes=metadados.tamanho_bytes,
+            paginas=metadados.paginas,
+            protegido=metadados.protegido,
+            permissoes=metadados.permissoes,
+            tem_anotacoes=metadados.tem_anotacoes,
+            tem_formularios=metadados.tem_formularios,
+            fontes=SEPARADOR_FONTES.join(metadados.fontes),
+        )
+        if metadados.coordenadas:
+            linha["latitude"], linha["longitude"] = metadados.coordenadas
+    except Exception as e:
+        linha["erro"] = f"{type(e).__name__}: {e}"
+    linha["processado_em"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    return linha
+
+
+class SaidaParquet:
+    """Pasta de arquivos Parquet, um por lote."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        os.makedirs(caminho, exist_ok=True)
+        self.esquema = pa.schema([(nome, getattr(pa, tipo)()) for nome, tipo in COLUNAS])
+
+    def _partes(self):
+        return sorted(nome for nome in os.listdir(self.caminho) if nome.endswith(".parquet"))
+
+    def ja_processados(self):
+        processados = set()
+        for nome in self._partes():
+            tabela = pq.read_table(os.path.join(self.caminho, nome), columns=["arquivo"])
+            processados.update(tabela.column("arquivo").to_pylist())
+        return processados
+
+    def gravar(self, linhas):
+        nome = f"parte-{len(self._partes()):05d}.parquet"
+        destino = os.path.join(self.caminho, nome)
+        tabela = pa.Table.from_pylist(linhas, schema=self.esquema)
+        # Grava num temporário e renomeia: uma parte interrompida nunca é lida na retomada
+        pq.write_table(tabela, destino + ".tmp", compression="zstd")
+        os.replace(destino + ".tmp", destino)
+
+
+class SaidaCSV:
+    """Um único CSV; cada lote é acrescentado no fim."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def ja_processados(self):
+        if not os.path.exists(self.caminho):
+            return set()
+        with open(self.caminho, newline="", encoding="utf-8") as f:
+            return {linha["arquivo"] for linha in csv.DictReader(f)}
+
+    def gravar(self, linhas):
+        novo = not os.path.exists(self.caminho) or os.path.getsize(self.caminho) == 0
+        with open(self.caminho, "a", newline="", encoding="utf-8") as f:
+            escritor = csv.DictWriter(f, fieldnames=[nome for nome, _ in COLUNAS])
+            if novo:
+                escritor.writeheader()
+            escritor.writerows(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def abrir_saida(caminho, formato=None):
+    formato = formato or ("parquet" if pa is not None else "csv")
+    if formato == "parquet":
+        if pa is None:
+            raise RuntimeError("Saída Parquet precisa do pacote pyarrow; use --formato csv")
+        return SaidaParquet(caminho)
+    return SaidaCSV(caminho)
+
+
+def extrair_lote(arquivos, saida, workers=None, documentos_por_lote=DOCUMENTOS_POR_LOTE, progresso=None):
+    """Extrai os metadados em paralelo, pulando o que já está na saída. Devolve o resumo."""
+    processados = saida.ja_processados()
+    pendentes = (caminho for caminho in map(os.path.abspath, arquivos) if caminho not in processados)
+    resumo = {"ja_indexados": len(processados), "documentos": 0, "erros": 0, "bytes": 0}
+    inicio = time.perf_counter()
+    lote = []
+    with multiprocessing.Pool(workers or os.cpu_count() or 1) as pool:
+        try:
+            for linha in pool.imap_unordered(linha_documento, pendentes, chunksize=8):
+                lote.append(linha)
+                resumo["documentos"] += 1
+                resumo["bytes"] += linha["tamanho_bytes"] or 0
+                if linha["erro"]:
+                    resumo["erros"] += 1
+                if len(lote) >= documentos_por_lote:
+                    saida.gravar(lote)
+                    lote = []
+                    if progresso:
+                        progresso(resumo)
+        finally:
+            # Interrompido ou não, o que já foi extraído fica salvo para a retomada
+            if lote:
+                saida.gravar(lote)
+    resumo["segundos"] = time.perf_counter() - inicio
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extrai metadados de PDFs em lote para Parquet ou CSV.")
+    parser.add_argument("caminhos", nargs="*", help="arquivos PDF ou pastas (percorridas recursivamente)")
+    parser.add_argument("--lista", help="arquivo com um caminho por linha ('-' para a entrada padrão)")
+    parser.add_argument("--saida", required=True, help="pasta (Parquet) ou arquivo (CSV) de saída")
+    parser.add_argument("--formato", choices=["parquet", "csv"], default=None,
+                        help="padrão: parquet se o pyarrow estiver instalado, senão csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=DOCUMENTOS_POR_LOTE, help="documentos por gravação")
+    args = parser.parse_args(argv)
+    if not args.caminhos and not args.lista:
+        parser.error("informe arquivos, pastas ou --lista")
+
+    def progresso(resumo):
+        print(f"{resumo['documentos']} documentos indexados...", file=sys.stderr)
+
+    saida = abrir_saida(args.saida, args.formato)
+    resumo = extrair_lote(listar_arquivos(args.caminhos, args.lista), saida, args.workers, args.lote, progresso)
+    segundos = max(resumo["segundos"], 1e-9)
+    print(
+        f"{resumo['documentos']} documentos novos ({resumo['bytes'] / (1024 * 1024):.1f} MB) em "
+        f"{resumo['segundos']:.2f}s ({resumo['documentos'] / segundos:.1f} documentos/s), "
+        f"{resumo['erros']} com erro; {resumo['ja_indexados']} já estavam indexados",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
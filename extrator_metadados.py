@@ -0,0 +1,155 @@
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+from analise_documento import LeituraDocumento
+from espaco_trabalho import abrir_pdf
+from paginas_paralelas import mapear_paginas, paralelizar
+
+
+# Extração de metadados em uma única passada pelas páginas: cada
+# característica para de ser procurada assim que é encontrada (o texto só é
+# extraído enquanto não houver coordenadas), e as fontes só são listadas
+# nas páginas com um dicionário /Resources ainda não visto, já que as
+# páginas costumam compartilhar os mesmos recursos.
+# Documentos grandes são resumidos página a página em vários processos (aí
+# todas as páginas são lidas, em troca de usar todos os núcleos).
+RE_COORDENADAS = re.compile(r"([-+]?\d{1,2}\.\d+)[, ]+([-+]?\d{1,3}\.\d+)")
+URL_MAPA = "https://www.google.com/maps?q={}"
+
+
+@dataclass
+class MetadadosPDF:
+    """Resultado da extração, consumido pela aba de metadados e pelas exportações."""
+
+    metadados: dict
+    autor: str
+    paginas: int
+    permissoes: int
+    protegido: bool
+    tamanho_bytes: int
+    tem_anotacoes: bool = False
+    tem_formularios: bool = False
+    fontes: List[str] = field(default_factory=list)
+    coordenadas: Optional[Tuple[float, float]] = None
+
+    def como_dicionario(self):
+        """Campos com os rótulos exibidos na aba (e usados no CSV)."""
+        if self.coordenadas:
+            texto = f"{self.coordenadas[0]}, {self.coordenadas[1]}"
+            coordenadas = f"[{texto}]({URL_MAPA.format(texto)})"
+        else:
+            coordenadas = "Não encontrado"
+        return {
+            **self.metadados,
+            "Autor (detectado)": self.autor,
+            "Número de páginas": self.paginas,
+            "Permissões": self.permissoes,
+            "Protegido com senha": self.protegido,
+            "Tamanho do arquivo (bytes)": self.tamanho_bytes,
+            "Tem anotações": self.tem_anotacoes,
+            "Tem formulários": self.tem_formularios,
+            "Fontes usadas": self.fontes,
+            "Coordenadas detectadas (Lat, Lon)": coordenadas,
+        }
+
+    def para_dicionario(self):
+        return asdict(self)
+
+    @classmethod
+    def de_dicionario(cls, dados):
+        dados = dict(dados)
+        if dados.get("coordenadas"):
+            dados["coordenadas"] = tuple(dados["coordenadas"])
+        return cls(**dados)
+
+
+def procurar_coordenadas(texto):
+    """Primeiro par (lat, lon) válido no texto, ou None."""
+    for ocorrencia in RE_COORDENADAS.finditer(texto):
+        latitude, longitude = float(ocorrencia.group(1)), float(ocorrencia.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+    return None
+
+
+def resumir_pagina(pagina):
+    """(coordenadas, tem anotações, tem formulários, [(xref, nome) das fontes]) de uma página."""
+    return (
+        procurar_coordenadas(pagina.get_text()),
+        pagina.first_annot is not None,
+        pagina.first_widget is not None,
+        [(fonte[0], fonte[3]) for fonte in pagina.get_fonts(full=True)],
+    )
+
+
+def _registrar_fontes(resultado, fontes, vistas):
+    for xref, nome in fontes:
+        if xref in vistas:
+            continue
+        vistas.add(xref)
+        if nome not in resultado.fontes:
+            resultado.fontes.append(nome)
+
+
+def _chave_recursos(doc, numero):
+    # Mesmo /Resources (o mesmo objeto ou o mesmo dicionário embutido) = mesmas
+    # fontes; recursos herdados do nó /Pages ficam sem chave e são sempre lidos
+    tipo, valor = doc.xref_get_key(doc.page_xref(numero), "Resources")
+    return None if tipo == "null" else (tipo, valor)
+
+
+def extrair_metadados(pdf, tamanho_arquivo=None, progresso=None, analise=None, workers=None):
+    """Lê os metadados do PDF (caminho ou bytes) percorrendo as páginas uma vez.
+
+    Com `analise` (AnaliseDocumento do mesmo conteúdo), reaproveita o que
+    outras abas já extraíram. `workers` limita os processos usados nas
+    páginas (1 lê tudo neste processo).
+    """
+    if tamanho_arquivo is None:
+        tamanho_arquivo = os.path.getsize(pdf) if isinstance(pdf, (str, os.PathLike)) else len(pdf)
+    doc = abrir_pdf(pdf)
+    try:
+        info = doc.metadata or {}
+        resultado = MetadadosPDF(
+            metadados=info,
+            # Tentativa robusta de identificação do autor
+            autor=info.get("author") or info.get("Author") or "Não encontrado",
+            paginas=doc.page_count,
+            permissoes=doc.permissions,
+            protegido=bool(doc.is_encrypted),
+            tamanho_bytes=tamanho_arquivo,
+        )
+        fontes_vistas = set()
+        if paralelizar(doc.page_count, workers):
+            resumos = mapear_paginas(pdf, resumir_pagina, paginas=range(doc.page_count), workers=workers,
+                                     analise=analise)
+            for numero, (coordenadas, anotacoes, formularios, fontes) in resumos:
+                if progresso:
+                    progresso(numero / doc.page_count, f"Página {numero + 1} de {doc.page_count}")
+                resultado.coordenadas = resultado.coordenadas or coordenadas
+                resultado.tem_anotacoes = resultado.tem_anotacoes or anotacoes
+                resultado.tem_formularios = resultado.tem_formularios or formularios
+                _registrar_fontes(resultado, fontes, fontes_vistas)
+            return resultado
+
+        leitura = LeituraDocumento(doc, analise)
+        recursos_vistos = set()
+        for numero in range(doc.page_count):
+            if progresso:
+                progresso(numero / max(doc.page_count, 1), f"Página {numero + 1} de {doc.page_count}")
+            if resultado.coordenadas is None:
+                resultado.coordenadas = procurar_coordenadas(leitura.texto(numero))
+            if not resultado.tem_anotacoes:
+                resultado.tem_anotacoes = bool(leitura.anotacoes(numero))
+            if not resultado.tem_formularios:
+                resultado.tem_formularios = bool(leitura.widgets(numero))
+            recursos = _chave_recursos(doc, numero)
+            if recursos is None or recursos not in recursos_vistos:
+                recursos_vistos.add(recursos)
+                _registrar_fontes(resultado, ((fonte[0], fonte[3]) for fonte in leitura.fontes(numero)),
+                                  fontes_vistas)
+        return resultado
+    finally:
+        doc.close()
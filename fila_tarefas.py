@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Fila de tarefas em segundo plano: o script do Streamlit só envia a tarefa e
+# acompanha o progresso, então a conversão continua mesmo se o navegador
+# desconectar ou a página for recarregada.
+WORKERS = int(os.environ.get("SUITE_PDF_TAREFAS_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+MAX_PENDENTES = int(os.environ.get("SUITE_PDF_TAREFAS_PENDENTES", "32"))
+TTL_SEGUNDOS = int(os.environ.get("SUITE_PDF_TAREFAS_TTL", str(30 * 60)))
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+
+class FilaCheia(Exception):
+    pass
+
+
+class Tarefa:
+    def __init__(self, id_tarefa, descricao=""):
+        self.id = id_tarefa
+        self.descricao = descricao
+        self.estado = PENDENTE
+        self.progresso = 0.0
+        self.mensagem = ""
+        self.avisos = []
+        self.resultado = None
+        self.erro = None
+        self.detalhes_erro = None
+        self.criada_em = time.time()
+        self.concluida_em = None
+
+    @property
+    def concluida(self):
+        return self.estado in (CONCLUIDA, ERRO)
+
+    def atualizar(self, fracao=None, mensagem=None, aviso=None):
+        """Callback de progresso passado às funções de processamento."""
+        if fracao is not None:
+            self.progresso = min(max(float(fracao), 0.0), 1.0)
+        if mensagem is not None:
+            self.mensagem = mensagem
+        if aviso is not None:
+            self.avisos.append(aviso)
+
+
+class FilaTarefas:
+    def __init__(self, workers=WORKERS, max_pendentes=MAX_PENDENTES, ttl=TTL_SEGUNDOS):
+        self.workers = workers
+        self.max_pendentes = max_pendentes
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="suite_pdf_tarefa")
+        self._tarefas = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, id_tarefa, funcao, *args, descricao="", **kwargs):
+        """Agenda funcao(*args, progresso=..., **kwargs) e devolve a Tarefa.
+
+        Se já existe uma tarefa com o mesmo id (ex.: a chave do cache do mesmo
+        upload) que não falhou, ela é reaproveitada em vez de reenviada.
+        """
+        with self._lock:
+            self._remover_expiradas()
+            existente = self._tarefas.get(id_tarefa)
+            if existente is not None and existente.estado != ERRO:
+                return existente
+
+            ativas = sum(1 for t in self._tarefas.values() if not t.concluida)
+            if ativas >= self.workers + self.max_pendentes:
+                raise FilaCheia("Servidor ocupado, tente novamente em instantes.")
+
+            tarefa = Tarefa(id_tarefa, descricao)
+            self._tarefas[id_tarefa] = tarefa
+        self._executor.submit(self._executar, tarefa, funcao, args, kwargs)
+        return tarefa
+
+    def obter(self, id_tarefa):
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def descartar(self, id_tarefa):
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            if tarefa is not None and tarefa.concluida:
+                del self._tarefas[id_tarefa]
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        tarefa.estado = EXECUTANDO
+        try:
+            tarefa.resultado = funcao(*args, progresso=tarefa.atualizar, **kwargs)
+            tarefa.progresso = 1.0
+            tarefa.estado = CONCLUIDA
+        except Exception as e:
+            tarefa.erro = f"{type(e).__name__}: {e}"
+            tarefa.detalhes_erro = traceback.format_exc()
+            tarefa.estado = ERRO
+        finally:
+            tarefa.concluida_em = time.time()
+
+    def _remover_expiradas(self):
+        limite = time.time() - self.ttl
+        for id_tarefa, tarefa in list(self._tarefas.items()):
+            if tarefa.concluida and tarefa.concluida_em < limite:
+                del self._tarefas[id_tarefa]
+
+    def resumo(self):
+        with self._lock:
+            estados = [t.estado for t in self._tarefas.values()]
+        return {estado: estados.count(estado) for estado in (PENDENTE, EXECUTANDO, CONCLUIDA, ERRO)}
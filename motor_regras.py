@@ -0,0 +1,253 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+
+
+# Regras de conteúdo para a verificação de PDFs. Cada regra tem um ou mais
+# gatilhos literais; todos os gatilhos viram uma única alternância de
+# literais (que o re percorre em velocidade de busca de texto) e só as regras
+# cujo gatilho aparece são confirmadas com a própria expressão. Assim cada
+# stream é lido uma vez, qualquer que seja o número de regras. O arquivo de
+# regras é relido quando muda, sem reiniciar o app.
+ARQUIVO_REGRAS = os.environ.get(
+    "SUITE_PDF_REGRAS_AMEACAS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras_ameacas.json")
+)
+# Orçamento de descompressão: um stream de poucos KB pode virar GBs (bomba
+# de descompressão), então a saída é gerada em blocos e cortada nos limites.
+LIMITE_STREAM_MB = int(os.environ.get("SUITE_PDF_LIMITE_STREAM_MB", "16"))
+LIMITE_DOCUMENTO_MB = int(os.environ.get("SUITE_PDF_LIMITE_DOCUMENTO_MB", "128"))
+TAMANHO_BLOCO = 256 * 1024
+# Quanto do bloco anterior é reanalisado, para achar assinaturas que cruzam blocos
+SOBREPOSICAO_REGEX = 256
+
+CAMPOS_PADRAO = ("texto", "hex", "regex")
+
+# Filtros que a verificação sabe decodificar em blocos; nos demais (imagens,
+# LZW, criptografia) o conteúdo é analisado como está no arquivo
+FILTROS = {
+    "/FlateDecode": "flate", "/Fl": "flate",
+    "/ASCIIHexDecode": "hex", "/AHx": "hex",
+    "/ASCII85Decode": "a85", "/A85": "a85",
+}
+
+_motores = {}
+_lock_motores = threading.Lock()
+
+
+class RegraInvalida(ValueError):
+    pass
+
+
+def _compilar_regra(regra):
+    """Devolve (expressão de confirmação, gatilhos, tamanho máximo da ocorrência)."""
+    campos = [campo for campo in CAMPOS_PADRAO if campo in regra]
+    if len(campos) != 1:
+        raise RegraInvalida(f"Regra {regra.get('id')!r}: use exatamente um de {', '.join(CAMPOS_PADRAO)}")
+    campo = campos[0]
+    ignorar_maiusculas = bool(regra.get("ignorar_maiusculas"))
+    if campo == "regex":
+        padrao, tamanho = regra["regex"].encode("latin-1"), SOBREPOSICAO_REGEX
+        gatilhos = regra.get("gatilho")
+        if not gatilhos:
+            raise RegraInvalida(f"Regra {regra.get('id')!r}: regras com regex precisam de um gatilho literal")
+        if isinstance(gatilhos, str):
+            gatilhos = [gatilhos]
+        gatilhos = [gatilho.encode("utf-8") for gatilho in gatilhos]
+    else:
+        literal = regra["texto"].encode("utf-8") if campo == "texto" else bytes.fromhex(regra["hex"])
+        padrao, tamanho, gatilhos = re.escape(literal), len(literal), [literal]
+    if ignorar_maiusculas:
+        gatilhos = [gatilho.lower() for gatilho in gatilhos]
+    try:
+        expressao = re.compile(padrao, re.DOTALL | (re.IGNORECASE if ignorar_maiusculas else 0))
+    except re.error as e:
+        raise RegraInvalida(f"Regra {regra.get('id')!r}: expressão inválida: {e}") from e
+    return expressao, gatilhos, tamanho
+
+
+def _alternancia(gatilhos):
+    if not gatilhos:
+        return None
+    # Só literais e sem grupos: o re usa busca rápida de prefixo nesse caso
+    return re.compile(b"|".join(re.escape(g) for g in sorted(gatilhos, key=len, reverse=True)))
+
+
+class MotorRegras:
+    """Conjunto de regras compilado: uma alternância de gatilhos + confirmação por regra."""
+
+    def __init__(self, regras, versao=""):
+        self.regras = list(regras)
+        # Identifica o conjunto de regras (ex.: para não reaproveitar resultados de regras antigas)
+        self.versao = versao
+        self._confirmacoes = []
+        self._por_gatilho = {}            # gatilho exato -> regras
+        self._por_gatilho_minusculo = {}  # gatilho em minúsculas -> regras que ignoram maiúsculas
+        maior = 1
+        for numero, regra in enumerate(self.regras):
+            expressao, gatilhos, tamanho = _compilar_regra(regra)
+            self._confirmacoes.append(expressao)
+            destino = self._por_gatilho_minusculo if regra.get("ignorar_maiusculas") else self._por_gatilho
+            for gatilho in gatilhos:
+                destino.setdefault(gatilho, []).append(numero)
+            maior = max(maior, tamanho)
+        self._gatilhos = _alternancia(self._por_gatilho)
+        self._gatilhos_minusculos = _alternancia(self._por_gatilho_minusculo)
+        self.sobreposicao = maior - 1
+
+    def analisar(self, blocos):
+        """Percorre os blocos uma vez e devolve as regras encontradas (cada uma uma vez)."""
+        encontradas = set()
+        anterior = b""
+        for bloco in blocos:
+            dados = anterior + bloco if anterior else bloco
+            if self._gatilhos is not None:
+                self._confirmar(self._gatilhos, dados, dados, self._por_gatilho, encontradas)
+            if self._gatilhos_minusculos is not None:
+                self._confirmar(self._gatilhos_minusculos, dados.lower(), dados,
+                                self._por_gatilho_minusculo, encontradas)
+            anterior = dados[-self.sobreposicao:] if self.sobreposicao else b""
+            if len(encontradas) == len(self.regras):
+                break
+        return [self.regras[numero] for numero in sorted(encontradas)]
+
+    def _confirmar(self, gatilhos, texto, dados, por_gatilho, encontradas):
+        # Cada regra é confirmada no máximo uma vez por bloco: a busca parte do
+        # primeiro gatilho e vai até o fim do bloco
+        verificadas = set()
+        for ocorrencia in gatilhos.finditer(texto):
+            for numero in por_gatilho[ocorrencia.group()]:
+                if numero in encontradas or numero in verificadas:
+                    continue
+                verificadas.add(numero)
+                inicio = max(0, ocorrencia.start() - SOBREPOSICAO_REGEX)
+                if self._confirmacoes[numero].search(dados, inicio):
+                    encontradas.add(numero)
+
+
+def carregar_motor(caminho=ARQUIVO_REGRAS):
+    """Motor para o arquivo de regras, recompilado só quando o arquivo muda."""
+    modificado = os.path.getmtime(caminho)
+    with _lock_motores:
+        em_cache = _motores.get(caminho)
+        if em_cache is not None and em_cache[0] == modificado:
+            return em_cache[1]
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        motor = MotorRegras(json.loads(conteudo)["regras"], hashlib.sha256(conteudo).hexdigest()[:16])
+        _motores[caminho] = (modificado, motor)
+        return motor
+
+
+def filtros_do_stream(doc, xref):
+    tipo, valor = doc.xref_get_key(xref, "Filter")
+    if tipo == "name":
+        return [valor]
+    if tipo == "array":
+        return re.findall(r"/[A-Za-z0-9]+", valor)
+    return []
+
+
+class Descompressor:
+    """Itera o conteúdo decodificado de um stream em blocos, sem passar de `limite` bytes.
+
+    Depois de iterado, `total` diz quantos bytes saíram, `truncado` se o
+    limite foi atingido antes do fim e `lido` quantos bytes do stream bruto
+    foram gastos para gerar essa saída (estimado pela fração da entrada que o
+    Flate consumiu), de onde sai a razão de expansão mesmo com o corte.
+    """
+
+    def __init__(self, dados, filtros, limite):
+        self.dados = dados
+        self.filtros = filtros
+        self.limite = limite
+        self.total = 0
+        self.truncado = False
+        self.lido = len(dados)
+
+    def __iter__(self):
+        for bloco in self._blocos():
+            restante = self.limite - self.total
+            if len(bloco) > restante:
+                self.total = self.limite
+                self.truncado = True
+                if restante:
+                    yield bloco[:restante]
+                return
+            self.total += len(bloco)
+            yield bloco
+
+    def _blocos(self):
+        dados = self.dados
+        for posicao, filtro in enumerate(self.filtros):
+            tipo = FILTROS.get(filtro)
+            if tipo is None:
+                break  # não decodificável aqui: analisa o que já foi decodificado
+            ultimo = posicao == len(self.filtros) - 1
+            if tipo == "flate":
+                blocos = self._flate(dados)
+                if ultimo:
+                    yield from blocos
+                    return
+                dados = _juntar(blocos, self.limite)
+            else:
+                try:
+                    dados = _decodificar_ascii(dados, tipo)
+                except (ValueError, binascii.Error):
+                    break
+        for inicio in range(0, len(dados), TAMANHO_BLOCO):
+            yield dados[inicio:inicio + TAMANHO_BLOCO]
+
+
+    def _flate(self, dados):
+        # A fração consumida desta etapa vale para o stream bruto (as etapas
+        # anteriores, ASCIIHex/ASCII85, têm tamanho proporcional)
+        for bloco, restante in _flate_em_blocos(dados):
+            self.lido = round(len(self.dados) * (len(dados) - restante) / max(len(dados), 1))
+            yield bloco
+
+
+def _flate_em_blocos(dados):
+    """Gera (bloco decodificado, bytes da entrada ainda não consumidos)."""
+    descompressor = zlib.decompressobj()
+    entrada = dados
+    try:
+        while entrada and not descompressor.eof:
+            bloco = descompressor.decompress(entrada, TAMANHO_BLOCO)
+            if not bloco and len(descompressor.unconsumed_tail) == len(entrada):
+                break  # sem progresso
+            entrada = descompressor.unconsumed_tail
+            if bloco:
+                yield bloco, len(entrada)
+        resto = descompressor.flush()
+        if resto:
+            yield resto, 0
+    except zlib.error:
+        return  # stream corrompido: analisa o que saiu até aqui
+
+
+def _juntar(blocos, limite):
+    partes = []
+    total = 0
+    for bloco in blocos:
+        partes.append(bloco)
+        total += len(bloco)
+        if total >= limite:
+            break
+    return b"".join(partes)
+
+
+def _decodificar_ascii(dados, tipo):
+    if tipo == "hex":
+        hexa = re.sub(rb"\s", b"", dados).split(b">")[0]
+        if len(hexa) % 2:
+            hexa += b"0"
+        return binascii.unhexlify(hexa)
+    texto = re.sub(rb"\s", b"", dados)
+    if texto.endswith(b"~>"):
+        texto = texto[:-2]
+    return base64.a85decode(texto)
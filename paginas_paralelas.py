@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from espaco_trabalho import DIRETORIO_BASE, abrir_pdf
+
+
+# Execução página a página em vários processos. Um documento do PyMuPDF não
+# pode ser usado por mais de uma thread, então o paralelismo é por processo:
+# cada worker abre o PDF uma vez (e o mantém aberto entre as faixas do mesmo
+# arquivo) e processa faixas contíguas de páginas; os resultados voltam na
+# ordem das páginas, por um gerador, à medida que as faixas terminam. Abaixo
+# de MIN_PAGINAS_PARALELO (ou com um worker só) tudo roda neste processo,
+# pois abrir o PDF em cada worker custaria mais que o ganho.
+WORKERS = int(os.environ.get("SUITE_PDF_PAGINAS_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+MIN_PAGINAS_PARALELO = int(os.environ.get("SUITE_PDF_PAGINAS_MIN_PARALELO", "200"))
+# Faixas menores dão progresso mais fluido; maiores, menos viagens entre processos
+MIN_PAGINAS_FAIXA = 16
+MAX_PAGINAS_FAIXA = 128
+# Faixas enviadas por worker além da que está sendo consumida (limita a memória
+# ocupada por resultados prontos que ainda não foram lidos)
+FAIXAS_ADIANTADAS = 2
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+# No worker: (identificação do arquivo, documento aberto)
+_documento_worker = None
+_FALTA = object()
+
+
+def _pool(workers):
+    # Um pool por tamanho, reaproveitado entre documentos e sessões
+    with _lock_pools:
+        pool = _pools.get(workers)
+        if pool is None:
+            # "spawn": um fork do servidor do Streamlit, cheio de threads, pode travar
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        return pool
+
+
+def _descartar_pool(workers):
+    with _lock_pools:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def paralelizar(total_paginas, workers=None):
+    """Se vale a pena dividir `total_paginas` entre processos."""
+    if multiprocessing.current_process().daemon:
+        # Worker de um multiprocessing.Pool (ex.: os scripts de lote): processos
+        # daemon não podem criar filhos, então a leitura fica neste processo
+        return False
+    return (workers or WORKERS) > 1 and total_paginas >= MIN_PAGINAS_PARALELO
+
+
+def dividir_faixas(paginas, workers):
+    """Agrupa os números de página (ordenados) em faixas contíguas (inicio, fim) de tamanho parecido."""
+    tamanho = len(paginas) // (workers * 4) if workers else len(paginas)
+    tamanho = max(MIN_PAGINAS_FAIXA, min(MAX_PAGINAS_FAIXA, tamanho))
+    faixas = []
+    for numero in paginas:
+        if faixas and faixas[-1][1] == numero and numero - faixas[-1][0] < tamanho:
+            faixas[-1][1] = numero + 1
+        else:
+            faixas.append([numero, numero + 1])
+    return [tuple(faixa) for faixa in faixas]
+
+
+def _abrir_no_worker(caminho):
+    global _documento_worker
+    estado = os.stat(caminho)
+    identificacao = (caminho, estado.st_size, estado.st_mtime_ns)
+    if _documento_worker is None or _documento_worker[0] != identificacao:
+        if _documento_worker is not None:
+            _documento_worker[1].close()
+        _documento_worker = (identificacao, abrir_pdf(caminho))
+    return _documento_worker[1]
+
+
+def _processar_faixa(caminho, funcao, argumentos, inicio, fim):
+    doc = _abrir_no_worker(caminho)
+    return [funcao(doc[numero], *argumentos) for numero in range(inicio, fim)]
+
+
+def _chave_memoria(funcao, argumentos, numero):
+    return ("paginas", f"{funcao.__module__}.{funcao.__qualname__}", argumentos, numero)
+
+
+def mapear_paginas(pdf, funcao, *argumentos, paginas=None, workers=None, analise=None, guardar=True):
+    """Gera (número da página, funcao(página, *argumentos)) na ordem das páginas.
+
+    `pdf` é um caminho ou bytes; `funcao` precisa ser uma função de módulo (é
+    enviada aos workers), assim como os argumentos e o resultado precisam ser
+    serializáveis. Com `analise` (AnaliseDocumento do mesmo conteúdo), páginas
+    já calculadas vêm da memória e as novas ficam guardadas nela (com
+    `guardar=False`, a memória só é consultada).
+    """
+    workers = workers or WORKERS
+    if paginas is None:
+        doc = abrir_pdf(pdf)
+        paginas = range(doc.page_count)
+        doc.close()
+    paginas = sorted(paginas)
+    prontas = {}
+    if analise is not None:
+        for numero in paginas:
+            valor = analise.consultar(_chave_memoria(funcao, argumentos, numero), _FALTA)
+            if valor is not _FALTA:
+                prontas[numero] = valor
+    faltando = [numero for numero in paginas if numero not in prontas]
+
+    if paralelizar(len(faltando), workers):
+        calculadas = _em_processos(pdf, funcao, argumentos, faltando, workers)
+    else:
+        calculadas = _neste_processo(pdf, funcao, argumentos, faltando)
+    try:
+        for numero in paginas:
+            if numero in prontas:
+                yield numero, prontas.pop(numero)
+                continue
+            calculada, resultado = next(calculadas)
+            if analise is not None and guardar:
+                analise.memorizar(_chave_memoria(funcao, argumentos, calculada), lambda: resultado)
+            yield calculada, resultado
+    finally:
+        calculadas.close()
+
+
+def _neste_processo(pdf, funcao, argumentos, paginas):
+    if not paginas:
+        return
+    doc = abrir_pdf(pdf)
+    try:
+        for numero in paginas:
+            yield numero, funcao(doc[numero], *argumentos)
+    finally:
+        doc.close()
+
+
+def _em_processos(pdf, funcao, argumentos, paginas, workers):
+    temporario = None
+    if not isinstance(pdf, (str, os.PathLike)):
+        # Os workers abrem o arquivo pelo caminho: os bytes não viajam a cada faixa
+        os.makedirs(DIRETORIO_BASE, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(suffix=".pdf", dir=DIRETORIO_BASE)
+        with os.fdopen(descritor, "wb") as f:
+            f.write(pdf)
+        pdf = temporario
+    caminho = os.path.abspath(pdf)
+    faixas = deque(dividir_faixas(paginas, workers))
+    enviadas = deque()
+    try:
+        while faixas or enviadas:
+            while faixas and len(enviadas) < workers * FAIXAS_ADIANTADAS:
+                inicio, fim = faixas.popleft()
+                futuro = _pool(workers).submit(_processar_faixa, caminho, funcao, argumentos, inicio, fim)
+                enviadas.append((inicio, futuro))
+            inicio, futuro = enviadas.popleft()
+            try:
+                resultados = futuro.result()
+            except BrokenProcessPool:
+                _descartar_pool(workers)  # um worker morreu (ex.: falta de memória): a próxima chamada cria outro pool
+                raise
+            yield from enumerate(resultados, start=inicio)
+    finally:
+        for _, futuro in enviadas:
+            futuro.cancel()
+        if temporario:
+            # Com faixas ainda rodando, o worker mantém o arquivo aberto; no Linux a remoção não atrapalha
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+# Cache de recursos remotos (animações Lottie etc.) que nunca deixa a
+# requisição esperando um host externo: quem pede recebe na hora a cópia em
+# memória, a do disco ou a embutida no repositório (nessa ordem), e o
+# download, com tempo limite curto, roda numa thread quando a cópia falta ou
+# venceu. Em nós sem rede (SUITE_PDF_OFFLINE=1) só as cópias locais são usadas.
+DIRETORIO_RECURSOS = os.environ.get("SUITE_PDF_RECURSOS_DIR", os.path.join(".cache", "recursos"))
+DIRETORIO_EMBUTIDOS = os.path.dirname(os.path.abspath(__file__))
+TTL_RECURSOS = int(os.environ.get("SUITE_PDF_RECURSOS_TTL", str(7 * 24 * 3600)))
+TIMEOUT_DOWNLOAD = (2, 5)  # (conexão, leitura) em segundos
+# Depois de uma falha, espera isso antes de tentar baixar de novo
+ESPERA_APOS_FALHA = 300
+OFFLINE = os.environ.get("SUITE_PDF_OFFLINE", "0") == "1"
+LIMITE_RECURSO_MB = 5
+
+URL_LOTTIE_METADADOS = "https://assets1.lottiefiles.com/packages/lf20_3ntisyac.json"
+ANIMACAO_METADADOS = os.path.join(DIRETORIO_EMBUTIDOS, "animacao_metadados.json")
+
+
+class RecursosRemotos:
+    """Recursos JSON por URL, servidos da memória/disco e atualizados em segundo plano."""
+
+    def __init__(self, diretorio=DIRETORIO_RECURSOS, ttl=TTL_RECURSOS, offline=OFFLINE):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._memoria = {}  # url -> (dados, momento do download)
+        self._baixando = set()
+        self._falhas = {}  # url -> momento da última falha
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def _caminho(self, url):
+        return os.path.join(self.diretorio, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _ler_disco(self, url):
+        caminho = self._caminho(url)
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                return json.load(f), os.path.getmtime(caminho)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _ler_embutido(reserva):
+        if not reserva:
+            return None
+        try:
+            with open(reserva, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def obter_json(self, url, reserva=None):
+        """Devolve o recurso sem esperar pela rede (ou None se não houver cópia alguma).
+
+        `reserva` é um arquivo local usado enquanto não houver download.
+        """
+        with self._lock:
+            em_memoria = self._memoria.get(url)
+        if em_memoria is None:
+            em_memoria = self._ler_disco(url)
+            if em_memoria is not None:
+                with self._lock:
+                    self._memoria[url] = em_memoria
+        if em_memoria is None or time.time() - em_memoria[1] > self.ttl:
+            self._atualizar_em_segundo_plano(url)
+        if em_memoria is not None:
+            return em_memoria[0]
+        return self._ler_embutido(reserva)
+
+    def _atualizar_em_segundo_plano(self, url):
+        if self.offline:
+            return
+        with self._lock:
+            if url in self._baixando or time.time() - self._falhas.get(url, 0) < ESPERA_APOS_FALHA:
+                return
+            self._baixando.add(url)
+        threading.Thread(target=self._baixar, args=(url,), name="suite_pdf_recursos", daemon=True).start()
+
+    def _baixar(self, url):
+        import requests
+
+        try:
+            limite = LIMITE_RECURSO_MB * 1024 * 1024
+            # stream=True: o corpo é lido em blocos e o download para assim que passa do limite
+            with requests.get(url, timeout=TIMEOUT_DOWNLOAD, stream=True) as resposta:
+                if resposta.status_code != 200:
+                    raise ValueError(f"Resposta {resposta.status_code} ao baixar {url}")
+                if int(resposta.headers.get("Content-Length") or 0) > limite:
+                    raise ValueError(f"{url} passa de {LIMITE_RECURSO_MB} MB")
+                blocos, lido = [], 0
+                for bloco in resposta.iter_content(64 * 1024):
+                    lido += len(bloco)
+                    if lido > limite:
+                        raise ValueError(f"{url} passa de {LIMITE_RECURSO_MB} MB")
+                    blocos.append(bloco)
+            dados = json.loads(b"".join(blocos))
+            # Grava num temporário e renomeia: outro processo nunca lê um JSON pela metade
+            caminho = self._caminho(url)
+            with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(dados, f)
+            os.replace(caminho + ".tmp", caminho)
+            with self._lock:
+                self._memoria[url] = (dados, time.time())
+                self._falhas.pop(url, None)
+        except Exception:
+            with self._lock:
+                self._falhas[url] = time.time()
+        finally:
+            with self._lock:
+                self._baixando.discard(url)
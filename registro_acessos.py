@@ -0,0 +1,80 @@
+import csv
+import datetime
+import os
+from collections import Counter
+
+from estado_compartilhado import ContadorEmLote, criar_backend
+
+
+# Estatísticas de uso (acessos e conversões) como contadores no estado
+# compartilhado: cada acesso só incrementa o total e o contador do dia
+# (agregados mantidos na gravação), então registrar e consultar custam o
+# mesmo com 10 ou 10 milhões de acessos. O gráfico lê os totais diários
+# prontos, sem percorrer acesso por acesso. A importação dos arquivos antigos
+# roda na thread do contador, para a aplicação subir mesmo com o backend fora.
+GRUPO_TOTAIS = "totais"
+GRUPO_POR_DIA = "acessos_por_dia"
+GRUPO_MIGRACOES = "migracoes"
+# Arquivos antigos (log "data,hora" por acesso e contador de conversões),
+# somados ao estado uma única vez, mesmo com vários dynos subindo juntos
+ARQUIVO_LOG_LEGADO = "log_acessos.csv"
+ARQUIVO_CONTADOR_LEGADO = "contador.txt"
+DIAS_GRAFICO = 90
+
+
+class RegistroAcessos:
+    """Contagem de acessos (total e por dia) e de conversões."""
+
+    def __init__(self, contador=None, log_legado=ARQUIVO_LOG_LEGADO, contador_legado=ARQUIVO_CONTADOR_LEGADO):
+        self.contador = contador or ContadorEmLote(criar_backend())
+        if log_legado and os.path.exists(log_legado):
+            self.contador.agendar(
+                lambda: self._importar_uma_vez("log_acessos", lambda: self.importar_log(log_legado))
+            )
+        if contador_legado and os.path.exists(contador_legado):
+            self.contador.agendar(
+                lambda: self._importar_uma_vez("contador", lambda: self.importar_contador(contador_legado))
+            )
+
+    def _importar_uma_vez(self, nome, importar):
+        # A soma no backend é atômica: só quem leva o contador a 1 importa
+        if self.contador.backend.somar(GRUPO_MIGRACOES, {nome: 1})[nome] == 1:
+            importar()
+
+    def registrar(self, quando=None):
+        """Conta um acesso e devolve o novo total."""
+        data = (quando or datetime.datetime.now()).strftime("%Y-%m-%d")
+        self.contador.incrementar(GRUPO_POR_DIA, data)
+        return self.contador.incrementar(GRUPO_TOTAIS, "acessos")
+
+    def total(self):
+        return self.contador.valor(GRUPO_TOTAIS, "acessos")
+
+    def por_dia(self, ultimos_dias=None):
+        """Lista de (data "AAAA-MM-DD", acessos) em ordem cronológica."""
+        dias = sorted(self.contador.ler_grupo(GRUPO_POR_DIA).items())
+        if ultimos_dias:
+            desde = (datetime.date.today() - datetime.timedelta(days=ultimos_dias - 1)).isoformat()
+            dias = [(data, acessos) for data, acessos in dias if data >= desde]
+        return dias
+
+    def contar_conversao(self):
+        """Conta uma conversão e devolve o novo total."""
+        return self.contador.incrementar(GRUPO_TOTAIS, "conversoes")
+
+    def importar_log(self, caminho):
+        """Soma os acessos de um log CSV "data,hora" (lido em streaming) aos totais."""
+        with open(caminho, newline="", encoding="utf-8") as f:
+            por_dia = Counter(linha["data"] for linha in csv.DictReader(f) if linha.get("data"))
+        if por_dia:
+            self.contador.backend.somar(GRUPO_POR_DIA, dict(por_dia))
+            self.contador.backend.somar(GRUPO_TOTAIS, {"acessos": sum(por_dia.values())})
+        return sum(por_dia.values())
+
+    def importar_contador(self, caminho):
+        """Soma o valor de um contador antigo (arquivo com um número) ao total de conversões."""
+        with open(caminho, encoding="utf-8") as f:
+            valor = int(f.read().strip() or 0)
+        if valor:
+            self.contador.backend.somar(GRUPO_TOTAIS, {"conversoes": valor})
+        return valor
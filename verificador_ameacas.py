@@ -0,0 +1,272 @@
+import re
+
+from analise_documento import AnaliseDocumento
+from espaco_trabalho import abrir_pdf
+from motor_regras import LIMITE_DOCUMENTO_MB, LIMITE_STREAM_MB, Descompressor, carregar_motor, filtros_do_stream
+
+
+# Verificação de PDFs maliciosos: percorre a tabela xref uma única vez e
+# classifica o dicionário de cada objeto, sem renderizar texto. O MuPDF já
+# normaliza os nomes ao imprimir o objeto (/#4A#53 vira /JS), então nomes
+# ofuscados com escapes hexadecimais também são encontrados. O conteúdo dos
+# streams é decodificado em blocos e passado pelo motor de regras na mesma
+# passada (ver motor_regras).
+CATEGORIAS = (
+    "scripts_encontrados",
+    "acoes_automaticas",
+    "urls_detectadas",
+    "anexos_suspeitos",
+    "obj_suspeitos",
+    "formularios",
+    "analise_parcial",
+)
+
+_NOME = r"(?![A-Za-z0-9])"  # fim do nome PDF (/JS não casa com /JSON)
+RE_JAVASCRIPT = re.compile(r"/JS" + _NOME + r"|/JavaScript" + _NOME)
+RE_ACAO_AUTOMATICA = re.compile(r"/AA" + _NOME)
+RE_ARVORE_ANEXOS = re.compile(r"/EmbeddedFiles" + _NOME)
+RE_ANEXO = re.compile(r"/EF" + _NOME)
+RE_URI = re.compile(r"/URI" + _NOME)
+RE_CAMPO = re.compile(r"/FT\s*/")
+RE_IMAGEM = re.compile(r"/Subtype\s*/Image" + _NOME)
+# Ações que saem do documento ou executam algo fora do leitor
+ACOES_PERIGOSAS = {
+    "Launch": "Ação Launch (executa um programa ou abre um arquivo local)",
+    "SubmitForm": "Ação SubmitForm (envia dados do formulário para um servidor)",
+    "ImportData": "Ação ImportData (importa dados de um arquivo externo)",
+    "GoToR": "Ação GoToR (abre outro documento)",
+    "GoToE": "Ação GoToE (abre um documento embutido)",
+    "RichMedia": "Conteúdo RichMedia (Flash/vídeo embutido)",
+}
+RE_ACAO_PERIGOSA = re.compile(r"/(" + "|".join(ACOES_PERIGOSAS) + r")" + _NOME)
+# Tipos de ação que tornam suspeito o /OpenAction: rodam algo, enviam ou leem
+# dados, ou levam para fora do documento (URI só se não for um "#destino").
+# Um destino simples ([página /Fit]) só posiciona a página e é ignorado.
+ACOES_ABERTURA_PERIGOSAS = ("JavaScript", "Launch", "SubmitForm", "ImportData", "GoToR", "URI")
+RE_TIPO_ACAO = re.compile(r"/S\s*/([A-Za-z]+)" + _NOME)
+RE_PROXIMA_ACAO = re.compile(r"/Next\s*(\[[^\]]*\]|\d+ 0 R)")
+# Limite de ações seguidas pela cadeia /Next (evita ciclos e cadeias gigantes)
+MAX_ACOES_ABERTURA = 50
+PASSO_PROGRESSO = 500
+# Um stream comprimido que cresce mais que isso ao ser decodificado (e passa
+# de MIN_BOMBA_MB) é uma possível bomba de descompressão; Flate comum em
+# conteúdo de página fica bem abaixo de 20x
+RAZAO_BOMBA = 100
+MIN_BOMBA_MB = 1
+# Categorias que tornam o arquivo suspeito (links, formulários e o aviso de
+# análise parcial sozinhos, não)
+CATEGORIAS_RISCO = ("scripts_encontrados", "acoes_automaticas", "anexos_suspeitos", "obj_suspeitos")
+
+
+def resultado_vazio():
+    return {categoria: [] for categoria in CATEGORIAS}
+
+
+def eh_suspeito(resultado):
+    return any(resultado.get(categoria) for categoria in CATEGORIAS_RISCO)
+
+
+def _localizar_paginas(doc):
+    """{xref: número da página} para as páginas e suas anotações (links, widgets)."""
+    paginas = {}
+    for numero in range(doc.page_count):
+        xref_pagina = doc.page_xref(numero)
+        paginas[xref_pagina] = numero + 1
+        tipo, valor = doc.xref_get_key(xref_pagina, "Annots")
+        if tipo == "xref":
+            # Annots indireto: o array está em outro objeto
+            valor = doc.xref_object(int(valor.split()[0]), compressed=True)
+        for referencia in re.findall(r"(\d+) 0 R", valor if tipo in ("array", "xref") else ""):
+            paginas.setdefault(int(referencia), numero + 1)
+    return paginas
+
+
+def _onde(xref, paginas):
+    if xref in paginas:
+        return f"objeto {xref}, página {paginas[xref]}"
+    return f"objeto {xref}"
+
+
+def _ler_string(objeto, inicio):
+    """Lê a string PDF que começa em `inicio` ("(literal)" ou "<hex>"); None se não for string."""
+    if objeto.startswith("<", inicio) and not objeto.startswith("<<", inicio):
+        fim = objeto.find(">", inicio)
+        try:
+            dados = bytes.fromhex(objeto[inicio + 1:fim])
+        except ValueError:
+            return None
+    elif objeto.startswith("(", inicio):
+        dados = bytearray()
+        profundidade = 0
+        posicao = inicio
+        while posicao < len(objeto):
+            caractere = objeto[posicao]
+            if caractere == "\\" and posicao + 1 < len(objeto):
+                posicao += 1
+                caractere = {"n": "\n", "r": "\r", "t": "\t"}.get(objeto[posicao], objeto[posicao])
+            elif caractere == "(":
+                profundidade += 1
+                if profundidade == 1:
+                    posicao += 1
+                    continue
+            elif caractere == ")":
+                profundidade -= 1
+                if profundidade == 0:
+                    break
+            dados += caractere.encode("latin-1", "replace")
+            posicao += 1
+    else:
+        return None
+    if dados.startswith(b"\xfe\xff"):
+        return dados[2:].decode("utf-16-be", "replace")
+    return dados.decode("latin-1")
+
+
+def strings_da_chave(objeto, chave):
+    """Valores string de todas as ocorrências de /chave no objeto, inclusive em dicionários aninhados."""
+    valores = []
+    for encontrado in re.finditer(r"/" + chave + _NOME + r"\s*", objeto):
+        valor = _ler_string(objeto, encontrado.end())
+        if valor is not None:
+            valores.append(valor)
+    return valores
+
+
+def classificar_objeto(xref, objeto, resultado, paginas, catalogo):
+    """Classifica um objeto (o texto do dicionário) e acrescenta o que achar ao resultado."""
+    onde = _onde(xref, paginas)
+
+    if RE_JAVASCRIPT.search(objeto):
+        resultado["scripts_encontrados"].append(f"Script JavaScript ({onde})")
+
+    if RE_ACAO_AUTOMATICA.search(objeto):
+        if xref == catalogo:
+            resultado["acoes_automaticas"].append("Ações automáticas do documento (/AA)")
+        else:
+            resultado["acoes_automaticas"].append(f"Ação automática (/AA) ({onde})")
+
+    for acao in dict.fromkeys(RE_ACAO_PERIGOSA.findall(objeto)):
+        resultado["obj_suspeitos"].append(f"{ACOES_PERIGOSAS[acao]} ({onde})")
+
+    if RE_URI.search(objeto):
+        for uri in strings_da_chave(objeto, "URI"):
+            if uri not in resultado["urls_detectadas"]:
+                resultado["urls_detectadas"].append(uri)
+
+    # Especificação de arquivo com /EF: o conteúdo do arquivo está dentro do PDF
+    anexos = len(RE_ANEXO.findall(objeto))
+    if anexos:
+        nomes = strings_da_chave(objeto, "UF") or strings_da_chave(objeto, "F")
+        for numero in range(anexos):
+            nome = nomes[numero] if numero < len(nomes) else "sem nome"
+            resultado["anexos_suspeitos"].append(f"Arquivo anexado: {nome} ({onde})")
+    if RE_ARVORE_ANEXOS.search(objeto):
+        resultado["anexos_suspeitos"].append(f"Lista de arquivos anexados do documento ({onde})")
+
+    if xref == catalogo and "/AcroForm" in objeto:
+        resultado["formularios"].append("Formulário interativo (AcroForm)")
+    if "/XFA" in objeto:
+        resultado["formularios"].append(f"Formulário XFA, que pode conter scripts ({onde})")
+
+
+def acoes_de_abertura(doc, catalogo):
+    """Tipos perigosos entre as ações do /OpenAction do catálogo, seguindo a cadeia /Next."""
+    perigosas = []
+    pendentes = [doc.xref_get_key(catalogo, "OpenAction")]
+    vistos = set()
+    while pendentes and len(vistos) < MAX_ACOES_ABERTURA:
+        tipo, valor = pendentes.pop()
+        if tipo == "xref":
+            xref = int(valor.split()[0])
+            if xref in vistos:
+                continue
+            vistos.add(xref)
+            try:
+                valor = doc.xref_object(xref, compressed=True)
+            except Exception:
+                continue
+            tipo = "dict" if valor.startswith("<<") else "outro"
+        if tipo != "dict":
+            continue  # array de destino (ou nada): só abre numa página
+        vistos.add(valor)
+        # Ações da cadeia /Next escritas dentro deste dicionário também casam aqui
+        for acao in RE_TIPO_ACAO.findall(valor):
+            if acao == "URI" and all(uri.startswith("#") for uri in strings_da_chave(valor, "URI")):
+                continue
+            if acao in ACOES_ABERTURA_PERIGOSAS and acao not in perigosas:
+                perigosas.append(acao)
+        for proximas in RE_PROXIMA_ACAO.findall(valor):
+            pendentes.extend(("xref", f"{numero} 0 R") for numero in re.findall(r"(\d+) 0 R", proximas))
+    return perigosas
+
+
+def analisar_stream(doc, xref, objeto, motor, resultado, paginas, limite):
+    """Passa o conteúdo do stream pelo motor de regras.
+
+    Devolve quantos bytes foram descomprimidos (0 para imagens e streams sem
+    filtro, que são analisados como estão e não gastam o orçamento).
+    """
+    bruto = doc.xref_stream_raw(xref)
+    # Imagens são analisadas como estão: descomprimir um scan em Flate só
+    # gastaria o orçamento com pixels
+    filtros = [] if RE_IMAGEM.search(objeto) else filtros_do_stream(doc, xref)
+    conteudo = Descompressor(bruto, filtros, limite)
+    onde = _onde(xref, paginas)
+    for regra in motor.analisar(conteudo):
+        categoria = regra.get("categoria") if regra.get("categoria") in CATEGORIAS else "obj_suspeitos"
+        resultado[categoria].append(f"{regra['descricao']} ({onde})")
+    if not filtros:
+        return 0
+    # Pela razão entre o que saiu e o que foi consumido do bruto para isso
+    # (com o corte no limite, só a parte já decodificada conta)
+    razao = conteudo.total / max(conteudo.lido, 1)
+    if conteudo.total >= MIN_BOMBA_MB * 1024 * 1024 and razao >= RAZAO_BOMBA:
+        resultado["obj_suspeitos"].append(
+            f"Stream com {len(bruto) / 1024:.0f} KB que cresce {razao:.0f}x ao descomprimir; "
+            f"possível bomba de descompressão ({onde})"
+        )
+    return conteudo.total
+
+
+def verificar_malware_em_pdf(pdf, progresso=None, analisar_streams=True, motor=None, analise=None):
+    """Verifica o PDF (caminho ou bytes) em uma única passada pelos objetos.
+
+    Com `analise` (AnaliseDocumento do mesmo conteúdo), o mapa de páginas é
+    reaproveitado entre verificações e abas.
+    """
+    resultado = resultado_vazio()
+    if analisar_streams and motor is None:
+        motor = carregar_motor()
+    doc = abrir_pdf(pdf)
+    try:
+        analise = analise if analise is not None else AnaliseDocumento()
+        paginas = analise.memorizar(("paginas_por_xref",), lambda: _localizar_paginas(doc))
+        catalogo = doc.pdf_catalog()
+        for acao in acoes_de_abertura(doc, catalogo):
+            resultado["acoes_automaticas"].append(f"Ação {acao} executada ao abrir o documento (OpenAction)")
+        total = doc.xref_length()
+        campos = 0
+        orcamento = LIMITE_DOCUMENTO_MB * 1024 * 1024
+        for xref in range(1, total):
+            if progresso and xref % PASSO_PROGRESSO == 0:
+                progresso(xref / total, f"Objetos analisados: {xref} de {total}")
+            try:
+                objeto = doc.xref_object(xref, compressed=True)
+            except Exception:
+                continue  # objeto corrompido ou livre
+            classificar_objeto(xref, objeto, resultado, paginas, catalogo)
+            if RE_CAMPO.search(objeto):
+                campos += 1
+            if analisar_streams and orcamento > 0 and doc.xref_is_stream(xref):
+                orcamento -= analisar_stream(doc, xref, objeto, motor, resultado, paginas,
+                                             min(LIMITE_STREAM_MB * 1024 * 1024, orcamento))
+                if orcamento <= 0:
+                    resultado["analise_parcial"].append(
+                        f"Conteúdo descomprimido passou de {LIMITE_DOCUMENTO_MB} MB; "
+                        f"os streams a partir do objeto {xref} não foram analisados"
+                    )
+        if campos:
+            resultado["formularios"].append(f"{campos} campos de formulário")
+    finally:
+        doc.close()
+    return resultado
@@ -0,0 +1,271 @@
+"""Verificação de PDFs em lote, sem interface (ex.: anexos de e-mail).
+
+Uso:
+    python verificar_lote.py pasta/ outro.pdf [--lista arquivos.txt] [--saida resultado.jsonl]
+                             [--workers 4] [--timeout 60] [--sem-streams]
+
+Grava uma linha JSON por arquivo, na ordem em que terminam, e no fim um
+relatório de vazão (arquivos/s e MB/s) na saída de erro. Sai com código 1
+se algum arquivo for suspeito.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+from verificador_ameacas import eh_suspeito, verificar_malware_em_pdf
+
+
+ESTADO_OK = "ok"
+ESTADO_ERRO = "erro"
+ESTADO_TIMEOUT = "timeout"
+# Reinicia cada processo depois de tantos arquivos (libera memória do MuPDF)
+ARQUIVOS_POR_PROCESSO = 200
+# O alarme dentro do worker não interrompe o código C do MuPDF; passado o
+# timeout mais esta folga, o processo principal encerra os workers
+FOLGA_TIMEOUT = 5
+# De quanto em quanto tempo (s) o processo principal confere se algum worker
+# morreu (ex.: falha de segmentação no MuPDF) sem devolver o arquivo
+INTERVALO_VERIFICACAO = 1
+
+_configuracao = {}
+
+
+class TempoEsgotado(BaseException):
+    # BaseException: os "except Exception" da verificação não podem engoli-la
+    pass
+
+
+def _alarme(signum, frame):
+    raise TempoEsgotado()
+
+
+def _iniciar_processo(timeout, analisar_streams, inicios):
+    _configuracao["timeout"] = timeout
+    _configuracao["analisar_streams"] = analisar_streams
+    _configuracao["inicios"] = inicios
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _alarme)
+
+
+def verificar_arquivo(caminho):
+    """Verifica um arquivo e devolve o registro da linha JSONL."""
+    inicio = time.perf_counter()
+    registro = {"arquivo": caminho, "bytes": 0}
+    timeout = _configuracao.get("timeout")
+    usar_alarme = timeout and hasattr(signal, "SIGALRM")
+    try:
+        registro["bytes"] = os.path.getsize(caminho)
+        if usar_alarme:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            resultado = verificar_malware_em_pdf(caminho,
+                                                 analisar_streams=_configuracao.get("analisar_streams", True))
+        finally:
+            if usar_alarme:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        registro["estado"] = ESTADO_OK
+        registro["suspeito"] = eh_suspeito(resultado)
+        registro["achados"] = {categoria: itens for categoria, itens in resultado.items() if itens}
+    except TempoEsgotado:
+        registro["estado"] = ESTADO_TIMEOUT
+        registro["erro"] = f"Tempo limite de {timeout}s excedido"
+    except Exception as e:
+        registro["estado"] = ESTADO_ERRO
+        registro["erro"] = f"{type(e).__name__}: {e}"
+    registro["segundos"] = round(time.perf_counter() - inicio, 4)
+    return registro
+
+
+def _verificar_enviado(numero, caminho):
+    # Avisa o processo principal de qual worker pegou o envio antes de começar
+    _configuracao["inicios"].put((numero, os.getpid()))
+    return verificar_arquivo(caminho)
+
+
+def listar_arquivos(caminhos, lista=None):
+    """Gera os PDFs dos caminhos (arquivos ou pastas, recursivo) e da lista, sem montar tudo na memória."""
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, arquivos in os.walk(caminho):
+                for nome in sorted(arquivos):
+                    if nome.lower().endswith(".pdf"):
+                        yield os.path.join(raiz, nome)
+        else:
+            yield caminho
+    if lista:
+        with (sys.stdin if lista == "-" else open(lista, encoding="utf-8")) as f:
+            for linha in f:
+                linha = linha.strip()
+                if linha:
+                    yield linha
+
+
+def _registro_sem_resposta(caminho, estado, erro, segundos):
+    """Registro de um arquivo cujo worker não devolveu resultado."""
+    try:
+        tamanho = os.path.getsize(caminho)
+    except OSError:
+        tamanho = 0
+    return {"arquivo": caminho, "bytes": tamanho, "estado": estado, "erro": erro, "segundos": round(segundos, 4)}
+
+
+def _pids_vivos(pool):
+    # Pool não expõe os workers; a lista é trocada pela thread de manutenção do pool
+    return {processo.pid for processo in list(pool._pool) if processo.is_alive()}
+
+
+def verificar_lote(arquivos, saida, workers=None, timeout=60, analisar_streams=True):
+    """Verifica os arquivos em paralelo, grava uma linha JSON por arquivo e devolve o resumo.
+
+    Cada worker recebe um arquivo por vez. Se um deles passa do timeout mais
+    FOLGA_TIMEOUT (preso no código C do MuPDF, onde o alarme não chega), o
+    pool é encerrado e recriado: o arquivo fica com estado "timeout" e os
+    que estavam nos outros workers são enviados de novo. Um worker que morre
+    no meio de um arquivo (mesmo com timeout 0) deixa o arquivo com estado
+    "erro" depois de INTERVALO_VERIFICACAO, sem segurar o lote.
+    """
+    workers = workers or os.cpu_count() or 1
+    prazo = timeout + FOLGA_TIMEOUT if timeout else None
+    resumo = {"arquivos": 0, "bytes": 0, "suspeitos": 0, ESTADO_ERRO: 0, ESTADO_TIMEOUT: 0}
+    inicio = time.perf_counter()
+    prontos = queue.Queue()
+    # número do envio -> (arquivo, instante do envio); respostas de envios descartados são ignoradas
+    em_andamento = {}
+    # número do envio -> pid do worker que o pegou; número -> quando o worker sumiu
+    processos = {}
+    sem_processo = {}
+    numeros = itertools.count()
+    arquivos = iter(arquivos)
+
+    def novo_pool():
+        # Fila de avisos nova a cada pool: um worker encerrado no meio de um aviso não trava os próximos
+        inicios = multiprocessing.SimpleQueue()
+        pool = multiprocessing.Pool(workers, initializer=_iniciar_processo,
+                                    initargs=(timeout, analisar_streams, inicios),
+                                    maxtasksperchild=ARQUIVOS_POR_PROCESSO)
+        return pool, inicios
+
+    def enviar(caminho):
+        numero = next(numeros)
+        em_andamento[numero] = (caminho, time.monotonic())
+        pool.apply_async(
+            _verificar_enviado, (numero, caminho),
+            callback=lambda registro: prontos.put((numero, registro)),
+            error_callback=lambda e: prontos.put((numero, _registro_sem_resposta(
+                caminho, ESTADO_ERRO, f"{type(e).__name__}: {e}", 0))),
+        )
+
+    def registrar(registro):
+        saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        saida.flush()
+        resumo["arquivos"] += 1
+        resumo["bytes"] += registro["bytes"]
+        if registro.get("suspeito"):
+            resumo["suspeitos"] += 1
+        if registro["estado"] != ESTADO_OK:
+            resumo[registro["estado"]] += 1
+
+    pool, inicios = novo_pool()
+    try:
+        while True:
+            while len(em_andamento) < workers:
+                caminho = next(arquivos, None)
+                if caminho is None:
+                    break
+                enviar(caminho)
+            if not em_andamento:
+                break
+            espera = INTERVALO_VERIFICACAO
+            if prazo:
+                mais_antigo = min(enviado for _, enviado in em_andamento.values())
+                espera = min(espera, max(0, mais_antigo + prazo - time.monotonic()))
+            while not inicios.empty():
+                numero, pid = inicios.get()
+                if numero in em_andamento:
+                    processos[numero] = pid
+            try:
+                numero, registro = prontos.get(timeout=espera)
+            except queue.Empty:
+                agora = time.monotonic()
+                vivos = _pids_vivos(pool)
+                for numero, pid in list(processos.items()):
+                    if pid in vivos:
+                        sem_processo.pop(numero, None)
+                    elif agora - sem_processo.setdefault(numero, agora) >= INTERVALO_VERIFICACAO:
+                        # O worker morreu sem responder; o pool já pôs outro no lugar
+                        caminho, enviado = em_andamento.pop(numero)
+                        del processos[numero], sem_processo[numero]
+                        registrar(_registro_sem_resposta(caminho, ESTADO_ERRO,
+                                                         "O processo de verificação terminou sem responder",
+                                                         agora - enviado))
+                if not prazo or not any(agora - enviado >= prazo for _, enviado in em_andamento.values()):
+                    continue
+                pool.terminate()
+                pool.join()
+                reenviar = []
+                for numero, (caminho, enviado) in list(em_andamento.items()):
+                    if agora - enviado >= prazo:
+                        registrar(_registro_sem_resposta(caminho, ESTADO_TIMEOUT,
+                                                         f"Tempo limite de {timeout}s excedido", agora - enviado))
+                    else:
+                        reenviar.append(caminho)
+                em_andamento.clear()
+                processos.clear()
+                sem_processo.clear()
+                pool, inicios = novo_pool()
+                for caminho in reenviar:
+                    enviar(caminho)
+                continue
+            if em_andamento.pop(numero, None) is not None:
+                processos.pop(numero, None)
+                sem_processo.pop(numero, None)
+                registrar(registro)
+    finally:
+        pool.terminate()
+        pool.join()
+    resumo["segundos"] = time.perf_counter() - inicio
+    return resumo
+
+
+def imprimir_relatorio(resumo, destino=sys.stderr):
+    segundos = max(resumo["segundos"], 1e-9)
+    megabytes = resumo["bytes"] / (1024 * 1024)
+    print(
+        f"{resumo['arquivos']} arquivos ({megabytes:.1f} MB) em {resumo['segundos']:.2f}s: "
+        f"{resumo['arquivos'] / segundos:.1f} arquivos/s, {megabytes / segundos:.1f} MB/s\n"
+        f"suspeitos: {resumo['suspeitos']}, erros: {resumo[ESTADO_ERRO]}, "
+        f"tempo esgotado: {resumo[ESTADO_TIMEOUT]}",
+        file=destino,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica PDFs em lote e grava os achados em JSONL.")
+    parser.add_argument("caminhos", nargs="*", help="arquivos PDF ou pastas (percorridas recursivamente)")
+    parser.add_argument("--lista", help="arquivo com um caminho por linha ('-' para a entrada padrão)")
+    parser.add_argument("--saida", help="arquivo JSONL de saída (padrão: saída padrão)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=60, help="segundos por arquivo (0 = sem limite)")
+    parser.add_argument("--sem-streams", action="store_true", help="não analisa o conteúdo dos streams")
+    args = parser.parse_args(argv)
+    if not args.caminhos and not args.lista:
+        parser.error("informe arquivos, pastas ou --lista")
+
+    arquivos = listar_arquivos(args.caminhos, args.lista)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as saida:
+            resumo = verificar_lote(arquivos, saida, args.workers, args.timeout, not args.sem_streams)
+    else:
+        resumo = verificar_lote(arquivos, sys.stdout, args.workers, args.timeout, not args.sem_streams)
+    imprimir_relatorio(resumo)
+    return 1 if resumo["suspeitos"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())